@@ -4,12 +4,15 @@ Main FastAPI application with WebSocket support for real-time communication
 """
 
 import os
+import json
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, BackgroundTasks
+from fastapi import FastAPI, WebSocket, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 from services.vector_store import VectorStoreService
@@ -17,6 +20,20 @@ from services.retrieval import RetrievalService
 from services.llm_service import LLMService
 from services.simli_orchestrator import SimliOrchestrator
 from services.scheduler import scheduler
+from services.upstream_governor import governor, upstream_priority, Priority
+from services.resilience import Deadline, DeadlineExceeded, policy_stats
+from services.cancellation import ClientDisconnected, cancellation_stats, run_until_disconnect
+from services.usage_tracker import track_usage, usage_stats
+from services.tracing import RequestIdMiddleware, trace_request, tracer
+from services.stream_writer import coalescing_stats
+from services.compression import CompressionMiddleware, compression_stats
+from services.admission import AdmissionMiddleware, Lane, admission
+from services.ws_codec import JSON_CODEC, negotiate_subprotocol
+from services.ws_connection import SimliConnection, ws_stats
+from services.voice_input import voice_stats
+from services.warmup import Warmup, warmup_report
+from services.worker_coordinator import WorkerCoordinator
+from services.ingest_jobs import EntryStream, IngestCancelled, IngestJob, IngestJobConflict, ingest_jobs
 from models.schemas import (
     QueryRequest, 
     QueryResponse, 
@@ -38,11 +55,13 @@ vector_store_service: Optional[VectorStoreService] = None
 retrieval_service: Optional[RetrievalService] = None
 llm_service: Optional[LLMService] = None
 simli_orchestrator: Optional[SimliOrchestrator] = None
+worker: Optional[WorkerCoordinator] = None
+warmup_task: Optional[asyncio.Task] = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup, cleanup on shutdown"""
-    global vector_store_service, retrieval_service, llm_service, simli_orchestrator
+    global vector_store_service, retrieval_service, llm_service, simli_orchestrator, worker, warmup_task
     
     logger.info("Starting RAG Backend for Art Grants & Residency Expert...")
     
@@ -52,20 +71,25 @@ async def lifespan(app: FastAPI):
         await vector_store_service.initialize()
         
         retrieval_service = RetrievalService(vector_store_service)
-        llm_service = LLMService()
+        llm_service = LLMService(generation_source=vector_store_service.get_generation)
         simli_orchestrator = SimliOrchestrator(retrieval_service, llm_service)
+        # Intents authored as prompts get their answers off the startup path
+        intent_task = asyncio.create_task(simli_orchestrator.pregenerate_intents())
 
-        # Auto-ingest data on first startup if database is empty
-        if vector_store_service.collection.count() == 0:
-            logger.info("Database is empty - auto-ingesting knowledge base...")
-            try:
-                await vector_store_service.ingest_json_data("./data/art_grants_residencies_kb.json", force_update=True)
-                logger.info("✓ Auto-ingestion completed successfully")
-            except Exception as ingest_error:
-                logger.error(f"Auto-ingestion failed: {ingest_error}")
+        # With several workers only the elected leader runs the update
+        # scheduler and writes to the index; the others follow its generations
+        scheduler.use_vector_store(vector_store_service)
+        worker = WorkerCoordinator.from_settings(
+            vector_store_service,
+            on_elected=_lead,
+            on_demoted=_step_down
+        )
+        await worker.start()
 
-        # Start the update scheduler
-        scheduler.start()
+        # Prime tokenizer, connections and index so the first user is not the
+        # cold one; /ready reports ready once this finishes
+        if settings.WARMUP_ENABLED:
+            warmup_task = asyncio.create_task(Warmup.from_settings(vector_store_service, simli_orchestrator).run())
 
         logger.info("All services initialized successfully")
     except Exception as e:
@@ -77,11 +101,48 @@ async def lifespan(app: FastAPI):
     # Cleanup
     logger.info("Shutting down RAG Backend...")
     
-    # Stop scheduler
-    scheduler.stop()
+    # Stop the scheduler (if leading) and hand leadership back
+    if worker:
+        await worker.stop()
+    intent_task.cancel()
+    if warmup_task:
+        warmup_task.cancel()
+    await ingest_jobs.shutdown()
+    
+    if simli_orchestrator:
+        await simli_orchestrator.sessions.close()
     
     if vector_store_service:
         await vector_store_service.cleanup()
+    
+    if tracer.exporter:
+        tracer.exporter.shutdown()
+
+async def _lead():
+    """Duties of the leader worker: first-run ingestion, then scheduled updates"""
+    # Auto-ingest in the background if the database is empty (or a previous
+    # run died or was interrupted mid-way); queries fall back to keyword
+    # retrieval meanwhile
+    if vector_store_service.collection.count() == 0 or vector_store_service.initial_ingest_unfinished():
+        logger.info("Knowledge base not fully indexed - auto-ingesting in the background...")
+        try:
+            ingest_jobs.start(
+                settings.KNOWLEDGE_BASE_PATH,
+                lambda progress: vector_store_service.initial_ingest(settings.KNOWLEDGE_BASE_PATH, progress)
+            )
+        except IngestJobConflict as e:
+            logger.warning(f"Initial ingest deferred: {e}")
+
+    # Start the update scheduler
+    scheduler.start()
+
+async def _step_down():
+    """Stop every index writer when leadership is lost: the scheduler and a running ingest"""
+    scheduler.stop()
+    job = ingest_jobs.active
+    if job:
+        logger.warning(f"No longer leader - cancelling ingest job {job.id}")
+        await ingest_jobs.cancel(job.id)
 
 # Create FastAPI app
 app = FastAPI(
@@ -91,6 +152,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Pipelines are admitted by lane (voice > agent > batch); added before CORS so
+# 429/503 refusals still carry CORS headers
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        routes={
+            "/query": Lane.AGENT,
+            "/retrieve_context": Lane.AGENT,
+            "/ingest": Lane.BATCH,
+            "/ingest/ndjson": Lane.BATCH,
+            "/admin/trigger_update": Lane.BATCH
+        }
+    )
+
 # Configure CORS
 cors_origins = settings.CORS_ORIGINS.split(",") if settings.CORS_ORIGINS else ["*"]
 app.add_middleware(
@@ -99,7 +175,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Retry-After"],
 )
+# Every request gets an X-Request-ID that its trace spans carry
+app.add_middleware(RequestIdMiddleware)
+# Large JSON responses go out brotli/gzip-compressed when the client accepts it
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
 
 # Health check endpoint
 @app.get("/health")
@@ -115,146 +197,301 @@ async def health_check():
         }
     }
 
+# Readiness endpoint, separate from liveness
+@app.get("/ready")
+async def readiness_check():
+    """
+    Check whether this worker should receive traffic
+    
+    503 while services start or warm up. While the first ingestion is
+    still running the worker serves degraded (keyword retrieval) and
+    reports status "degraded" with the ingest job.
+    """
+    checks = {
+        "services": simli_orchestrator is not None,
+        "warmup": not settings.WARMUP_ENABLED or warmup_report.completed,
+        "index": vector_store_service is not None and not vector_store_service.initial_ingest_pending()
+    }
+    if not (checks["services"] and checks["warmup"]):
+        status = "starting"
+    else:
+        status = "ready" if checks["index"] else "degraded"
+    
+    job = ingest_jobs.active
+    return JSONResponse(
+        status_code=503 if status == "starting" else 200,
+        content={
+            "status": status,
+            "checks": checks,
+            "ingest_job": job.to_dict() if job else None
+        }
+    )
+
 # Data ingestion endpoint
 @app.post("/ingest", response_model=IngestResponse)
-async def ingest_knowledge_base(
-    request: IngestRequest,
-    background_tasks: BackgroundTasks
-):
+async def ingest_knowledge_base(request: IngestRequest):
     """
     Ingest art grants and residencies data into the vector database
-    This can be called initially or to update the knowledge base
+    This can be called initially or to update the knowledge base.
+    Ingests `data` when given, otherwise the file at `file_path`, as a
+    background job whose progress is at /ingest/jobs/{job_id}
     """
     if not vector_store_service:
         raise HTTPException(status_code=503, detail="Vector store service not initialized")
+    await _require_leader()
     
-    try:
-        # Run ingestion in background to avoid timeout
-        background_tasks.add_task(
-            vector_store_service.ingest_json_data,
-            request.file_path or "/data/art_grants_residencies_kb.json",
-            request.force_update
+    if request.data is not None:
+        entries = vector_store_service.extract_entries(request.data)
+        job = _start_ingest(
+            "inline data",
+            lambda progress: vector_store_service.ingest_entries(entries, request.force_update, progress)
         )
-        
-        return IngestResponse(
-            status="started",
-            message="Data ingestion started in background"
+    else:
+        file_path = request.file_path or settings.KNOWLEDGE_BASE_PATH
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail=f"Knowledge base file not found: {file_path}")
+        job = _start_ingest(
+            file_path,
+            lambda progress: vector_store_service.ingest_json_data(file_path, request.force_update, progress)
         )
-    except Exception as e:
-        logger.error(f"Ingestion error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    return IngestResponse(
+        status="started",
+        message="Data ingestion started in background",
+        job_id=job.id
+    )
+
+@app.post("/ingest/ndjson", response_model=IngestResponse)
+async def ingest_ndjson(request: Request, force_update: bool = False):
+    """
+    Ingest newline-delimited JSON, one entry per line
+    Accepts a raw application/x-ndjson body or a multipart upload in a
+    "file" field. Lines are fed into the batched pipeline while the body is
+    read; the response is sent once the whole payload has been received,
+    and the job carries on embedding what is left
+    """
+    if not vector_store_service:
+        raise HTTPException(status_code=503, detail="Vector store service not initialized")
+    await _require_leader()
+    
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Multipart uploads need a \"file\" field")
+        source, size, chunks = f"upload:{upload.filename}", upload.size, _read_upload(upload)
+    else:
+        content_length = request.headers.get("content-length")
+        source, size, chunks = "ndjson body", int(content_length) if content_length else None, request.stream()
+    
+    stream = EntryStream()
+    job = _start_ingest(
+        source,
+        lambda progress: vector_store_service.ingest_entries(stream.entries(progress), force_update, progress),
+        stream
+    )
+    job.progress.total_bytes = size
+    
+    try:
+        lines = await stream.feed_ndjson(chunks)
+    except IngestCancelled:
+        lines = None
+    except BaseException:
+        # Client went away mid-upload: don't ingest half a payload silently
+        await ingest_jobs.cancel(job.id)
+        raise
+    
+    progress = job.progress
+    return IngestResponse(
+        status="started" if not job.done else job.status,
+        message=f"Received {lines} entries; ingestion continues in background" if lines is not None else f"Ingest job {job.status}",
+        job_id=job.id,
+        entries_processed=progress.entries_processed,
+        entries_added=progress.entries_added,
+        entries_updated=progress.entries_updated
+    )
+
+# Ingest job status endpoints
+@app.get("/ingest/jobs")
+async def list_ingest_jobs():
+    """Get recent ingest jobs, newest first"""
+    return {"jobs": ingest_jobs.list()}
+
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Get an ingest job's status, progress (entries/sec, chunks embedded, ETA) and result"""
+    return (await _find_ingest_job(job_id)).to_dict()
+
+@app.delete("/ingest/jobs/{job_id}")
+async def cancel_ingest_job(job_id: str):
+    """Cancel a running ingest job; batches already embedded stay in the index"""
+    job = await ingest_jobs.cancel((await _find_ingest_job(job_id)).id)
+    return job.to_dict()
+
+def _start_ingest(source: str, run, stream: Optional[EntryStream] = None) -> IngestJob:
+    """Start an ingest job, or 409 while another one is running"""
+    try:
+        return ingest_jobs.start(source, run, stream)
+    except IngestJobConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"{e}; wait for it or cancel it with DELETE /ingest/jobs/{e.active.id}"
+        )
+
+async def _find_ingest_job(job_id: str) -> IngestJob:
+    """Look up a job of this worker; jobs run on the leader"""
+    job = ingest_jobs.get(job_id)
+    if not job:
+        await _require_leader()
+        raise HTTPException(status_code=404, detail=f"Ingest job not found: {job_id}")
+    return job
+
+async def _read_upload(upload, chunk_size: int = 65536):
+    """Read an uploaded file in chunks"""
+    while chunk := await upload.read(chunk_size):
+        yield chunk
 
 # Context retrieval endpoint
 @app.post("/retrieve_context", response_model=ContextResponse)
 async def retrieve_context(query: QueryRequest) -> ContextResponse:
     """
     Retrieve relevant context for a user query
-    Returns the most relevant chunks from the knowledge base
+    Returns the most relevant chunks from the knowledge base, projected to
+    `fields` when given
     """
     if not retrieval_service:
         raise HTTPException(status_code=503, detail="Retrieval service not initialized")
+    _check_fields(query, ContextResponse)
     
     try:
-        context = await retrieval_service.retrieve_context(
-            query.query,
-            num_results=query.num_results or 5
-        )
+        with trace_request("POST /retrieve_context"), track_usage("retrieve_context") as usage:
+            context = await retrieval_service.retrieve_context(
+                query.query,
+                num_results=query.num_results or 5,
+                deadline=Deadline.after(settings.REQUEST_DEADLINE_SECONDS)
+            )
         
-        return ContextResponse(
+        return _render(ContextResponse(
             query=query.query,
             context=context,
-            num_chunks=len(context.split("\n\n"))
-        )
+            num_chunks=len(context.split("\n\n")),
+            retrieval_time_ms=(usage.finished - usage.started) * 1000
+        ), query, "context")
+    except DeadlineExceeded as e:
+        logger.warning(f"Retrieval deadline exceeded: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Retrieval error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Complete query endpoint (RAG + LLM)
 @app.post("/query", response_model=QueryResponse)
-async def process_query(query: QueryRequest) -> QueryResponse:
+async def process_query(query: QueryRequest, request: Request) -> QueryResponse:
     """
     Process a complete query through the RAG pipeline
     1. Retrieve relevant context
     2. Generate response with GPT-4o
     3. Return the complete response
+    
+    With stream=true the answer is sent as Server-Sent Events: one
+    "token" event per delta, then a "done" event with sources and timing.
+    If the client disconnects first, the pipeline is cancelled.
+    
+    include_context=false drops context_used, and fields= returns only
+    the named fields.
     """
     if not simli_orchestrator:
         raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+    _check_fields(query, QueryResponse)
     
-    try:
-        response = await simli_orchestrator.process_query(
-            query.query,
-            stream=query.stream
+    if query.stream:
+        return StreamingResponse(
+            _sse_query_events(query),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
         )
+    
+    try:
+        with trace_request("POST /query"), track_usage("query"):
+            response = await run_until_disconnect(
+                request,
+                simli_orchestrator.process_query(
+                    query.query,
+                    stream=query.stream,
+                    session_id=query.session_id
+                )
+            )
         
-        return QueryResponse(
+        return _render(QueryResponse(
             query=query.query,
             response=response.answer,
             context_used=response.context,
-            confidence=response.confidence
-        )
+            confidence=response.confidence,
+            sources=response.sources,
+            processing_time_ms=response.processing_steps.get("total_ms"),
+            processing_steps=response.processing_steps if query.include_usage else None
+        ), query, "context_used")
+    except DeadlineExceeded as e:
+        logger.warning(f"Query deadline exceeded: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected:
+        # Nobody is listening; 499 is the conventional "client closed request"
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
         logger.error(f"Query processing error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _render(model: BaseModel, query: QueryRequest, context_field: str) -> Response:
+    """
+    Serialize a response model straight to JSON bytes with pydantic-core
+    
+    Skips FastAPI's jsonable_encoder pass and drops the fields the client
+    did not ask for.
+    
+    Args:
+        model: The complete response
+        query: Request carrying fields / include_context
+        context_field: The field holding retrieved context text
+    """
+    include = set(query.fields) if query.fields else None
+    exclude = {context_field} if query.include_context is False else None
+    return Response(model.model_dump_json(include=include, exclude=exclude), media_type="application/json")
+
+def _check_fields(query: QueryRequest, model_class: type):
+    """Reject unknown projection fields before any work is done"""
+    unknown = set(query.fields or ()) - set(model_class.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown response fields: {', '.join(sorted(unknown))}")
+
+async def _sse_query_events(query: QueryRequest):
+    """Encode orchestrator stream events as SSE data lines"""
+    with trace_request("POST /query", stream=True), track_usage("query_stream"):
+        async for event in simli_orchestrator.stream_query(
+            query.query,
+            session_id=query.session_id
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
+
 # WebSocket endpoint for real-time communication with Simli
 @app.websocket("/ws/simli")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time communication with Simli client
-    Handles speech-to-text input and returns generated responses
+    Handles speech-to-text input and returns generated responses; queries
+    are multiplexed by request id and can be cancelled or superseded
     """
-    await websocket.accept()
-    logger.info("WebSocket connection established")
+    # Clients may ask for MessagePack frames via the "simli.msgpack" subprotocol
+    codec = negotiate_subprotocol(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=codec.subprotocol if codec else None)
+    logger.info(f"WebSocket connection established ({(codec or JSON_CODEC).name})")
     
     if not simli_orchestrator:
         await websocket.close(code=1011, reason="Service not initialized")
         return
     
-    try:
-        while True:
-            # Receive message from Simli client
-            data = await websocket.receive_json()
-            
-            if data.get("type") == "query":
-                # Process the query from Simli frontend
-                query_text = data.get("text", "") or data.get("content", "")
-                logger.info(f"Received query from Simli: {query_text}")
-                
-                # Send processing status
-                await websocket.send_json({
-                    "type": "processing",
-                    "message": "Searching knowledge base..."
-                })
-                
-                # Get response through RAG pipeline
-                response = await simli_orchestrator.process_query(
-                    query_text,
-                    stream=False  # Don't stream for now
-                )
-                
-                # Send context chunks (optional, for debugging)
-                if response.sources:
-                    await websocket.send_json({
-                        "type": "context",
-                        "chunks": [{"source": s, "text": s[:100] + "..."} for s in response.sources[:3]]
-                    })
-                
-                # Send final response for Simli to speak
-                await websocket.send_json({
-                    "type": "response",
-                    "text": response.answer,
-                    "confidence": response.confidence
-                })
-            
-            elif data.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
-                
-    except WebSocketDisconnect:
-        logger.info("WebSocket disconnected")
-    except Exception as e:
-        logger.error(f"WebSocket error: {e}")
-        await websocket.close(code=1011, reason=str(e))
+    # Live avatar conversations go ahead of other upstream traffic
+    with upstream_priority(Priority.VOICE):
+        await SimliConnection.from_settings(websocket, simli_orchestrator, codec or JSON_CODEC).run()
 
 # Admin endpoint to check vector store status
 @app.get("/admin/vector_store_info")
@@ -273,10 +510,84 @@ async def vector_store_info():
         logger.error(f"Error getting vector store info: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Admin endpoint to inspect the LLM answer cache
+@app.get("/admin/llm_cache")
+async def llm_cache_info():
+    """Get hit/miss statistics for the LLM answer cache"""
+    if not llm_service:
+        raise HTTPException(status_code=503, detail="LLM service not initialized")
+    
+    return {
+        "enabled": llm_service.cache is not None,
+        "stats": llm_service.cache.stats() if llm_service.cache else None
+    }
+
+# Admin endpoints for the canned-answer intent table
+@app.get("/admin/intents")
+async def intents_info():
+    """Get intent table size and hit counts by match method and intent"""
+    if not simli_orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+    
+    intents = simli_orchestrator.intents
+    return {
+        "enabled": intents is not None,
+        "stats": intents.stats() if intents else None
+    }
+
+@app.post("/admin/intents/reload")
+async def reload_intents():
+    """Reload the intent table now instead of waiting for the file check"""
+    if not simli_orchestrator or not simli_orchestrator.intents:
+        raise HTTPException(status_code=503, detail="Intent matcher not enabled")
+    
+    reloaded = simli_orchestrator.intents.reload()
+    return {"reloaded": reloaded, "stats": simli_orchestrator.intents.stats()}
+
+# Admin endpoint for pipeline-level counters
+@app.get("/admin/pipeline_stats")
+async def pipeline_stats():
+    """Get coalescing, upstream, retry, routing, session, WebSocket, framing, cancellation, voice and compression statistics"""
+    if not simli_orchestrator:
+        raise HTTPException(status_code=503, detail="Orchestrator not initialized")
+    
+    single_flight = simli_orchestrator.single_flight
+    return {
+        "single_flight": single_flight.stats() if single_flight else None,
+        "upstream": governor.stats(),
+        "retry_policies": policy_stats(),
+        "model_routing": simli_orchestrator.router.stats(),
+        "sessions": await simli_orchestrator.sessions.stats(),
+        "websocket": ws_stats.stats(),
+        "stream_coalescing": coalescing_stats.stats(),
+        "cancellations": cancellation_stats.stats(),
+        "voice": voice_stats.stats(),
+        "compression": compression_stats.stats()
+    }
+
+# Admin endpoint for token, cost and latency accounting
+@app.get("/admin/usage")
+async def usage_info():
+    """Get per-endpoint token usage, estimated spend and latency percentiles"""
+    return usage_stats.stats()
+
+# Admin endpoint for startup warm-up timings
+@app.get("/admin/warmup")
+async def warmup_info():
+    """Get the duration and outcome of each startup warm-up step"""
+    return {"enabled": settings.WARMUP_ENABLED, **warmup_report.stats()}
+
+# Admin endpoint for per-stage tracing latency
+@app.get("/admin/latency")
+async def latency_info():
+    """Get recent per-stage span latency percentiles"""
+    return {"enabled": tracer.enabled, **tracer.latency()}
+
 # Admin endpoint to trigger manual update
 @app.post("/admin/trigger_update")
 async def trigger_manual_update(background_tasks: BackgroundTasks):
     """Manually trigger a knowledge base update"""
+    await _require_leader()
     try:
         # Run update in background
         background_tasks.add_task(scheduler.trigger_manual_update)
@@ -289,6 +600,30 @@ async def trigger_manual_update(background_tasks: BackgroundTasks):
         logger.error(f"Error triggering manual update: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _require_leader():
+    """Refuse index writes on follower workers; they would race the leader's"""
+    if worker and not await worker.confirm_leadership():
+        stats = await worker.stats()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Worker {stats['worker']} serves read-only; index writes run on the leader ({stats['leader']})"
+        )
+
+# Admin endpoint for admission control queues
+@app.get("/admin/admission")
+async def admission_info():
+    """Get pipeline slots in use, queue depth, wait times and rejections per lane"""
+    return {"enabled": settings.ADMISSION_ENABLED, **admission.stats()}
+
+# Admin endpoint for this worker's role and index generation
+@app.get("/admin/worker")
+async def worker_info():
+    """Get this worker's role, the current leader and the KB generation it serves"""
+    if not worker:
+        raise HTTPException(status_code=503, detail="Worker coordination not initialized")
+    
+    return await worker.stats()
+
 # Admin endpoint to get update status
 @app.get("/admin/update_status")
 async def get_update_status():
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Load generator for the RAG backend
+Virtual users arrive at a configurable rate (open loop, Poisson or constant)
+and each sends a few requests to /query, /retrieve_context or /ws/simli,
+with think time in between. Reports throughput, p50/p95/p99 latency,
+time-to-first-token and error rates as JSON and Markdown.
+
+With --local the backend is started with the fake LLM and embedding
+provider and a throwaway index, so runs are reproducible on any machine.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+
+KINDS = ("query", "query_stream", "retrieve_context", "ws")
+
+# websockets 14 renamed extra_headers when its new client became the default
+WS_HEADERS_ARG = "additional_headers" if int(websockets.__version__.split(".")[0]) >= 14 else "extra_headers"
+
+DEFAULT_QUERIES = [
+    "What are the best artist residencies in Europe?",
+    "How do I write a strong grant proposal?",
+    "What funding is available for emerging artists?",
+    "Which residencies offer funding for painters?",
+    "Are there grants for digital artists in the US?",
+    "What residencies in Berlin accept sculptors?",
+    "When is the deadline for the NEA grant?",
+    "Do any residencies provide housing and a stipend?"
+]
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    Parse a query mix such as "query:0.6,ws:0.4" into normalized weights
+
+    Raises:
+        ValueError: Unknown kind or no positive weight
+    """
+    weights: Dict[str, float] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        kind, _, weight = part.partition(":")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Unknown request kind {kind!r}; expected one of {', '.join(KINDS)}")
+        weights[kind] = float(weight) if weight else 1.0
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("The query mix needs at least one positive weight")
+    return {kind: weight / total for kind, weight in weights.items()}
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, or None without samples"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class Results:
+    """Samples collected during a run, summarized per request kind"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in KINDS}
+        self.users_started = 0
+        self.arrivals_dropped = 0
+
+    def record(self, kind: str, latency_ms: float, ttft_ms: Optional[float] = None, error: Optional[str] = None):
+        self.samples[kind].append({"latency_ms": latency_ms, "ttft_ms": ttft_ms, "error": error})
+
+    def summary(self, wall_s: float) -> Dict[str, Any]:
+        """Throughput, latency and TTFT percentiles and error counts per kind"""
+        endpoints = {}
+        for kind, samples in self.samples.items():
+            if not samples:
+                continue
+            ok = [s for s in samples if s["error"] is None]
+            latencies = [s["latency_ms"] for s in ok]
+            ttfts = [s["ttft_ms"] for s in ok if s["ttft_ms"] is not None]
+            endpoints[kind] = {
+                "requests": len(samples),
+                "ok": len(ok),
+                "errors": dict(Counter(s["error"] for s in samples if s["error"] is not None)),
+                "error_rate": round(1 - len(ok) / len(samples), 4),
+                "throughput_rps": round(len(ok) / wall_s, 2) if wall_s else 0.0,
+                "latency_ms": {f"p{p}": _round(percentile(latencies, p)) for p in (50, 95, 99)},
+                "ttft_ms": {f"p{p}": _round(percentile(ttfts, p)) for p in (50, 95, 99)} if ttfts else None
+            }
+
+        total = sum(e["requests"] for e in endpoints.values())
+        ok = sum(e["ok"] for e in endpoints.values())
+        return {
+            "wall_s": round(wall_s, 2),
+            "users_started": self.users_started,
+            "arrivals_dropped": self.arrivals_dropped,
+            "requests": total,
+            "ok": ok,
+            "error_rate": round(1 - ok / total, 4) if total else 0.0,
+            "throughput_rps": round(ok / wall_s, 2) if wall_s else 0.0,
+            "endpoints": endpoints
+        }
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+def render_markdown(report: Dict[str, Any]) -> str:
+    """Render a report as a Markdown summary table"""
+    summary = report["summary"]
+    config = report["config"]
+    lines = [
+        "# Load test report",
+        "",
+        f"- Target: {config['url']}{' (local, fake LLM)' if config['local'] else ''}",
+        f"- Arrivals: {config['rate']}/s {config['arrival']} for {config['duration']}s, "
+        f"{config['requests_per_user']} requests per user, think time {config['think_time_ms']} ms",
+        f"- Mix: {', '.join(f'{k} {w:.0%}' for k, w in config['mix'].items())}",
+        f"- Wall time {summary['wall_s']}s, {summary['users_started']} users, "
+        f"{summary['requests']} requests, {summary['throughput_rps']} ok req/s, "
+        f"error rate {summary['error_rate']:.2%}"
+        + (f", {summary['arrivals_dropped']} arrivals dropped at the user cap" if summary["arrivals_dropped"] else ""),
+        "",
+        "| Endpoint | Requests | Errors | Throughput (req/s) | p50 ms | p95 ms | p99 ms | TTFT p50 | TTFT p95 | TTFT p99 |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|"
+    ]
+    for kind, stats in summary["endpoints"].items():
+        latency = stats["latency_ms"]
+        ttft = stats["ttft_ms"] or {}
+        lines.append(
+            f"| {kind} | {stats['requests']} | {stats['error_rate']:.2%} | {stats['throughput_rps']} | "
+            + " | ".join(_cell(latency.get(p)) for p in ("p50", "p95", "p99")) + " | "
+            + " | ".join(_cell(ttft.get(p)) for p in ("p50", "p95", "p99")) + " |"
+        )
+
+    errors = {kind: stats["errors"] for kind, stats in summary["endpoints"].items() if stats["errors"]}
+    if errors:
+        lines += ["", "Errors:"]
+        for kind, counts in errors.items():
+            lines.append(f"- {kind}: " + ", ".join(f"{error} x{count}" for error, count in sorted(counts.items())))
+    return "\n".join(lines) + "\n"
+
+def _cell(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:g}"
+
+class LoadTest:
+    """Runs virtual users against one backend and collects their samples"""
+
+    def __init__(self, args: argparse.Namespace, queries: List[str]):
+        self.args = args
+        self.url = args.url.rstrip("/")
+        self.ws_url = self.url.replace("http", "ws", 1) + "/ws/simli"
+        self.mix = parse_mix(args.mix)
+        self.queries = queries
+        self.random = random.Random(args.seed)
+        self.results = Results()
+        self._users = asyncio.Semaphore(args.max_users)
+
+    async def run(self) -> Dict[str, Any]:
+        """Generate arrivals for the configured duration and wait for every user"""
+        limits = httpx.Limits(max_connections=self.args.max_users, max_keepalive_connections=self.args.max_users)
+        async with httpx.AsyncClient(timeout=self.args.timeout, limits=limits) as client:
+            self.client = client
+            started = time.perf_counter()
+            users = []
+            kinds, weights = zip(*self.mix.items())
+
+            while time.perf_counter() - started < self.args.duration:
+                if self._users.locked():
+                    self.results.arrivals_dropped += 1
+                else:
+                    kind = self.random.choices(kinds, weights)[0]
+                    users.append(asyncio.create_task(self._user(kind, self.results.users_started)))
+                    self.results.users_started += 1
+                await asyncio.sleep(self._interarrival())
+
+            await asyncio.gather(*users)
+            wall_s = time.perf_counter() - started
+            server = await self._server_stats()
+
+        return {
+            "config": {
+                "url": self.url,
+                "local": self.args.local,
+                "duration": self.args.duration,
+                "rate": self.args.rate,
+                "arrival": self.args.arrival,
+                "requests_per_user": self.args.requests_per_user,
+                "think_time_ms": self.args.think_time_ms,
+                "clients": self.args.clients,
+                "mix": self.mix,
+                "seed": self.args.seed
+            },
+            "summary": self.results.summary(wall_s),
+            "server": server
+        }
+
+    def _interarrival(self) -> float:
+        if self.args.arrival == "constant":
+            return 1 / self.args.rate
+        return self.random.expovariate(self.args.rate)
+
+    def _think(self) -> float:
+        if self.args.think_time_ms <= 0:
+            return 0.0
+        return self.random.expovariate(1000 / self.args.think_time_ms)
+
+    def _headers(self, user: int) -> Dict[str, str]:
+        """Spread users over --clients synthetic API keys so per-client limits see distinct clients"""
+        headers = {}
+        if self.args.api_key:
+            headers["X-API-Key"] = self.args.api_key
+        elif self.args.clients:
+            headers["X-API-Key"] = f"loadtest-{user % self.args.clients}"
+        if self.args.priority:
+            headers["X-Priority"] = self.args.priority
+        return headers
+
+    async def _user(self, kind: str, user: int):
+        async with self._users:
+            queries = [self.random.choice(self.queries) for _ in range(self.args.requests_per_user)]
+            thinks = [self._think() for _ in queries]
+            if kind == "ws":
+                await self._ws_user(queries, thinks, user)
+                return
+            for i, query in enumerate(queries):
+                if i:
+                    await asyncio.sleep(thinks[i])
+                await self._http_request(kind, query, self._headers(user))
+
+    async def _http_request(self, kind: str, query: str, headers: Dict[str, str]):
+        body = {"query": query, "include_context": not self.args.lean}
+        started = time.perf_counter()
+        ttft = None
+        try:
+            if kind == "query_stream":
+                async with self.client.stream("POST", f"{self.url}/query", json={**body, "stream": True}, headers=headers) as response:
+                    _raise_for_status(response)
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        event = json.loads(line[6:])
+                        if event.get("type") == "token" and ttft is None:
+                            ttft = _elapsed_ms(started)
+                        elif event.get("type") == "error":
+                            raise RuntimeError("stream_error")
+                        elif event.get("type") == "done":
+                            break
+            else:
+                path = "/query" if kind == "query" else "/retrieve_context"
+                response = await self.client.post(f"{self.url}{path}", json=body, headers=headers)
+                _raise_for_status(response)
+        except Exception as e:
+            self.results.record(kind, _elapsed_ms(started), error=_error_name(e))
+            return
+        self.results.record(kind, _elapsed_ms(started), ttft)
+
+    async def _ws_user(self, queries: List[str], thinks: List[float], user: int):
+        """One WebSocket session sending its queries in turn"""
+        try:
+            websocket = await websockets.connect(
+                self.ws_url, open_timeout=self.args.timeout, **{WS_HEADERS_ARG: self._headers(user)}
+            )
+        except Exception as e:
+            for _ in queries:
+                self.results.record("ws", 0.0, error=f"connect_{_error_name(e)}")
+            return
+
+        async with websocket:
+            for i, query in enumerate(queries):
+                if i:
+                    await asyncio.sleep(thinks[i])
+                started = time.perf_counter()
+                ttft = None
+                try:
+                    await websocket.send(json.dumps({"type": "query", "text": query, "stream": True, "request_id": f"q{i}"}))
+                    while True:
+                        message = json.loads(await asyncio.wait_for(websocket.recv(), self.args.timeout))
+                        if message.get("request_id") != f"q{i}":
+                            continue
+                        if message["type"] == "stream_chunk" and ttft is None:
+                            ttft = _elapsed_ms(started)
+                        elif message["type"] == "stream_complete":
+                            break
+                        elif message["type"] == "error":
+                            raise RuntimeError(f"http_{message['status']}" if "status" in message else "ws_error")
+                except Exception as e:
+                    self.results.record("ws", _elapsed_ms(started), error=_error_name(e))
+                    if isinstance(e, websockets.ConnectionClosed):
+                        return
+                    continue
+                self.results.record("ws", _elapsed_ms(started), ttft)
+
+    async def _server_stats(self) -> Dict[str, Any]:
+        """Server-side admission and usage counters after the run, when reachable"""
+        stats = {}
+        for name, path in (("admission", "/admin/admission"), ("usage", "/admin/usage")):
+            try:
+                response = await self.client.get(f"{self.url}{path}")
+                if response.status_code == 200:
+                    stats[name] = response.json()
+            except httpx.HTTPError:
+                pass
+        return stats
+
+def _raise_for_status(response: httpx.Response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"http_{response.status_code}")
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+def _error_name(error: Exception) -> str:
+    if isinstance(error, RuntimeError) and error.args:
+        return str(error.args[0])
+    if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return "timeout"
+    return type(error).__name__
+
+def start_local_server(args: argparse.Namespace) -> subprocess.Popen:
+    """Start the backend with the fake provider and a fresh index, and wait until /ready says ready"""
+    backend = Path(__file__).resolve().parent.parent
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "OPENAI_API_KEY": "",
+        "CHROMA_PERSIST_DIR": str(workdir / "chroma"),
+        "LEADER_ELECTION": "none",
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+        "WARMUP_STEPS": "tokenizer,connections,vector_index"
+    }
+    if args.kb:
+        env["KNOWLEDGE_BASE_PATH"] = str(Path(args.kb).resolve())
+    port = args.url.rsplit(":", 1)[-1].split("/")[0]
+    log_path = workdir / "server.log"
+    print(f"Starting local server on port {port} (log: {log_path})", file=sys.stderr)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", port, "--log-level", "warning"],
+        cwd=backend,
+        env=env,
+        stdout=open(log_path, "w"),
+        stderr=subprocess.STDOUT
+    )
+
+    deadline = time.time() + 180
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Local server exited with code {server.returncode}; see {log_path}")
+        try:
+            ready = httpx.get(f"{args.url}/ready", timeout=2)
+            if ready.status_code == 200 and ready.json().get("status") == "ready":
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"Local server did not become ready; see {log_path}")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test /query, /retrieve_context and /ws/simli")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--local", action="store_true", help="Start the backend on --url's port with the fake LLM")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds during which users arrive")
+    parser.add_argument("--rate", type=float, default=5, help="User arrivals per second")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--mix", default="query:0.4,query_stream:0.2,retrieve_context:0.2,ws:0.2",
+                        help="Weighted request kinds: " + ", ".join(KINDS))
+    parser.add_argument("--requests-per-user", type=int, default=3, help="Requests each user sends in turn")
+    parser.add_argument("--think-time-ms", type=float, default=1000, help="Mean pause between a user's requests")
+    parser.add_argument("--max-users", type=int, default=500, help="Concurrent users; arrivals beyond are dropped")
+    parser.add_argument("--clients", type=int, default=50, help="Synthetic API keys users are spread over (0 sends none)")
+    parser.add_argument("--api-key", help="Send this API key for every user instead")
+    parser.add_argument("--priority", choices=("batch",), help="Send X-Priority to run in the batch lane")
+    parser.add_argument("--lean", action="store_true", help="Request responses without context text")
+    parser.add_argument("--queries", help="File with one query per line (default: built-in set)")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for arrivals, mix and query choice")
+    parser.add_argument("--json-out", help="Write the JSON report here")
+    parser.add_argument("--markdown-out", help="Write the Markdown report here (printed when unset)")
+    local = parser.add_argument_group("local server (--local)")
+    local.add_argument("--kb", help="Knowledge base JSON to ingest (default: the server's KNOWLEDGE_BASE_PATH)")
+    local.add_argument("--llm-latency-ms", type=float, default=150)
+    local.add_argument("--tokens-per-second", type=float, default=60)
+    local.add_argument("--embedding-latency-ms", type=float, default=15)
+    local.add_argument("--llm-cache", action="store_true", help="Keep the answer cache on (off by default)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    server = start_local_server(args) if args.local else None
+    try:
+        report = asyncio.run(LoadTest(args, queries).run())
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    markdown = render_markdown(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.markdown_out:
+        with open(args.markdown_out, "w", encoding="utf-8") as f:
+            f.write(markdown)
+    else:
+        print(markdown)
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,9 @@ class QueryRequest(BaseModel):
     num_results: Optional[int] = Field(5, description="Number of context chunks to retrieve")
     stream: Optional[bool] = Field(False, description="Whether to stream the response")
     session_id: Optional[str] = Field(None, description="Session ID for conversation continuity")
+    include_usage: Optional[bool] = Field(False, description="Include token, cost and timing breakdown in the response")
+    include_context: Optional[bool] = Field(True, description="Include the retrieved context text in the response")
+    fields: Optional[List[str]] = Field(None, description="Response fields to return (all when unset)")
     
     class Config:
         json_schema_extra = {
@@ -56,6 +59,7 @@ class QueryResponse(BaseModel):
     confidence: float = Field(..., ge=0.0, le=1.0)
     sources: Optional[List[str]] = None
     processing_time_ms: Optional[float] = None
+    processing_steps: Optional[Dict[str, float]] = None
     
     class Config:
         json_schema_extra = {
@@ -70,6 +74,7 @@ class QueryResponse(BaseModel):
 class IngestResponse(BaseModel):
     status: str
     message: str
+    job_id: Optional[str] = None
     entries_processed: Optional[int] = None
     entries_added: Optional[int] = None
     entries_updated: Optional[int] = None
@@ -115,4 +120,5 @@ class RAGResponse(BaseModel):
     answer: str
     confidence: float
     sources: List[str]
-    processing_steps: Dict[str, float]  # timing for each step
\ No newline at end of file
+    processing_steps: Dict[str, float]  # timing for each step
+    retrieval_scores: List[float] = []  # relevance of each retrieved chunk
\ No newline at end of file
@@ -0,0 +1,354 @@
+"""
+Admission control for query pipelines
+Caps how many /query, /retrieve_context and WebSocket pipelines run at once,
+grants waiting requests by priority lane (voice > agent > batch) and
+rate-limits each client (API key or IP) with a token bucket. Requests that
+cannot be admitted quickly are refused with 429 or 503 and a Retry-After.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from services.upstream_governor import Priority, TokenBucket, upstream_priority
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+class Lane(IntEnum):
+    """Lower values are admitted first"""
+    VOICE = 0
+    AGENT = 1
+    BATCH = 2
+
+# Upstream priority of the OpenAI calls each lane makes
+LANE_PRIORITY = {
+    Lane.VOICE: Priority.VOICE,
+    Lane.AGENT: Priority.INTERACTIVE,
+    Lane.BATCH: Priority.INGEST
+}
+
+RATE_LIMITED = "rate_limited"
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+class AdmissionRejected(Exception):
+    """A request was refused; status_code is 429 (client over its rate) or 503 (saturated)"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionLease:
+    """A granted pipeline slot; release it exactly once"""
+
+    def __init__(self, lane: Lane):
+        self.lane = lane
+        self.granted_at = time.monotonic()
+        self.released = False
+
+def client_id(headers: Headers, host: Optional[str]) -> str:
+    """
+    Identity that rate limits apply to
+
+    The API key when one is sent (hashed, so it never appears in metrics),
+    otherwise the client address.
+    """
+    api_key = api_key_of(headers)
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    if settings.ADMISSION_TRUST_FORWARDED_FOR:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            # The address our proxy appended; earlier hops are client-supplied
+            return "ip:" + forwarded.split(",")[-1].strip()
+    return f"ip:{host or 'unknown'}"
+
+def api_key_of(headers: Headers) -> Optional[str]:
+    """API key from X-API-Key or a bearer Authorization header"""
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:].strip() or None
+    return headers.get("x-api-key") or None
+
+class AdmissionController:
+    """
+    Concurrency limit with priority lanes and per-client token buckets
+
+    Voice has ADMISSION_VOICE_RESERVED slots that other lanes cannot take,
+    and batch is further capped, so an evaluation run or one chatty agent
+    leaves room for live avatar sessions. Waiters are granted strictly by
+    lane, then FIFO; each lane waits at most its queue timeout.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        voice_reserved: int = 0,
+        batch_max_concurrent: int = 0,
+        max_queue: int = 64,
+        queue_timeouts: Optional[Dict[Lane, float]] = None,
+        client_rpm: int = 0,
+        client_burst: int = 0
+    ):
+        """
+        Args:
+            max_concurrent: Pipelines running at once across all lanes
+            voice_reserved: Slots only the voice lane may use
+            batch_max_concurrent: Cap on batch pipelines (0 means no extra cap)
+            max_queue: Waiters beyond which requests are refused at once
+            queue_timeouts: Longest wait per lane, in seconds
+            client_rpm: Requests per minute per client (0 disables)
+            client_burst: Bucket size per client (defaults to client_rpm)
+        """
+        self.max_concurrent = max_concurrent
+        self.voice_reserved = min(voice_reserved, max_concurrent - 1)
+        self.batch_max_concurrent = batch_max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeouts = queue_timeouts or {lane: 1.0 for lane in Lane}
+        self.client_rpm = client_rpm
+        self.client_burst = client_burst or client_rpm
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.in_flight: Dict[Lane, int] = {lane: 0 for lane in Lane}
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+
+        # Metrics
+        self.admitted: Dict[Lane, int] = {lane: 0 for lane in Lane}
+        self.rejected: Dict[Lane, Dict[str, int]] = {
+            lane: {RATE_LIMITED: 0, QUEUE_FULL: 0, QUEUE_TIMEOUT: 0} for lane in Lane
+        }
+        self._waits_ms: Dict[Lane, deque] = {lane: deque(maxlen=1000) for lane in Lane}
+        self._hold_s: deque = deque(maxlen=200)
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        """Build a controller with configured limits"""
+        return cls(
+            max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+            voice_reserved=settings.ADMISSION_VOICE_RESERVED,
+            batch_max_concurrent=settings.ADMISSION_BATCH_MAX_CONCURRENT,
+            max_queue=settings.ADMISSION_MAX_QUEUE,
+            queue_timeouts={
+                Lane.VOICE: settings.ADMISSION_VOICE_QUEUE_TIMEOUT_MS / 1000,
+                Lane.AGENT: settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+                Lane.BATCH: settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000
+            },
+            client_rpm=settings.ADMISSION_CLIENT_RPM,
+            client_burst=settings.ADMISSION_CLIENT_BURST
+        )
+
+    async def acquire(self, lane: Lane, client: str) -> AdmissionLease:
+        """
+        Wait for a pipeline slot in the given lane
+
+        Args:
+            lane: Priority lane of the request
+            client: Rate-limit identity (see client_id)
+
+        Raises:
+            AdmissionRejected: Over the client's rate (429), or no slot within the lane's timeout (503)
+        """
+        self._check_rate(lane, client)
+
+        if not self._queue and self._has_room(lane):
+            self._waits_ms[lane].append(0.0)
+            return self._grant(lane)
+
+        # Voice waiters are bounded by WebSocket connections, not the queue cap
+        if lane != Lane.VOICE and len(self._queue) >= self.max_queue:
+            raise self._reject(lane, QUEUE_FULL, 503, "Server is saturated")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (int(lane), next(self._sequence), future)
+        heapq.heappush(self._queue, entry)
+        enqueued = time.monotonic()
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeouts[lane])
+        except asyncio.TimeoutError:
+            self._forget(entry)
+            if not future.done():
+                future.cancel()
+                raise self._reject(lane, QUEUE_TIMEOUT, 503, "Timed out waiting for capacity")
+        except asyncio.CancelledError:
+            self._forget(entry)
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                self.release(future.result())
+            raise
+
+        lease = future.result()
+        self._waits_ms[lane].append((time.monotonic() - enqueued) * 1000)
+        return lease
+
+    def release(self, lease: Optional[AdmissionLease]):
+        """Free a slot and admit the next waiter"""
+        if lease is None or lease.released:
+            return
+        lease.released = True
+        self.in_flight[lease.lane] -= 1
+        self._hold_s.append(time.monotonic() - lease.granted_at)
+        self._dispatch()
+
+    def _has_room(self, lane: Lane) -> bool:
+        total = sum(self.in_flight.values())
+        if lane == Lane.VOICE:
+            return total < self.max_concurrent
+        if lane == Lane.BATCH and self.batch_max_concurrent and self.in_flight[Lane.BATCH] >= self.batch_max_concurrent:
+            return False
+        return total < self.max_concurrent - self.voice_reserved
+
+    def _grant(self, lane: Lane) -> AdmissionLease:
+        self.in_flight[lane] += 1
+        self.admitted[lane] += 1
+        return AdmissionLease(lane)
+
+    def _dispatch(self):
+        """Grant queued requests in lane order while capacity allows"""
+        while self._queue:
+            lane, _, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            if not self._has_room(Lane(lane)):
+                return
+            heapq.heappop(self._queue)
+            future.set_result(self._grant(Lane(lane)))
+
+    def _forget(self, entry: tuple):
+        """Drop a waiter that gave up"""
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+
+    def _check_rate(self, lane: Lane, client: str):
+        """Take one token from the client's bucket or refuse with 429"""
+        if not self.client_rpm:
+            return
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= 10000:
+                self._prune_buckets()
+            bucket = self._buckets[client] = TokenBucket(self.client_rpm, burst=self.client_burst)
+        wait = bucket.wait_time(1)
+        if wait > 0:
+            raise self._reject(lane, RATE_LIMITED, 429, "Rate limit exceeded", retry_after=wait)
+        bucket.take(1)
+
+    def _prune_buckets(self):
+        """Forget clients whose buckets have refilled (they are back to a fresh state)"""
+        for client in [c for c, bucket in self._buckets.items() if bucket.wait_time(bucket.capacity) == 0]:
+            del self._buckets[client]
+
+    def _reject(
+        self,
+        lane: Lane,
+        reason: str,
+        status_code: int,
+        message: str,
+        retry_after: Optional[float] = None
+    ) -> AdmissionRejected:
+        self.rejected[lane][reason] += 1
+        if retry_after is None:
+            # Roughly when the queue ahead would have drained
+            hold = sum(self._hold_s) / len(self._hold_s) if self._hold_s else 1.0
+            retry_after = hold * (len(self._queue) + 1) / self.max_concurrent
+        retry_after = max(1, math.ceil(retry_after))
+        return AdmissionRejected(status_code, reason, retry_after, f"{message}; retry after {retry_after}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return slot usage, queue depth, wait times and rejections per lane"""
+        depth = {lane.name.lower(): 0 for lane in Lane}
+        for lane, _, future in self._queue:
+            if not future.done():
+                depth[Lane(lane).name.lower()] += 1
+
+        waits = {}
+        for lane, samples in self._waits_ms.items():
+            ordered = sorted(samples)
+            waits[lane.name.lower()] = {
+                "count": len(ordered),
+                "avg_ms": sum(ordered) / len(ordered) if ordered else 0.0,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0,
+                "max_ms": ordered[-1] if ordered else 0.0
+            }
+
+        return {
+            "max_concurrent": self.max_concurrent,
+            "voice_reserved": self.voice_reserved,
+            "in_flight": {lane.name.lower(): n for lane, n in self.in_flight.items()},
+            "queue_depth": depth,
+            "admitted": {lane.name.lower(): n for lane, n in self.admitted.items()},
+            "rejected": {lane.name.lower(): dict(counts) for lane, counts in self.rejected.items()},
+            "wait_ms": waits,
+            "clients_tracked": len(self._buckets)
+        }
+
+# Global admission controller for this process
+admission = AdmissionController.from_settings()
+
+class AdmissionMiddleware:
+    """
+    Admits HTTP requests for pipeline routes through the controller
+
+    The slot is held until the response has been sent, so a streamed (SSE)
+    answer counts for its whole duration. Agent requests move to the batch
+    lane with an "X-Priority: batch" header or a key listed in
+    ADMISSION_BATCH_API_KEYS; nothing can claim the voice lane over HTTP.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, routes: Dict[str, Lane]):
+        """
+        Args:
+            controller: Admission controller to use
+            routes: Lane for each admitted path; other paths pass through
+        """
+        self.app = app
+        self.controller = controller
+        self.routes = routes
+        self.batch_keys = {key.strip() for key in settings.ADMISSION_BATCH_API_KEYS.split(",") if key.strip()}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        lane = self.routes.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if lane is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if lane == Lane.AGENT and (
+            headers.get("x-priority", "").lower() == "batch" or api_key_of(headers) in self.batch_keys
+        ):
+            lane = Lane.BATCH
+
+        client = scope.get("client")
+        try:
+            lease = await self.controller.acquire(lane, client_id(headers, client[0] if client else None))
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {"detail": str(e), "reason": e.reason},
+                status_code=e.status_code,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            with upstream_priority(LANE_PRIORITY[lane]):
+                await self.app(scope, receive, send)
+        finally:
+            self.controller.release(lease)
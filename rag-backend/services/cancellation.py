@@ -0,0 +1,130 @@
+"""
+Client disconnect handling
+Ties a request's pipeline to its client: when the client goes away the
+pipeline task is cancelled, which closes upstream streams and aborts
+pending calls, and the work that was avoided is counted here
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Dict
+
+from fastapi import Request
+
+from services.usage_tracker import current_usage, estimate_cost
+
+logger = logging.getLogger(__name__)
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready"""
+
+class CancellationStats:
+    """Upstream work abandoned for departed clients, and what it saved"""
+
+    def __init__(self, window: int = 200):
+        """
+        Args:
+            window: Finished completions per model used to estimate answer length
+        """
+        self.window = window
+        self.counters = {
+            "http_disconnects": 0,
+            "llm_streams_closed": 0,
+            "llm_calls_aborted": 0,
+            "embedding_calls_aborted": 0
+        }
+        self.tokens_saved = 0
+        self.cost_saved_usd = 0.0
+        self._completions: Dict[str, deque] = {}
+
+    def record_completion(self, model: str, completion_tokens: int):
+        """Remember the length of a finished answer"""
+        lengths = self._completions.get(model)
+        if lengths is None:
+            lengths = self._completions[model] = deque(maxlen=self.window)
+        lengths.append(completion_tokens)
+
+    def expected_completion_tokens(self, model: str, max_tokens: int) -> int:
+        """Typical answer length for a model (max_tokens until one has finished)"""
+        lengths = self._completions.get(model)
+        if not lengths:
+            return max_tokens
+        return min(max_tokens, round(sum(lengths) / len(lengths)))
+
+    def record_stream_closed(self, model: str, generated_tokens: int, max_tokens: int) -> int:
+        """
+        Count a stream closed before it finished
+
+        Returns:
+            Estimated completion tokens not generated
+        """
+        saved = max(0, self.expected_completion_tokens(model, max_tokens) - generated_tokens)
+        cost = estimate_cost(model, 0, saved)
+        self.counters["llm_streams_closed"] += 1
+        self.tokens_saved += saved
+        self.cost_saved_usd += cost
+
+        tracker = current_usage.get()
+        if tracker is not None:
+            tracker.tokens_saved += saved
+        return saved
+
+    def record_aborted(self, kind: str):
+        """Count an aborted call ("llm" or "embedding") or an "http" disconnect"""
+        key = {
+            "llm": "llm_calls_aborted",
+            "embedding": "embedding_calls_aborted",
+            "http": "http_disconnects"
+        }[kind]
+        self.counters[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cancellation counters and estimated savings"""
+        return {
+            **self.counters,
+            "tokens_saved": self.tokens_saved,
+            "cost_saved_usd": round(self.cost_saved_usd, 6)
+        }
+
+# Global counters for this process
+cancellation_stats = CancellationStats()
+
+async def _wait_for_disconnect(request: Request):
+    """Return once the ASGI server reports that the client has gone"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def run_until_disconnect(request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await a request's work, cancelling it if the client disconnects first
+
+    Only for endpoints whose body has already been read; the ASGI receive
+    channel then carries nothing but the disconnect.
+
+    Raises:
+        ClientDisconnected: The client left and the work was cancelled
+    """
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+
+    try:
+        done, _ = await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if work in done:
+            return work.result()
+
+        work.cancel()
+        await asyncio.gather(work, return_exceptions=True)
+        cancellation_stats.record_aborted("http")
+        tracker = current_usage.get()
+        if tracker is not None:
+            tracker.cancelled = True
+        logger.info("Client disconnected; request cancelled")
+        raise ClientDisconnected()
+
+    finally:
+        for task in (work, watcher):
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,141 @@
+"""
+Response compression negotiated from Accept-Encoding
+Complete responses above a size threshold are sent brotli- or
+gzip-compressed; streamed responses (SSE) pass through untouched so tokens
+are not held back in a compressor's buffer.
+"""
+
+import gzip
+import logging
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the encoding to use for a request
+
+    Args:
+        accept_encoding: The request's Accept-Encoding header
+
+    Returns:
+        "br", "gzip" or None, preferring brotli when it is installed
+    """
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    available: List[str] = (["br"] if brotli else []) + ["gzip"]
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the negotiated encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL)
+
+class CompressionStats:
+    """Bytes saved by compression, per encoding"""
+
+    def __init__(self):
+        self.responses: Dict[str, int] = {}
+        self.bytes_in: Dict[str, int] = {}
+        self.bytes_out: Dict[str, int] = {}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int):
+        self.responses[encoding] = self.responses.get(encoding, 0) + 1
+        self.bytes_in[encoding] = self.bytes_in.get(encoding, 0) + bytes_in
+        self.bytes_out[encoding] = self.bytes_out.get(encoding, 0) + bytes_out
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            encoding: {
+                "responses": count,
+                "bytes_in": self.bytes_in[encoding],
+                "bytes_out": self.bytes_out[encoding],
+                "ratio": round(self.bytes_out[encoding] / max(self.bytes_in[encoding], 1), 3)
+            }
+            for encoding, count in self.responses.items()
+        }
+
+# Global compression statistics for this process
+compression_stats = CompressionStats()
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete responses of at least minimum_size bytes
+
+    A response is compressed only when it arrives as a single body message,
+    which is how JSON responses are sent; anything streamed, or already
+    encoded, is forwarded as is.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                # Held until the first body message shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough or start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith("text/event-stream")
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            compression_stats.record(encoding, len(body), len(compressed))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
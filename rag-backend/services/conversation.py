@@ -0,0 +1,241 @@
+"""
+Conversation-aware retrieval and prompting
+Rewrites follow-up questions into standalone retrieval queries, reuses the
+previous turn's retrieved entries when a follow-up stays on the same topic,
+and compacts session history into a fixed token budget for the prompt
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from services.upstream_governor import governor
+from utils.config import settings
+from utils.text_processor import TextProcessor
+
+logger = logging.getLogger(__name__)
+
+# Openings that always continue the previous turn
+_FOLLOW_UP_PATTERN = re.compile(r"^(and|also|what about|how about|tell me more|more about|what else)\b")
+
+# Words that may refer back to earlier turns, but also occur in standalone questions
+_REFERENCE_PATTERN = re.compile(
+    r"\b(it|its|that|this|those|these|they|them|their|there|that one|this one|"
+    r"the same|the first|the second|the last|above|previous|former|latter)\b"
+)
+
+# Words extract_keywords keeps that say nothing about the topic of a question
+_NON_TOPIC_WORDS = {
+    "what", "which", "when", "where", "about", "tell", "more", "else", "also",
+    "they", "them", "their", "there", "same", "first", "second", "last", "above",
+    "previous", "former", "latter", "much", "many", "like", "know", "please"
+}
+
+_CAPITALIZED_PATTERN = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][\w'-]{2,}")
+
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+class ConversationContext(BaseModel):
+    """What the pipeline needs to answer a query within its session"""
+    retrieval_query: str
+    history_messages: List[Dict[str, str]] = []
+    history_tokens: int = 0
+    rewritten: bool = False
+    reuse_context: Optional[str] = None
+    reuse_scores: List[float] = []
+    merge_context: Optional[str] = None
+    prefetched: bool = False
+
+    @property
+    def standalone(self) -> bool:
+        """Whether the answer depends on nothing but the query text"""
+        return not self.history_messages and self.reuse_context is None
+
+    def merged(self, context: str) -> str:
+        """Freshly retrieved context, followed by the previous turn's when it may be referred to"""
+        if not self.merge_context or self.merge_context in context:
+            return context
+        return f"{context}\n\n---\n\n{self.merge_context}"
+
+class ConversationManager:
+    """Builds a ConversationContext from a query and its session"""
+
+    def __init__(
+        self,
+        history_token_budget: int = 600,
+        answer_token_limit: int = 120,
+        reuse_context: bool = True,
+        model: str = "gpt-4o"
+    ):
+        """
+        Args:
+            history_token_budget: Hard cap on tokens of history put in the prompt
+            answer_token_limit: Earlier answers are cut to this many tokens
+            reuse_context: Reuse the previous turn's context for same-topic follow-ups
+            model: Model whose tokenizer is used for budgeting
+        """
+        self.history_token_budget = history_token_budget
+        self.answer_token_limit = answer_token_limit
+        self.reuse_context = reuse_context
+        self.model = model
+        self.text_processor = TextProcessor()
+
+    @classmethod
+    def from_settings(cls) -> "ConversationManager":
+        """Build a manager from configured budgets"""
+        return cls(
+            history_token_budget=settings.CONVERSATION_HISTORY_TOKEN_BUDGET,
+            answer_token_limit=settings.CONVERSATION_ANSWER_TOKEN_LIMIT,
+            reuse_context=settings.CONVERSATION_REUSE_CONTEXT,
+            model=settings.LLM_MODEL
+        )
+
+    def prepare(self, query: str, session: Optional[Dict[str, Any]]) -> ConversationContext:
+        """
+        Build retrieval query, reusable context and prompt history for a turn
+
+        Args:
+            query: The new user query
+            session: Session record from the session store (or None)
+        """
+        history = (session or {}).get("history") or []
+        if not history:
+            return ConversationContext(retrieval_query=query)
+
+        last_turn = history[-1]
+        last_context = session.get("last_context")
+        follow_up = self.is_follow_up(query, last_turn, last_context)
+        messages, tokens = self.compact_history(history)
+
+        conversation = ConversationContext(
+            retrieval_query=self.rewrite_query(query, last_turn) if follow_up else query,
+            history_messages=messages,
+            history_tokens=tokens,
+            rewritten=follow_up
+        )
+
+        if (
+            self.reuse_context
+            and follow_up
+            and last_context
+            and not self._mentions_new_entity(query, last_context)
+        ):
+            conversation.reuse_context = last_context
+            conversation.reuse_scores = session.get("last_scores") or []
+        elif not follow_up and last_context and _REFERENCE_PATTERN.search(query.lower()):
+            # "Is it open to sculptors?" may or may not mean the last entry:
+            # search for the question as asked and keep the last context too
+            conversation.merge_context = last_context
+
+        return conversation
+
+    def is_follow_up(self, query: str, last_turn: Dict[str, Any], last_context: Optional[str] = None) -> bool:
+        """
+        Whether the query leans on earlier turns to be understood
+
+        True for explicit continuations ("and ...", "what about ...") and
+        for back-references ("when is its deadline?") that add no topic
+        of their own beyond the previous query and context.
+        """
+        text = query.lower().strip()
+        if _FOLLOW_UP_PATTERN.search(text):
+            return True
+        if not _REFERENCE_PATTERN.search(text):
+            return False
+
+        previous = f"{last_turn.get('query', '')} {' '.join(last_turn.get('sources') or [])} {last_context or ''}"
+        known = set(re.findall(r"[a-z]+", previous.lower()))
+        new_topic = set(self.text_processor.extract_keywords(text)) - known - _NON_TOPIC_WORDS
+        return not new_topic
+
+    @staticmethod
+    def rewrite_query(query: str, last_turn: Dict[str, Any]) -> str:
+        """
+        Make a follow-up standalone for retrieval
+
+        Appends the entries the previous answer drew on (or, without
+        sources, the previous question) so "what about the deadline for
+        that one?" retrieves the program being discussed.
+        """
+        sources = last_turn.get("sources") or []
+        anchor = ", ".join(sources[:2]) if sources else last_turn.get("query", "")
+        return f"{query} ({anchor})" if anchor else query
+
+    def compact_history(self, history: List[Dict[str, Any]]):
+        """
+        Fit recent turns into the history token budget
+
+        Newest turns are kept verbatim (answers cut to answer_token_limit)
+        until the budget runs out; older turns collapse into a one-line
+        summary of what was asked if that still fits.
+
+        Returns:
+            Tuple of (chat messages, tokens used)
+        """
+        pairs = []  # (messages, tokens), oldest first
+        used = 0
+
+        for turn in reversed(history):
+            answer = self._truncate(turn.get("response", ""), self.answer_token_limit)
+            cost = self._tokens(turn["query"]) + self._tokens(answer) + 8
+            if used + cost > self.history_token_budget:
+                break
+            pairs.insert(0, ([
+                {"role": "user", "content": turn["query"]},
+                {"role": "assistant", "content": answer}
+            ], cost))
+            used += cost
+
+        summary = None
+        while len(pairs) < len(history):
+            older = history[:len(history) - len(pairs)]
+            topics = "; ".join(turn["query"] for turn in older[-5:])
+            text = f"Earlier in this conversation the user asked: {topics}"
+            cost = self._tokens(text) + 4
+            if used + cost <= self.history_token_budget:
+                summary = {"role": "system", "content": text}
+                used += cost
+                break
+            if len(pairs) <= 1:
+                break
+            # Fold the oldest verbatim turn into the summary to make room
+            used -= pairs.pop(0)[1]
+
+        messages = [summary] if summary else []
+        for pair, _ in pairs:
+            messages.extend(pair)
+        return messages, used
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to whole sentences within max_tokens (at least one sentence)"""
+        if self._tokens(text) <= max_tokens:
+            return text
+
+        kept = []
+        used = 0
+        for sentence in _SENTENCE_PATTERN.split(text):
+            cost = self._tokens(sentence)
+            if kept and used + cost > max_tokens:
+                break
+            kept.append(sentence)
+            used += cost
+
+        shortened = " ".join(kept)
+        if self._tokens(shortened) > max_tokens:
+            # A single runaway sentence: fall back to a character cut
+            shortened = shortened[:max_tokens * 4]
+        return shortened + " …"
+
+    def _tokens(self, text: str) -> int:
+        return governor.estimate_tokens([text], self.model)
+
+    @staticmethod
+    def _mentions_new_entity(query: str, context: str) -> bool:
+        """Whether the query names something absent from the previous context"""
+        context_lower = context.lower()
+        return any(
+            name.lower() not in context_lower
+            for name in _CAPITALIZED_PATTERN.findall(query)
+        )
@@ -17,6 +17,7 @@ from pydantic import BaseModel, Field
 
 from utils.config import settings
 from services.vector_store import VectorStoreService
+from services.ingest_jobs import SUCCEEDED, ingest_jobs
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -397,7 +398,10 @@ class DataUpdaterService:
     async def _reingest_vector_store(self):
         """Trigger re-ingestion of updated data into vector store"""
         try:
-            await self.vector_store.ingest_data()
+            # Queue behind any ingest job already running
+            job = await ingest_jobs.run("scheduled update", self.vector_store.ingest_data)
+            if job.status != SUCCEEDED:
+                raise RuntimeError(f"Ingest job {job.id} {job.status}: {job.error}")
             logger.info("Successfully re-ingested data into vector store")
         except Exception as e:
             logger.error(f"Error re-ingesting data: {e}")
@@ -0,0 +1,287 @@
+"""
+Deterministic stand-in for the OpenAI chat and embedding APIs
+Used for offline load tests and benchmarks: answers and vectors depend only
+on the input, and latency follows a configurable time-to-first-token and
+token rate. Runs in-process (see services.llm_providers.FakeProvider) or as
+a localhost server speaking the OpenAI wire format:
+
+    python -m services.fake_llm --port 8100
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 LLM_PROVIDER=openai ...
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.config import settings
+
+_VOCABULARY = (
+    "artists residency grant funding deadline application studio program "
+    "fellowship stipend housing support project proposal portfolio jury "
+    "community exhibition practice visual writers musicians eligibility "
+    "international emerging established annual award travel materials "
+    "review selection criteria budget period weeks months open call"
+).split()
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+class FakeLanguageModel:
+    """Seeded text and embedding generator with a simple latency model"""
+
+    def __init__(
+        self,
+        latency_ms: float = 150,
+        tokens_per_second: float = 60,
+        response_tokens: int = 120,
+        chunk_tokens: int = 1,
+        embedding_latency_ms: float = 15,
+        embedding_dimensions: int = 1536
+    ):
+        """
+        Args:
+            latency_ms: Delay before the first token (or the embedding batch)
+            tokens_per_second: Generation rate after the first token (0 is instant)
+            response_tokens: Length of every answer unless max_tokens is lower
+            chunk_tokens: Tokens per streamed chunk
+            embedding_latency_ms: Delay per embedding request
+            embedding_dimensions: Vector size (1536 matches text-embedding-ada-002)
+        """
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.embedding_latency_ms = embedding_latency_ms
+        self.embedding_dimensions = embedding_dimensions
+
+    @classmethod
+    def from_settings(cls) -> "FakeLanguageModel":
+        """Build the model from FAKE_LLM_* settings"""
+        return cls(
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+            response_tokens=settings.FAKE_LLM_RESPONSE_TOKENS,
+            chunk_tokens=settings.FAKE_LLM_CHUNK_TOKENS,
+            embedding_latency_ms=settings.FAKE_EMBEDDING_LATENCY_MS
+        )
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Approximate token count (one per word)"""
+        return len(_WORD_PATTERN.findall(text))
+
+    def answer_tokens(self, model: str, messages: List[Dict[str, str]], max_tokens: Optional[int]) -> Tuple[List[str], str]:
+        """
+        Deterministic answer for a conversation
+
+        Returns:
+            Tuple of (token strings, finish_reason)
+        """
+        seed = hashlib.sha256(
+            json.dumps({"model": model, "messages": messages}, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        rng = random.Random(seed)
+
+        tokens: List[str] = []
+        sentence_length = 0
+        target_length = rng.randint(8, 16)
+        while len(tokens) < self.response_tokens:
+            word = rng.choice(_VOCABULARY)
+            if sentence_length == 0:
+                word = word.capitalize()
+            sentence_length += 1
+            if sentence_length == target_length:
+                word += "."
+                sentence_length = 0
+                target_length = rng.randint(8, 16)
+            tokens.append(word if not tokens else f" {word}")
+
+        if tokens and not tokens[-1].endswith("."):
+            tokens[-1] += "."
+
+        if max_tokens is not None and max_tokens < len(tokens):
+            return tokens[:max_tokens], "length"
+        return tokens, "stop"
+
+    def embed(self, text: str) -> List[float]:
+        """Hashed bag-of-words unit vector; texts sharing words are close"""
+        vector = np.zeros(self.embedding_dimensions, dtype=np.float32)
+        for word in _WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.embedding_dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None
+    ) -> Tuple[str, str]:
+        """Wait for the full generation time and return (text, finish_reason)"""
+        tokens, finish_reason = self.answer_tokens(model, messages, max_tokens)
+        await asyncio.sleep(self.latency_ms / 1000 + self._generation_seconds(len(tokens)))
+        return "".join(tokens), finish_reason
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """Yield (content, finish_reason) chunks paced at the token rate"""
+        tokens, finish_reason = self.answer_tokens(model, messages, max_tokens)
+        await asyncio.sleep(self.latency_ms / 1000)
+
+        start = time.monotonic()
+        for i in range(0, len(tokens), self.chunk_tokens):
+            # Pace against the stream start so sleep overshoot does not accumulate
+            delay = self._generation_seconds(i) - (time.monotonic() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield "".join(tokens[i:i + self.chunk_tokens]), None
+
+        yield "", finish_reason
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch after the configured request latency"""
+        await asyncio.sleep(self.embedding_latency_ms / 1000)
+        return [self.embed(text) for text in texts]
+
+    def _generation_seconds(self, tokens: int) -> float:
+        """Time to generate tokens after the first one"""
+        if not self.tokens_per_second:
+            return 0.0
+        return tokens / self.tokens_per_second
+
+def create_app(model: Optional[FakeLanguageModel] = None):
+    """FastAPI app serving /v1/chat/completions and /v1/embeddings"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    engine = model or FakeLanguageModel.from_settings()
+    app = FastAPI(title="Fake OpenAI API")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model_name = body.get("model", "fake")
+        messages = body.get("messages", [])
+        max_tokens = body.get("max_tokens")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        prompt_tokens = sum(engine.count_tokens(m.get("content") or "") for m in messages)
+
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+            async def events():
+                completion_tokens = 0
+                async for content, finish_reason in engine.stream(model_name, messages, max_tokens):
+                    completion_tokens += engine.count_tokens(content)
+                    delta = {"content": content} if content else {}
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model_name,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+
+                if include_usage:
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model_name,
+                        "choices": [],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens
+                        }
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        text, finish_reason = await engine.complete(model_name, messages, max_tokens)
+        completion_tokens = engine.count_tokens(text)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model_name,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": finish_reason
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs: Union[str, List[str]] = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+
+        vectors = await engine.embed_batch(inputs)
+        tokens = sum(engine.count_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": vector}
+                for i, vector in enumerate(vectors)
+            ],
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    return app
+
+def main():
+    """Run the fake OpenAI server"""
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=settings.FAKE_LLM_LATENCY_MS)
+    parser.add_argument("--tokens-per-second", type=float, default=settings.FAKE_LLM_TOKENS_PER_SECOND)
+    parser.add_argument("--response-tokens", type=int, default=settings.FAKE_LLM_RESPONSE_TOKENS)
+    parser.add_argument("--chunk-tokens", type=int, default=settings.FAKE_LLM_CHUNK_TOKENS)
+    parser.add_argument("--embedding-latency-ms", type=float, default=settings.FAKE_EMBEDDING_LATENCY_MS)
+    args = parser.parse_args()
+
+    engine = FakeLanguageModel(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        chunk_tokens=args.chunk_tokens,
+        embedding_latency_ms=args.embedding_latency_ms
+    )
+    uvicorn.run(create_app(engine), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Background ingestion jobs
+Ingestion runs as a tracked asyncio task instead of blocking startup or a
+request; each job reports progress while it runs (entries per second,
+chunks embedded, ETA) and keeps the counts the ingest returned. Only one
+job runs at a time.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class IngestJobConflict(RuntimeError):
+    """Raised when a job is started while another one is running"""
+
+    def __init__(self, active: "IngestJob"):
+        super().__init__(f"Ingest job {active.id} is already running")
+        self.active = active
+
+class IngestCancelled(Exception):
+    """Raised to a producer feeding a job that has stopped"""
+
+class IngestProgress:
+    """Counters the ingest pipeline updates after every batch"""
+
+    def __init__(self, total_entries: Optional[int] = None, total_bytes: Optional[int] = None):
+        """
+        Args:
+            total_entries: Entries to ingest, when known up front
+            total_bytes: Size of a streamed payload, when the client sent it
+        """
+        self.total_entries = total_entries
+        self.total_bytes = total_bytes
+        self.entries_processed = 0
+        self.entries_added = 0
+        self.entries_updated = 0
+        self.chunks_embedded = 0
+        self.batches = 0
+        self.errors = 0
+        self.entries_received = 0
+        self.bytes_received = 0
+        self.started_at = time.time()
+
+    def record_batch(self, processed: int, added: int, updated: int, chunks: int):
+        """Count one embedded batch"""
+        self.entries_processed += processed
+        self.entries_added += added
+        self.entries_updated += updated
+        self.chunks_embedded += chunks
+        self.batches += 1
+
+    def eta_seconds(self, elapsed: float) -> Optional[float]:
+        """
+        Estimated time left at the current rate
+
+        For a streamed payload of known size, the entry count is projected
+        from the average size of the entries received so far.
+
+        Returns:
+            Seconds, or None while there is nothing to extrapolate from
+        """
+        total = self.total_entries
+        if total is None and self.total_bytes and self.bytes_received:
+            total = self.entries_received * self.total_bytes / self.bytes_received
+        if total is None or not self.entries_processed:
+            return None
+        remaining = max(0, total - self.entries_processed - self.errors)
+        return elapsed * remaining / self.entries_processed
+
+    def to_dict(self, now: Optional[float] = None) -> Dict[str, Any]:
+        elapsed = max((now or time.time()) - self.started_at, 1e-6)
+        eta = self.eta_seconds(elapsed)
+        return {
+            "total_entries": self.total_entries,
+            "entries_processed": self.entries_processed,
+            "entries_added": self.entries_added,
+            "entries_updated": self.entries_updated,
+            "chunks_embedded": self.chunks_embedded,
+            "batches": self.batches,
+            "errors": self.errors,
+            "entries_per_second": round(self.entries_processed / elapsed, 2),
+            "chunks_per_second": round(self.chunks_embedded / elapsed, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None
+        }
+
+class EntryStream:
+    """
+    Entries handed from a request body to a running job
+
+    The buffer is bounded, so a client sending faster than the pipeline
+    embeds is slowed down instead of being held in memory.
+    """
+
+    _END = object()
+
+    def __init__(self, maxsize: int = 0):
+        """
+        Args:
+            maxsize: Entries buffered ahead of the pipeline (0 uses INGEST_QUEUE_SIZE)
+        """
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize or settings.INGEST_QUEUE_SIZE)
+        self.aborted = False
+
+    async def put(self, entry: Any, size: int = 0):
+        """
+        Hand one entry to the job, waiting while the buffer is full
+
+        Raises:
+            IngestCancelled: The job was cancelled or failed
+        """
+        if self.aborted:
+            raise IngestCancelled()
+        await self._queue.put((entry, size))
+
+    async def feed_ndjson(self, chunks: AsyncIterable[bytes]) -> int:
+        """
+        Split a byte stream into NDJSON lines and hand each one to the job
+
+        Lines are parsed by the pipeline, so a malformed line is reported as
+        an entry error rather than ending the upload.
+
+        Returns:
+            Number of lines handed over
+
+        Raises:
+            IngestCancelled: The job stopped before the body was consumed
+        """
+        lines = 0
+        buffer = b""
+        async for chunk in chunks:
+            buffer += chunk
+            *complete, buffer = buffer.split(b"\n")
+            for line in complete:
+                if line.strip():
+                    await self.put(line, len(line) + 1)
+                    lines += 1
+        if buffer.strip():
+            await self.put(buffer, len(buffer))
+            lines += 1
+        await self.close()
+        return lines
+
+    async def close(self):
+        """Signal the end of the payload"""
+        if not self.aborted:
+            await self._queue.put((self._END, 0))
+
+    def abort(self):
+        """Stop accepting entries and release a producer blocked on a full buffer"""
+        self.aborted = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    async def entries(self, progress: Optional[IngestProgress] = None) -> AsyncIterator[Any]:
+        """Yield entries until the producer closes the stream"""
+        while True:
+            entry, size = await self._queue.get()
+            if entry is self._END:
+                return
+            if progress:
+                progress.entries_received += 1
+                progress.bytes_received += size
+            yield entry
+
+class IngestJob:
+    """One ingestion run"""
+
+    def __init__(self, source: str, stream: Optional[EntryStream] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.status = PENDING
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = IngestProgress()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.stream = stream
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED, CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status, progress and outcome of the job"""
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "source": self.source,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_s": round(end - self.started_at, 3) if self.started_at else None,
+            "progress": self.progress.to_dict(end) if self.started_at else None,
+            "result": self.result,
+            "error": self.error
+        }
+
+class IngestJobManager:
+    """Starts ingestion jobs in the background, one at a time, and remembers recent ones"""
+
+    def __init__(self, history: int = 20):
+        """
+        Args:
+            history: Finished jobs kept for status lookups
+        """
+        self.history = history
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+
+    def start(
+        self,
+        source: str,
+        run: Callable[[IngestProgress], Awaitable[Dict[str, Any]]],
+        stream: Optional[EntryStream] = None
+    ) -> IngestJob:
+        """
+        Run an ingestion in the background
+
+        Args:
+            source: What is being ingested (file path or description)
+            run: Performs the ingestion, updating the progress it is given, and returns its counts
+            stream: Request body feeding the job, aborted if the job stops early
+
+        Returns:
+            The job, already scheduled
+
+        Raises:
+            IngestJobConflict: Another job is running
+        """
+        active = self.active
+        if active:
+            raise IngestJobConflict(active)
+
+        job = IngestJob(source, stream)
+        self._jobs[job.id] = job
+        self._trim()
+        job.task = asyncio.create_task(self._run(job, run))
+        return job
+
+    async def run(self, source: str, run: Callable[[IngestProgress], Awaitable[Dict[str, Any]]]) -> IngestJob:
+        """
+        Wait for any running job, then run an ingestion to completion
+
+        For callers such as scheduled updates that should queue rather than
+        be refused.
+
+        Returns:
+            The finished job
+        """
+        while self.active:
+            await asyncio.wait({self.active.task})
+        job = self.start(source, run)
+        await asyncio.wait({job.task})
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    @property
+    def active(self) -> Optional[IngestJob]:
+        """The job currently running, if any"""
+        return next((job for job in reversed(self._jobs.values()) if not job.done), None)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Recent jobs, newest first"""
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    async def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """
+        Stop a running job; batches already upserted stay in the index
+
+        Returns:
+            The job, or None if the id is unknown
+        """
+        job = self._jobs.get(job_id)
+        if job and job.task and not job.task.done():
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+        return job
+
+    async def shutdown(self):
+        """Cancel running jobs (a cancelled initial ingest resumes on the next leader)"""
+        for job_id in list(self._jobs):
+            await self.cancel(job_id)
+
+    async def _run(self, job: IngestJob, run: Callable[[IngestProgress], Awaitable[Dict[str, Any]]]):
+        job.status = RUNNING
+        job.started_at = job.progress.started_at = time.time()
+        logger.info(f"Ingest job {job.id} started: {job.source}")
+        try:
+            job.result = await run(job.progress)
+            job.status = SUCCEEDED
+            logger.info(f"Ingest job {job.id} finished in {time.time() - job.started_at:.1f}s")
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+            logger.info(f"Ingest job {job.id} cancelled after {job.progress.entries_processed} entries")
+            raise
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error(f"Ingest job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            if job.stream:
+                job.stream.abort()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+# Global job manager for this process
+ingest_jobs = IngestJobManager(history=settings.INGEST_JOB_HISTORY)
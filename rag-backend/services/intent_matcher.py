@@ -0,0 +1,258 @@
+"""
+Canned answers for greetings and other high-frequency intents
+Queries are matched against a curated intent table before any retrieval or
+LLM call: exact text, then normalized text, then the nearest example by
+cosine similarity of local character n-gram vectors. The table is reloaded
+when its file changes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXACT_MATCH = "exact"
+NORMALIZED_MATCH = "normalized"
+NEAREST_MATCH = "nearest"
+
+# Words that carry no intent of their own ("um, hi there!")
+_FILLER_WORDS = {"um", "uh", "erm", "hmm", "oh", "ok", "okay", "so", "well", "please", "just"}
+
+_VECTOR_DIMENSIONS = 1024
+
+class Intent(BaseModel):
+    """One row of the intent table"""
+    name: str
+    examples: List[str]
+    answer: Optional[str] = None
+    # Answer generated once at startup instead of authored
+    prompt: Optional[str] = None
+    threshold: Optional[float] = None
+
+class IntentMatch(BaseModel):
+    """A query answered from the intent table"""
+    intent: str
+    answer: str
+    method: str
+    score: float
+    match_ms: float
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace"""
+    text = text.lower().replace("’", "'")
+    words = re.findall(r"[a-z0-9']+", text)
+    return " ".join(w for w in words if w not in _FILLER_WORDS)
+
+def embed(text: str) -> np.ndarray:
+    """Unit vector of hashed character trigrams (with word boundaries)"""
+    vector = np.zeros(_VECTOR_DIMENSIONS, dtype=np.float32)
+    padded = f" {text} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode()) % _VECTOR_DIMENSIONS] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class IntentMatcher:
+    """Matches queries to canned answers from a hot-reloaded intent table"""
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.8,
+        max_words: int = 6,
+        max_unknown_words: int = 1,
+        reload_interval: float = 2.0
+    ):
+        """
+        Args:
+            path: JSON file with an "intents" list
+            threshold: Minimum cosine similarity for a nearest-example match
+            max_words: Longer queries skip the nearest-example stage
+            max_unknown_words: Queries with more words absent from every
+                example skip the nearest-example stage ("what can you do
+                for sculptors" is a real question)
+            reload_interval: Seconds between checks of the file's mtime
+        """
+        self.path = path
+        self.threshold = threshold
+        self.max_words = max_words
+        self.max_unknown_words = max_unknown_words
+        self.reload_interval = reload_interval
+        self._intents: List[Intent] = []
+        self._exact: Dict[str, int] = {}
+        self._normalized: Dict[str, int] = {}
+        self._vectors = np.zeros((0, _VECTOR_DIMENSIONS), dtype=np.float32)
+        self._owners: List[int] = []
+        self._vocabulary: set = set()
+        self._generated: Dict[str, str] = {}
+        self._generate: Optional[Callable[[str], Awaitable[str]]] = None
+        self._mtime = -1.0
+        self._checked_at = 0.0
+        self.lookups = 0
+        self.hits: Dict[str, int] = {EXACT_MATCH: 0, NORMALIZED_MATCH: 0, NEAREST_MATCH: 0}
+        self.intent_hits: Dict[str, int] = {}
+        self.reloads = 0
+        self._match_ms_total = 0.0
+        self.reload()
+
+    @classmethod
+    def from_settings(cls) -> "IntentMatcher":
+        """Build a matcher from configured path and thresholds"""
+        return cls(
+            settings.INTENTS_PATH,
+            threshold=settings.INTENT_MATCH_THRESHOLD,
+            max_words=settings.INTENT_MAX_WORDS,
+            reload_interval=settings.INTENTS_RELOAD_SECONDS
+        )
+
+    def reload(self) -> bool:
+        """
+        Load the intent table if the file changed since the last load
+
+        A file that is missing or invalid keeps the previous table.
+
+        Returns:
+            True if a new table was loaded
+        """
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime != -1.0:
+                logger.warning(f"Intent table {self.path} disappeared; keeping the loaded one")
+            return False
+        if mtime == self._mtime:
+            return False
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                intents = [Intent(**row) for row in json.load(f)["intents"]]
+        except Exception as e:
+            logger.error(f"Invalid intent table {self.path}: {e}")
+            self._mtime = mtime
+            return False
+
+        self._build(intents)
+        self._mtime = mtime
+        self.reloads += 1
+        logger.info(f"Loaded {len(intents)} intents from {self.path}")
+        if self._generate is not None and self._pending_prompts():
+            self._schedule_pregenerate()
+        return True
+
+    def match(self, query: str) -> Optional[IntentMatch]:
+        """Canned answer for a query, or None to run the full pipeline"""
+        start = time.perf_counter()
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        self.lookups += 1
+
+        method, index, score = None, None, 0.0
+        key = query.strip().lower()
+        normalized = normalize(query)
+
+        if key in self._exact:
+            method, index, score = EXACT_MATCH, self._exact[key], 1.0
+        elif normalized in self._normalized:
+            method, index, score = NORMALIZED_MATCH, self._normalized[normalized], 1.0
+        elif self._nearest_allowed(normalized):
+            similarities = self._vectors @ embed(normalized)
+            best = int(np.argmax(similarities))
+            intent = self._intents[self._owners[best]]
+            if similarities[best] >= (intent.threshold or self.threshold):
+                method, index, score = NEAREST_MATCH, self._owners[best], float(similarities[best])
+
+        match_ms = (time.perf_counter() - start) * 1000
+        self._match_ms_total += match_ms
+        if method is None:
+            return None
+
+        intent = self._intents[index]
+        answer = intent.answer or self._generated.get(intent.prompt or "")
+        if not answer:
+            # Pre-generation has not finished yet
+            return None
+
+        self.hits[method] += 1
+        self.intent_hits[intent.name] = self.intent_hits.get(intent.name, 0) + 1
+        return IntentMatch(intent=intent.name, answer=answer, method=method, score=score, match_ms=match_ms)
+
+    async def pregenerate(self, generate: Callable[[str], Awaitable[str]]):
+        """
+        Generate answers for intents that have a prompt instead of an answer
+
+        The generator is kept so prompts added by a later reload are
+        generated too. Failures leave the intent unanswered (queries fall
+        through to the pipeline).
+
+        Args:
+            generate: Produces the answer text for a prompt
+        """
+        self._generate = generate
+        for prompt in self._pending_prompts():
+            try:
+                self._generated[prompt] = (await generate(prompt)).strip()
+            except Exception as e:
+                logger.warning(f"Could not pre-generate intent answer: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return table size, hit counts by method and intent, and match latency"""
+        hits = sum(self.hits.values())
+        return {
+            "intents": len(self._intents),
+            "examples": len(self._owners),
+            "reloads": self.reloads,
+            "lookups": self.lookups,
+            "hits": hits,
+            "hit_rate": hits / self.lookups if self.lookups else 0.0,
+            "hits_by_method": dict(self.hits),
+            "hits_by_intent": dict(self.intent_hits),
+            "avg_match_ms": self._match_ms_total / self.lookups if self.lookups else 0.0
+        }
+
+    def _build(self, intents: List[Intent]):
+        """Index examples for exact, normalized and nearest-example lookup"""
+        exact, normalized, vectors, owners = {}, {}, [], []
+        for index, intent in enumerate(intents):
+            for example in intent.examples:
+                exact.setdefault(example.strip().lower(), index)
+                key = normalize(example)
+                if key:
+                    normalized.setdefault(key, index)
+                    vectors.append(embed(key))
+                    owners.append(index)
+
+        self._intents, self._exact, self._normalized, self._owners = intents, exact, normalized, owners
+        self._vocabulary = {word for key in normalized for word in key.split()}
+        self._vectors = np.array(vectors, dtype=np.float32).reshape(-1, _VECTOR_DIMENSIONS)
+
+    def _nearest_allowed(self, normalized: str) -> bool:
+        """Whether a query is short and familiar enough for the nearest-example stage"""
+        words = normalized.split()
+        if not words or len(words) > self.max_words or not self._owners:
+            return False
+        return sum(w not in self._vocabulary for w in words) <= self.max_unknown_words
+
+    def _pending_prompts(self) -> List[str]:
+        return [
+            intent.prompt for intent in self._intents
+            if intent.answer is None and intent.prompt and intent.prompt not in self._generated
+        ]
+
+    def _schedule_pregenerate(self):
+        """Generate answers for prompts added by a reload, off the request path"""
+        try:
+            asyncio.get_running_loop().create_task(self.pregenerate(self._generate))
+        except RuntimeError:
+            pass
@@ -0,0 +1,267 @@
+"""
+LLM provider interface for chat completions and embeddings
+Services talk to a provider instead of a concrete SDK client so the backend
+can run against OpenAI, any OpenAI-compatible endpoint, or the deterministic
+in-process fake used for offline benchmarks
+"""
+
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from openai import APIStatusError, AsyncOpenAI
+from pydantic import BaseModel
+
+from services.fake_llm import FakeLanguageModel
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+class TokenUsage(BaseModel):
+    """Token counts reported by the provider for one call"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+class ChatResult(BaseModel):
+    """A complete chat completion"""
+    text: str
+    finish_reason: Optional[str] = None
+    usage: Optional[TokenUsage] = None
+
+class ChatDelta(BaseModel):
+    """One streamed piece of a chat completion; the last may carry usage"""
+    content: str = ""
+    finish_reason: Optional[str] = None
+    usage: Optional[TokenUsage] = None
+
+class EmbeddingResult(BaseModel):
+    """Vectors in input order plus the tokens billed for them"""
+    vectors: List[List[float]]
+    tokens: int = 0
+
+class ChatStream:
+    """Async iterator of ChatDelta that must be closed when abandoned"""
+
+    def __aiter__(self) -> "ChatStream":
+        return self
+
+    async def __anext__(self) -> ChatDelta:
+        raise StopAsyncIteration
+
+    async def close(self):
+        """Release the underlying connection"""
+
+class LLMProvider:
+    """Base class for chat and embedding backends"""
+
+    name = "base"
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], **params: Any) -> ChatResult:
+        """Run a chat completion to the end"""
+        raise NotImplementedError
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], **params: Any) -> ChatStream:
+        """Open a streaming chat completion"""
+        raise NotImplementedError
+
+    async def embed(self, model: str, texts: List[str]) -> EmbeddingResult:
+        """Embed texts, returning vectors in input order"""
+        raise NotImplementedError
+
+    def chroma_embedding_function(self, model: str):
+        """Embedding function for Chroma collections, matching embed()"""
+        raise NotImplementedError
+
+    async def warm(self):
+        """Open pooled connections ahead of the first request (no-op by default)"""
+
+def _field(obj: Any, name: str) -> Any:
+    """Read a field from an SDK model or, for fields the SDK predates, a dict"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+def _token_usage(usage: Any) -> Optional[TokenUsage]:
+    """Normalize an OpenAI usage block, including cached prompt tokens"""
+    if not usage:
+        return None
+    details = _field(usage, "prompt_tokens_details")
+    return TokenUsage(
+        prompt_tokens=_field(usage, "prompt_tokens") or 0,
+        completion_tokens=_field(usage, "completion_tokens") or 0,
+        cached_tokens=(_field(details, "cached_tokens") or 0) if details else 0
+    )
+
+class _OpenAIChatStream(ChatStream):
+    """Adapts an OpenAI SDK stream to ChatDelta"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __anext__(self) -> ChatDelta:
+        while True:
+            chunk = await self._stream.__anext__()
+            usage = _token_usage(_field(chunk, "usage"))
+            if chunk.choices:
+                choice = chunk.choices[0]
+                return ChatDelta(
+                    content=choice.delta.content or "",
+                    finish_reason=choice.finish_reason,
+                    usage=usage
+                )
+            if usage:
+                # Final chunk requested with stream_options.include_usage
+                return ChatDelta(usage=usage)
+
+    async def close(self):
+        await self._stream.close()
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI, or any server speaking its wire format via base_url"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        """
+        Args:
+            api_key: OpenAI API key
+            base_url: Alternative endpoint, e.g. the local fake server
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        # Retries are owned by the deadline-aware policies, not the SDK
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], **params: Any) -> ChatResult:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            **params
+        )
+        choice = response.choices[0]
+        return ChatResult(
+            text=choice.message.content or "",
+            finish_reason=choice.finish_reason,
+            usage=_token_usage(response.usage)
+        )
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], **params: Any) -> ChatStream:
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            # Ask for a final usage chunk; passed raw as the pinned SDK predates it
+            extra_body={"stream_options": {"include_usage": True}},
+            **params
+        )
+        return _OpenAIChatStream(stream)
+
+    async def embed(self, model: str, texts: List[str]) -> EmbeddingResult:
+        response = await self.client.embeddings.create(input=texts, model=model)
+        return EmbeddingResult(
+            vectors=[item.embedding for item in sorted(response.data, key=lambda e: e.index)],
+            tokens=response.usage.prompt_tokens if response.usage else 0
+        )
+
+    async def warm(self):
+        # Any response means the TLS connection is open and back in the pool
+        try:
+            await self.client.models.list()
+        except APIStatusError as e:
+            logger.debug(f"Warm-up request answered with {e.status_code}; connection is open")
+
+    def chroma_embedding_function(self, model: str):
+        from chromadb.utils import embedding_functions
+
+        return embedding_functions.OpenAIEmbeddingFunction(
+            api_key=self.api_key,
+            model_name=model,
+            api_base=self.base_url
+        )
+
+class _FakeChatStream(ChatStream):
+    """Adapts the fake model's chunk generator to ChatDelta"""
+
+    def __init__(self, chunks: AsyncIterator, prompt_tokens: int):
+        self._chunks = chunks
+        self._prompt_tokens = prompt_tokens
+        self._completion_tokens = 0
+
+    async def __anext__(self) -> ChatDelta:
+        content, finish_reason = await self._chunks.__anext__()
+        self._completion_tokens += FakeLanguageModel.count_tokens(content)
+        usage = None
+        if finish_reason:
+            usage = TokenUsage(prompt_tokens=self._prompt_tokens, completion_tokens=self._completion_tokens)
+        return ChatDelta(content=content, finish_reason=finish_reason, usage=usage)
+
+    async def close(self):
+        await self._chunks.aclose()
+
+class _FakeChromaEmbeddingFunction:
+    """Chroma embedding function backed by the fake model"""
+
+    def __init__(self, model: FakeLanguageModel):
+        self._model = model
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return [self._model.embed(text) for text in input]
+
+class FakeProvider(LLMProvider):
+    """In-process deterministic provider; no network or API key needed"""
+
+    name = "fake"
+
+    def __init__(self, model: Optional[FakeLanguageModel] = None):
+        self.model = model or FakeLanguageModel.from_settings()
+
+    async def complete(self, model: str, messages: List[Dict[str, str]], **params: Any) -> ChatResult:
+        text, finish_reason = await self.model.complete(model, messages, params.get("max_tokens"))
+        return ChatResult(
+            text=text,
+            finish_reason=finish_reason,
+            usage=TokenUsage(
+                prompt_tokens=self._prompt_tokens(messages),
+                completion_tokens=self.model.count_tokens(text)
+            )
+        )
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], **params: Any) -> ChatStream:
+        return _FakeChatStream(
+            self.model.stream(model, messages, params.get("max_tokens")),
+            self._prompt_tokens(messages)
+        )
+
+    async def embed(self, model: str, texts: List[str]) -> EmbeddingResult:
+        return EmbeddingResult(
+            vectors=await self.model.embed_batch(texts),
+            tokens=sum(self.model.count_tokens(text) for text in texts)
+        )
+
+    def chroma_embedding_function(self, model: str):
+        return _FakeChromaEmbeddingFunction(self.model)
+
+    def _prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        return sum(self.model.count_tokens(m["content"]) for m in messages)
+
+_provider: Optional[LLMProvider] = None
+
+def create_provider(name: str) -> LLMProvider:
+    """Build a provider by name ("openai" or "fake")"""
+    if name == "openai":
+        return OpenAIProvider(settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unsupported LLM provider: {name}")
+
+def get_provider() -> LLMProvider:
+    """Process-wide provider selected by LLM_PROVIDER"""
+    global _provider
+    if _provider is None:
+        _provider = create_provider(settings.LLM_PROVIDER)
+        logger.info(f"Using LLM provider: {_provider.name}")
+    return _provider
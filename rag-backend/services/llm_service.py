@@ -2,35 +2,61 @@
 LLM Service for generating responses using GPT-4o
 """
 
+import asyncio
 import logging
+import re
 import time
-from typing import Dict, Any, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator, Callable
 import json
 
-import openai
-from openai import AsyncOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
-
 from utils.config import settings
 from models.schemas import RAGResponse
+from services.cancellation import cancellation_stats
+from services.llm_providers import LLMProvider, TokenUsage, get_provider
+from services.response_cache import ResponseCache
+from services.resilience import Deadline, chat_policy, chat_stream_policy
+from services.tracing import current_span, span, start_span
+from services.upstream_governor import governor
+from services.usage_tracker import record_chat_usage
 
 logger = logging.getLogger(__name__)
 
 class LLMService:
     """Service for interacting with OpenAI's GPT-4o"""
     
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(
+        self,
+        generation_source: Optional[Callable[[], int]] = None,
+        provider: Optional[LLMProvider] = None
+    ):
+        """
+        Args:
+            generation_source: Callable returning the current KB generation,
+                used to invalidate cached answers after re-ingestion
+            provider: Chat backend (defaults to the configured LLM_PROVIDER)
+        """
+        self.provider = provider or get_provider()
         self.model = settings.LLM_MODEL
+        self.cache = None
+        
+        if settings.LLM_CACHE_ENABLED:
+            self.cache = ResponseCache(
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+                cache_dir=settings.LLM_CACHE_DIR,
+                generation_source=generation_source
+            )
         
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     async def generate_response(
         self,
         query: str,
         context: str,
         stream: bool = False,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
+        model: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None
     ) -> RAGResponse:
         """
         Generate a response using GPT-4o with the retrieved context
@@ -41,32 +67,114 @@ class LLMService:
             stream: Whether to stream the response
             temperature: Override default temperature
             max_tokens: Override default max tokens
+            deadline: Request deadline bounding the first streamed token; a
+                non-streamed completion gets its own timeout sized to max_tokens
+            model: Override the default model (used by query routing)
+            history: Compacted earlier turns of the conversation
             
         Returns:
             RAGResponse with answer and metadata
         """
-        start_time = time.time()
-        
         # Construct messages
-        messages = [
-            {"role": "system", "content": settings.SYSTEM_PROMPT},
-            {"role": "user", "content": self._construct_user_prompt(query, context)}
-        ]
+        with span("llm.prompt_build"):
+            messages = self._build_messages(query, context, history)
+        model = model or self.model
         
         try:
             if stream:
-                return await self._generate_streaming_response(
-                    messages, query, context, temperature, max_tokens
+                return await self._collect_streaming_response(
+                    messages, query, context, temperature, max_tokens, deadline, model
                 )
             else:
                 return await self._generate_complete_response(
-                    messages, query, context, temperature, max_tokens
+                    messages, query, context, temperature, max_tokens, model=model
                 )
                 
         except Exception as e:
             logger.error(f"LLM generation error: {e}")
             raise
     
+    async def stream_response(
+        self,
+        query: str,
+        context: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
+        model: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        processing_steps: Optional[Dict[str, float]] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream answer deltas from GPT-4o as soon as they are produced
+        
+        Args:
+            query: User's original query
+            context: Retrieved context from RAG
+            temperature: Override default temperature
+            max_tokens: Override default max tokens
+            deadline: Deadline for the first token; once tokens flow the
+                stream is not cut short
+            model: Override the default model (used by query routing)
+            history: Compacted earlier turns of the conversation
+            processing_steps: Receives llm_cache_hit when the answer is replayed from cache
+            
+        Yields:
+            Text deltas in generation order
+        """
+        with span("llm.prompt_build"):
+            messages = self._build_messages(query, context, history)
+        
+        async for chunk in self._generate_streaming_response(
+            messages,
+            query,
+            context,
+            temperature,
+            max_tokens,
+            deadline,
+            model or self.model,
+            processing_steps
+        ):
+            yield chunk
+    
+    def _build_messages(
+        self,
+        query: str,
+        context: str,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> list:
+        """Build the chat messages for a query, its context and prior turns"""
+        return [
+            {"role": "system", "content": settings.SYSTEM_PROMPT},
+            *(history or []),
+            {"role": "user", "content": self._construct_user_prompt(query, context)}
+        ]
+    
+    @staticmethod
+    def _mark_cache_hit(enclosing, processing_steps: Optional[Dict[str, float]] = None):
+        """Record an answer served from cache on the enclosing span and in processing_steps"""
+        if enclosing is not None:
+            enclosing.set_attribute("llm.cache_hit", True)
+        if processing_steps is not None:
+            processing_steps["llm_cache_hit"] = 1.0
+    
+    def build_rag_response(
+        self,
+        query: str,
+        context: str,
+        answer: str,
+        processing_steps: Dict[str, float]
+    ) -> RAGResponse:
+        """Wrap a finished answer with confidence and sources"""
+        return RAGResponse(
+            query=query,
+            context=context,
+            answer=answer,
+            confidence=self._calculate_confidence(answer, context),
+            sources=self._extract_sources(context),
+            processing_steps=processing_steps
+        )
+    
     def _construct_user_prompt(self, query: str, context: str) -> str:
         """Construct the user prompt with query and context"""
         prompt = f"""Based on the following context from the art grants and residencies knowledge base, please answer the user's question. If the context doesn't contain enough information to fully answer the question, acknowledge this and provide any relevant general guidance you can.
@@ -87,64 +195,227 @@ Please provide a helpful, accurate, and well-structured response."""
         query: str,
         context: str,
         temperature: Optional[float],
-        max_tokens: Optional[int]
+        max_tokens: Optional[int],
+        deadline: Optional[Deadline] = None,
+        model: Optional[str] = None
     ) -> RAGResponse:
-        """Generate a complete (non-streaming) response"""
+        """
+        Generate a complete (non-streaming) response
+        
+        The request deadline only covers retrieval and the first token, and
+        a whole answer cannot be judged by that: retries and hedges run
+        within a timeout sized to max_tokens instead, unless a deadline is
+        passed explicitly.
+        """
         start_time = time.time()
+        model = model or self.model
         
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=temperature or settings.TEMPERATURE,
-            max_tokens=max_tokens or settings.MAX_TOKENS,
-            top_p=0.9,
-            frequency_penalty=0.1,
-            presence_penalty=0.1
-        )
+        params = self._sampling_params(temperature, max_tokens)
+        deadline = deadline or self._completion_deadline(params["max_tokens"])
+        cache_key = self._cache_key(model, messages, params)
+        
+        cached = self.cache.get(cache_key) if self.cache else None
+        if cached is not None:
+            self._mark_cache_hit(current_span.get())
+            return self.build_rag_response(
+                query,
+                context,
+                cached,
+                {"llm_generation_ms": (time.time() - start_time) * 1000, "llm_cache_hit": 1.0}
+            )
         
-        # Extract response
-        answer = response.choices[0].message.content
+        async def attempt():
+            async with self._acquire_upstream(model, messages, params["max_tokens"]) as lease:
+                call_start = time.monotonic()
+                result = await self.provider.complete(model, messages, **params)
+                if result.usage:
+                    lease.reconcile(result.usage.total_tokens)
+                return result, time.monotonic() - call_start
         
-        # Calculate confidence based on response characteristics
-        confidence = self._calculate_confidence(answer, context)
+        try:
+            with span("llm.generate", model=model, max_tokens=params["max_tokens"]) as generation:
+                result, call_seconds = await chat_policy.run(attempt, deadline)
+                if result.usage:
+                    generation.set_attribute("completion_tokens", result.usage.completion_tokens)
+        except asyncio.CancelledError:
+            # The HTTP request is aborted; a non-streamed completion may still be billed
+            cancellation_stats.record_aborted("llm")
+            raise
+        record_chat_usage(model, result.usage, call_seconds)
+        answer = result.text
         
-        # Extract sources from context
-        sources = self._extract_sources(context)
+        if self.cache and result.finish_reason == "stop":
+            self.cache.put(cache_key, answer)
         
         processing_time = (time.time() - start_time) * 1000
         
-        return RAGResponse(
-            query=query,
-            context=context,
-            answer=answer,
-            confidence=confidence,
-            sources=sources,
-            processing_steps={
-                "llm_generation_ms": processing_time
-            }
+        return self.build_rag_response(
+            query,
+            context,
+            answer,
+            {"llm_generation_ms": processing_time}
         )
     
+    async def _collect_streaming_response(
+        self,
+        messages: list,
+        query: str,
+        context: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        deadline: Optional[Deadline] = None,
+        model: Optional[str] = None
+    ) -> RAGResponse:
+        """Consume a streaming response into a complete RAGResponse"""
+        start_time = time.time()
+        first_token_ms = None
+        parts = []
+        processing_steps = {}
+        
+        async for chunk in self._generate_streaming_response(
+            messages, query, context, temperature, max_tokens, deadline, model, processing_steps
+        ):
+            if first_token_ms is None:
+                first_token_ms = (time.time() - start_time) * 1000
+            parts.append(chunk)
+        
+        processing_steps["llm_generation_ms"] = (time.time() - start_time) * 1000
+        if first_token_ms is not None:
+            processing_steps["time_to_first_token_ms"] = first_token_ms
+        
+        return self.build_rag_response(query, context, ''.join(parts), processing_steps)
+    
     async def _generate_streaming_response(
         self,
         messages: list,
         query: str,
         context: str,
         temperature: Optional[float],
-        max_tokens: Optional[int]
+        max_tokens: Optional[int],
+        deadline: Optional[Deadline] = None,
+        model: Optional[str] = None,
+        processing_steps: Optional[Dict[str, float]] = None
     ) -> AsyncGenerator[str, None]:
-        """Generate a streaming response"""
-        stream = await self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=temperature or settings.TEMPERATURE,
-            max_tokens=max_tokens or settings.MAX_TOKENS,
-            top_p=0.9,
-            stream=True
-        )
+        """Generate a streaming response, replaying cached answers as deltas"""
+        model = model or self.model
+        params = self._sampling_params(temperature, max_tokens)
+        cache_key = self._cache_key(model, messages, params)
+        
+        # Spans are ended explicitly: a context variable cannot span yields
+        generation = start_span("llm.generate", model=model, max_tokens=params["max_tokens"], stream=True)
+        
+        cached = self.cache.get(cache_key) if self.cache else None
+        if cached is not None:
+            generation.set_attribute("cache_hit", True)
+            self._mark_cache_hit(current_span.get(), processing_steps)
+            for piece in re.findall(r'\s*\S+\s*', cached):
+                yield piece
+            generation.end()
+            return
+        
+        parts = []
+        finish_reason = None
+        first_token = start_span("llm.first_token", parent=generation)
+        
+        # The concurrency slot is held until the stream is fully drained
+        async with self._acquire_upstream(model, messages, params["max_tokens"]) as lease:
+            # Opening the stream and receiving the first chunk is retried
+            # within the deadline; nothing has been yielded at that point
+            try:
+                stream, delta = await chat_stream_policy.run(
+                    lambda: self._open_stream(model, messages, params),
+                    deadline
+                )
+            except BaseException as e:
+                generation.set_error(e)
+                generation.end()
+                raise
+            first_token.end()
+            
+            first_delta_at = time.monotonic()
+            usage = None
+            abandoned = False
+            
+            try:
+                while delta is not None:
+                    if delta.content:
+                        parts.append(delta.content)
+                        yield delta.content
+                    if delta.finish_reason:
+                        finish_reason = delta.finish_reason
+                    if delta.usage:
+                        usage = delta.usage
+                    delta = await anext(stream, None)
+            except (asyncio.CancelledError, GeneratorExit):
+                # The consumer went away: stop generation instead of draining it
+                abandoned = finish_reason is None
+                raise
+            finally:
+                await stream.close()
+                
+                # Without a usage chunk (or if abandoned early) count locally
+                if usage is None:
+                    usage = TokenUsage(
+                        prompt_tokens=lease.tokens - params["max_tokens"],
+                        completion_tokens=governor.estimate_tokens(parts, model)
+                    )
+                lease.reconcile(usage.total_tokens)
+                record_chat_usage(model, usage, time.monotonic() - first_delta_at)
+                generation.set_attribute("completion_tokens", usage.completion_tokens)
+                generation.set_attribute("abandoned", abandoned)
+                generation.end()
+                
+                if abandoned:
+                    saved = cancellation_stats.record_stream_closed(
+                        model, usage.completion_tokens, params["max_tokens"]
+                    )
+                    logger.info(f"Closed abandoned {model} stream, ~{saved} completion tokens saved")
+                elif finish_reason == "stop":
+                    cancellation_stats.record_completion(model, usage.completion_tokens)
         
-        async for chunk in stream:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        # Only complete answers are cached; truncated ones would replay truncated
+        if self.cache and finish_reason == "stop":
+            self.cache.put(cache_key, ''.join(parts))
+    
+    async def _open_stream(self, model: str, messages: list, params: Dict[str, Any]):
+        """Open a completion stream and wait for its first chunk"""
+        stream = await self.provider.stream(model, messages, **params)
+        try:
+            return stream, await anext(stream, None)
+        except BaseException:
+            await stream.close()
+            raise
+    
+    def _sampling_params(
+        self,
+        temperature: Optional[float],
+        max_tokens: Optional[int]
+    ) -> Dict[str, Any]:
+        """Sampling parameters shared by streaming and complete generation"""
+        return {
+            "temperature": temperature if temperature is not None else settings.TEMPERATURE,
+            "max_tokens": max_tokens or settings.MAX_TOKENS,
+            "top_p": 0.9,
+            "frequency_penalty": 0.1,
+            "presence_penalty": 0.1
+        }
+    
+    @staticmethod
+    def _completion_deadline(max_tokens: int) -> Optional[Deadline]:
+        """Timeout for a non-streamed completion of up to max_tokens"""
+        if settings.COMPLETION_MIN_TOKENS_PER_SECOND <= 0:
+            return None
+        return Deadline(settings.COMPLETION_TIMEOUT_SECONDS + max_tokens / settings.COMPLETION_MIN_TOKENS_PER_SECOND)
+    
+    def _acquire_upstream(self, model: str, messages: list, max_tokens: int):
+        """Reserve a governed upstream slot sized by the estimated token cost"""
+        return governor.acquire(
+            tokens=governor.estimate_chat_tokens(messages, model, max_tokens)
+        )
+    
+    def _cache_key(self, model: str, messages: list, params: Dict[str, Any]) -> str:
+        """Fingerprint the system prompt, user prompt, model and sampling params"""
+        return ResponseCache.make_key(model, messages, params)
     
     def _calculate_confidence(self, answer: str, context: str) -> float:
         """
@@ -217,14 +488,16 @@ Keep the clarification brief and offer 2-3 specific options if applicable."""
             {"role": "user", "content": prompt}
         ]
         
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7,
-            max_tokens=150
-        )
+        async with self._acquire_upstream(self.model, messages, 150):
+            result = await self.provider.complete(
+                self.model,
+                messages,
+                temperature=0.7,
+                max_tokens=150
+            )
+        record_chat_usage(self.model, result.usage)
         
-        return response.choices[0].message.content
+        return result.text
     
     async def format_response_for_speech(self, response: str) -> str:
         """Format response for text-to-speech, removing markdown and adjusting for speech"""
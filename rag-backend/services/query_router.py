@@ -0,0 +1,166 @@
+"""
+Complexity-based model routing
+Sends simple factual lookups to a fast, cheap model with a tight token
+budget and keeps the full model for comparisons and advice
+"""
+
+import logging
+import re
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+FAST_ROUTE = "fast"
+FULL_ROUTE = "full"
+
+# Questions that need synthesis across sources or personal guidance
+_COMPLEX_PATTERN = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|difference|differences|better|best|"
+    r"should i|recommend|recommendation|advice|advise|suggest|strategy|strategies|"
+    r"tips|improve|plan|help me|why|pros|cons|which one|explain|list all)\b"
+)
+
+# Single-attribute lookups about one program
+_FACTUAL_PATTERN = re.compile(
+    r"\b(deadline|deadlines|due|when|date|dates|how much|how long|fee|fees|cost|"
+    r"stipend|amount|funding amount|award|where|located|location|website|url|link|"
+    r"contact|email|phone|address|duration|length|eligible|eligibility|age limit|"
+    r"is there|does it|do they|is it|what is|what's|who runs|who funds)\b"
+)
+
+class RouteDecision(BaseModel):
+    """Model and token budget chosen for one query"""
+    route: str
+    model: str
+    max_tokens: int
+    reason: str
+
+class QueryRouter:
+    """Local rule-based classifier choosing the model for each query"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        fast_model: str = "gpt-4o-mini",
+        fast_max_tokens: int = 300,
+        full_model: str = "gpt-4o",
+        full_max_tokens: int = 2000,
+        max_simple_words: int = 14,
+        min_score_gap: float = 0.1
+    ):
+        """
+        Args:
+            enabled: When False every query takes the full route
+            fast_model: Model for simple factual lookups
+            fast_max_tokens: Completion budget on the fast route
+            full_model: Model for everything else
+            full_max_tokens: Completion budget on the full route
+            max_simple_words: Longer queries always take the full route
+            min_score_gap: Required lead of the best chunk over the runner-up
+                for a lookup to count as unambiguous
+        """
+        self.enabled = enabled
+        self.fast_model = fast_model
+        self.fast_max_tokens = fast_max_tokens
+        self.full_model = full_model
+        self.full_max_tokens = full_max_tokens
+        self.max_simple_words = max_simple_words
+        self.min_score_gap = min_score_gap
+        self._routes: Dict[str, Dict[str, Any]] = {
+            route: {"count": 0, "latency_ms": deque(maxlen=500), "tokens": 0}
+            for route in (FAST_ROUTE, FULL_ROUTE)
+        }
+
+    @classmethod
+    def from_settings(cls) -> "QueryRouter":
+        """Build a router from the configured thresholds"""
+        return cls(
+            enabled=settings.MODEL_ROUTING_ENABLED,
+            fast_model=settings.FAST_LLM_MODEL,
+            fast_max_tokens=settings.FAST_MAX_TOKENS,
+            full_model=settings.LLM_MODEL,
+            full_max_tokens=settings.MAX_TOKENS,
+            max_simple_words=settings.ROUTING_MAX_SIMPLE_WORDS,
+            min_score_gap=settings.ROUTING_MIN_SCORE_GAP
+        )
+
+    def classify(self, query: str, scores: Optional[List[float]] = None) -> RouteDecision:
+        """
+        Choose a route from the query text and retrieval score spread
+
+        A query takes the fast route when it is short, asks for a single
+        fact (deadline, fee, location, ...), has no comparison or advice
+        wording, and retrieval found one clearly best match.
+
+        Args:
+            query: User's query
+            scores: Relevance scores of the retrieved chunks, best first
+        """
+        if not self.enabled:
+            return self._full("routing disabled")
+
+        text = query.lower()
+        complex_match = _COMPLEX_PATTERN.search(text)
+        if complex_match:
+            return self._full(f"complex wording '{complex_match.group(0)}'")
+
+        words = len(text.split())
+        if words > self.max_simple_words:
+            return self._full(f"{words} words")
+
+        if not _FACTUAL_PATTERN.search(text):
+            return self._full("not a factual lookup")
+
+        if not scores:
+            return self._full("no retrieved context")
+
+        ordered = sorted(scores, reverse=True)
+        if len(ordered) > 1 and ordered[0] - ordered[1] < self.min_score_gap:
+            return self._full(f"ambiguous retrieval (gap {ordered[0] - ordered[1]:.2f})")
+
+        return RouteDecision(
+            route=FAST_ROUTE,
+            model=self.fast_model,
+            max_tokens=self.fast_max_tokens,
+            reason="factual lookup"
+        )
+
+    def record(self, decision: RouteDecision, latency_ms: float, tokens: int):
+        """Record generation latency and completion tokens for a route"""
+        route = self._routes[decision.route]
+        route["count"] += 1
+        route["latency_ms"].append(latency_ms)
+        route["tokens"] += tokens
+        logger.info(
+            f"Route {decision.route} ({decision.model}, {decision.reason}): "
+            f"{latency_ms:.0f}ms, {tokens} completion tokens"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-route counts, latency percentiles and token usage"""
+        result = {"enabled": self.enabled, "routes": {}}
+        for name, route in self._routes.items():
+            ordered = sorted(route["latency_ms"])
+            result["routes"][name] = {
+                "model": self.fast_model if name == FAST_ROUTE else self.full_model,
+                "count": route["count"],
+                "avg_latency_ms": sum(ordered) / len(ordered) if ordered else 0.0,
+                "p95_latency_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0,
+                "completion_tokens": route["tokens"],
+                "avg_completion_tokens": route["tokens"] / route["count"] if route["count"] else 0.0
+            }
+        return result
+
+    def _full(self, reason: str) -> RouteDecision:
+        """Decision for the full model"""
+        return RouteDecision(
+            route=FULL_ROUTE,
+            model=self.full_model,
+            max_tokens=self.full_max_tokens,
+            reason=reason
+        )
@@ -0,0 +1,255 @@
+"""
+Deadline-aware retry and hedging for upstream calls
+Retries only while the request budget allows it, and optionally races a
+duplicate request when the first one is slower than the recent p95
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+import openai
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Transient upstream failures worth another attempt
+RETRYABLE_ERRORS: Tuple[Type[BaseException], ...] = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs out of its time budget"""
+
+class Deadline:
+    """Absolute point in time by which a request must finish"""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> Optional["Deadline"]:
+        """Create a deadline, or None when seconds is unset or zero"""
+        return cls(seconds) if seconds else None
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """Whether the budget is used up"""
+        return self.remaining() <= 0
+
+class LatencyTracker:
+    """Rolling latency window used to pick the hedging delay"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        """Add a successful call's latency"""
+        self.samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile in seconds, or None until enough samples exist"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+class RetryPolicy:
+    """
+    Retry with full-jitter backoff inside a request deadline, with optional hedging
+
+    Each attempt is bounded by the time remaining on the deadline, and a
+    retry is only scheduled if the backoff plus a minimal attempt still
+    fits. With hedging enabled, a duplicate call starts once the first has
+    taken longer than the observed p95. The first success wins and the
+    loser is cancelled.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 1.0,
+        hedge: bool = False,
+        hedge_min_delay: float = 0.05,
+        min_attempt_budget: float = 0.25,
+        retry_on: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS
+    ):
+        """
+        Args:
+            name: Label used in logs and metrics
+            max_attempts: Upper bound on attempts (the deadline may stop earlier)
+            base_delay: First backoff ceiling in seconds
+            max_delay: Backoff ceiling in seconds
+            hedge: Whether to race a duplicate after the p95 latency
+            hedge_min_delay: Lower bound for the hedging delay in seconds
+            min_attempt_budget: Don't start an attempt with less time left than this
+            retry_on: Exception types that trigger a retry
+        """
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.min_attempt_budget = min_attempt_budget
+        self.retry_on = retry_on
+        self.latency = LatencyTracker()
+        self.counters = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "deadline_exceeded": 0
+        }
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        deadline: Optional[Deadline] = None
+    ) -> Any:
+        """
+        Call fn until it succeeds, attempts run out, or the deadline passes
+
+        Args:
+            fn: Zero-argument coroutine factory; called once per attempt
+            deadline: Request deadline bounding all attempts
+        """
+        self.counters["calls"] += 1
+        attempt = 0
+
+        while True:
+            attempt += 1
+            timeout = deadline.remaining() if deadline else None
+            if timeout is not None and timeout <= 0:
+                self.counters["deadline_exceeded"] += 1
+                raise DeadlineExceeded(f"{self.name}: deadline exceeded before attempt {attempt}")
+
+            try:
+                if self.hedge:
+                    return await self._hedged(fn, timeout)
+                return await asyncio.wait_for(self._timed(fn), timeout)
+
+            except asyncio.TimeoutError as e:
+                self.counters["deadline_exceeded"] += 1
+                raise DeadlineExceeded(f"{self.name}: deadline exceeded") from e
+
+            except self.retry_on as e:
+                if attempt >= self.max_attempts:
+                    raise
+
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if deadline and deadline.remaining() < delay + self.min_attempt_budget:
+                    logger.warning(f"{self.name}: not retrying {type(e).__name__}, deadline too close")
+                    raise
+
+                self.counters["retries"] += 1
+                logger.warning(
+                    f"{self.name}: attempt {attempt} failed with {type(e).__name__}, "
+                    f"retrying in {delay * 1000:.0f}ms"
+                )
+                await asyncio.sleep(delay)
+
+    async def _timed(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run one attempt and record its latency on success"""
+        self.counters["attempts"] += 1
+        start = time.monotonic()
+        result = await fn()
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[Any]], timeout: Optional[float]) -> Any:
+        """Run an attempt, racing a duplicate if it is slower than the p95"""
+        p95 = self.latency.p95()
+        if p95 is None:
+            return await asyncio.wait_for(self._timed(fn), timeout)
+
+        hedge_delay = max(self.hedge_min_delay, p95)
+        if timeout is not None and hedge_delay >= timeout:
+            return await asyncio.wait_for(self._timed(fn), timeout)
+
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self._timed(fn))
+        tasks = {primary}
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            self.counters["hedges"] += 1
+            hedge = asyncio.ensure_future(self._timed(fn))
+            tasks.add(hedge)
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=remaining,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+
+            raise error
+
+        finally:
+            # Cancel whichever request lost the race
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and the current hedging threshold"""
+        p95 = self.latency.p95()
+        return {
+            **self.counters,
+            "hedge": self.hedge,
+            "p95_ms": p95 * 1000 if p95 is not None else None
+        }
+
+def create_policy(name: str, hedge: bool = False) -> RetryPolicy:
+    """Build a policy from configured retry settings"""
+    return RetryPolicy(
+        name,
+        max_attempts=settings.RETRY_MAX_ATTEMPTS,
+        base_delay=settings.RETRY_BASE_DELAY_MS / 1000,
+        max_delay=settings.RETRY_MAX_DELAY_MS / 1000,
+        hedge=hedge,
+        hedge_min_delay=settings.HEDGE_MIN_DELAY_MS / 1000
+    )
+
+# Shared policies, one per upstream operation
+embedding_policy = create_policy("embeddings", hedge=settings.HEDGE_EMBEDDINGS)
+chat_policy = create_policy("chat_completion", hedge=settings.HEDGE_LLM)
+chat_stream_policy = create_policy("chat_stream_open")
+
+def policy_stats() -> Dict[str, Any]:
+    """Stats for every shared policy"""
+    return {
+        policy.name: policy.stats()
+        for policy in (embedding_policy, chat_policy, chat_stream_policy)
+    }
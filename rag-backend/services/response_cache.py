@@ -0,0 +1,178 @@
+"""
+Response cache for LLM answers keyed on a fingerprint of the full prompt
+In-memory LRU with TTL, plus an optional on-disk tier shared across restarts
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """LRU/TTL cache for generated answers, invalidated per KB generation"""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 21600,
+        cache_dir: Optional[str] = None,
+        generation_source: Optional[Callable[[], int]] = None
+    ):
+        """
+        Args:
+            max_entries: Maximum number of answers kept in memory
+            ttl_seconds: Age after which an answer is treated as a miss
+            cache_dir: Directory for the disk tier (None keeps memory only)
+            generation_source: Callable returning the current KB generation
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self.generation_source = generation_source
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._generation = 0
+        self._generation = self._current_generation()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        """Fingerprint the model, the full message list and sampling params"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached answer, or None on miss"""
+        self._check_generation()
+
+        entry = self._entries.get(key)
+        if entry is None and self.cache_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._store_memory(key, entry)
+
+        if entry is None or not self._is_fresh(entry):
+            if entry is not None:
+                self._evict(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry["answer"]
+
+    def put(self, key: str, answer: str):
+        """Store an answer under the current generation"""
+        if not answer:
+            return
+
+        self._check_generation()
+        entry = {
+            "answer": answer,
+            "created_at": time.time(),
+            "generation": self._generation
+        }
+        self._store_memory(key, entry)
+
+        if self.cache_dir:
+            self._write_disk(key, entry)
+
+    def clear(self):
+        """Drop all in-memory entries (disk entries expire by generation/TTL)"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and sizing"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "generation": self._generation,
+            "disk_tier": bool(self.cache_dir)
+        }
+
+    def _current_generation(self) -> int:
+        """Read the KB generation, keeping the last known value on failure"""
+        if not self.generation_source:
+            return 0
+        try:
+            return self.generation_source()
+        except Exception as e:
+            logger.warning(f"Could not read KB generation: {e}")
+            return self._generation
+
+    def _check_generation(self):
+        """Invalidate everything when the knowledge base has been re-ingested"""
+        generation = self._current_generation()
+        if generation != self._generation:
+            logger.info(
+                f"KB generation changed ({self._generation} -> {generation}), "
+                f"dropping {len(self._entries)} cached answers"
+            )
+            self._entries.clear()
+            self._generation = generation
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """Check generation and TTL for an entry"""
+        if entry.get("generation") != self._generation:
+            return False
+        return time.time() - entry["created_at"] <= self.ttl_seconds
+
+    def _store_memory(self, key: str, entry: Dict[str, Any]):
+        """Insert into the LRU, evicting the least recently used entries"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _evict(self, key: str):
+        """Remove an entry from both tiers"""
+        self._entries.pop(key, None)
+        if self.cache_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _disk_path(self, key: str) -> str:
+        """Sharded file path for a key"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load an entry from the disk tier"""
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Unreadable cache entry {key}: {e}")
+            return None
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        """Persist an entry to the disk tier"""
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to persist cache entry {key}: {e}")
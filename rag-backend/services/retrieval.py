@@ -8,6 +8,8 @@ from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 from services.vector_store import VectorStoreService
+from services.resilience import Deadline
+from services.tracing import span
 from utils.config import settings
 from utils.text_processor import TextProcessor
 
@@ -25,7 +27,8 @@ class RetrievalService:
         query: str,
         num_results: int = 5,
         filter_criteria: Optional[Dict[str, Any]] = None,
-        rerank: bool = True
+        rerank: bool = True,
+        deadline: Optional[Deadline] = None
     ) -> str:
         """
         Retrieve relevant context for a query
@@ -35,46 +38,96 @@ class RetrievalService:
             num_results: Number of chunks to retrieve
             filter_criteria: Optional filters (e.g., type, discipline, location)
             rerank: Whether to rerank results
+            deadline: Request deadline propagated to the vector store
             
         Returns:
             Formatted context string
         """
+        context, _ = await self.retrieve_scored_context(
+            query,
+            num_results=num_results,
+            filter_criteria=filter_criteria,
+            rerank=rerank,
+            deadline=deadline
+        )
+        return context
+    
+    async def retrieve_scored_context(
+        self,
+        query: str,
+        num_results: int = 5,
+        filter_criteria: Optional[Dict[str, Any]] = None,
+        rerank: bool = True,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[str, List[float]]:
+        """
+        Retrieve context along with the relevance score of each chunk
+        
+        Scores are the reranked scores when reranking ran, otherwise the
+        vector similarity, in the order the chunks appear in the context.
+        While the initial ingestion runs, chunks come from a keyword search
+        of whatever is indexed so far (see degraded).
+        
+        Returns:
+            Tuple of (formatted context string, chunk scores)
+        """
         start_time = time.time()
         
         try:
-            # Enhance query for better retrieval
-            enhanced_query = self._enhance_query(query)
-            
-            # Search vector store
-            search_results = await self.vector_store.search(
-                enhanced_query,
-                num_results=num_results * 2 if rerank else num_results,
-                filter_criteria=filter_criteria
-            )
-            
-            if not search_results:
-                logger.warning(f"No results found for query: {query}")
-                return "No relevant information found in the knowledge base."
-            
-            # Rerank results if requested
-            if rerank and len(search_results) > num_results:
-                search_results = self._rerank_results(query, search_results)[:num_results]
-            
-            # Remove duplicates while preserving order
-            unique_results = self._deduplicate_results(search_results)
-            
-            # Format context
-            context = self._format_search_results(unique_results)
+            with span("retrieval", num_results=num_results) as retrieval_span:
+                # Enhance query for better retrieval
+                with span("retrieval.enhance_query"):
+                    enhanced_query = self._enhance_query(query)
+                
+                # Search vector store (by keyword while it is still being filled)
+                if self.degraded:
+                    retrieval_span.set_attribute("degraded", True)
+                    search_results = await self.vector_store.keyword_search(
+                        enhanced_query,
+                        num_results=num_results * 2 if rerank else num_results,
+                        filter_criteria=filter_criteria
+                    )
+                else:
+                    search_results = await self.vector_store.search(
+                        enhanced_query,
+                        num_results=num_results * 2 if rerank else num_results,
+                        filter_criteria=filter_criteria,
+                        deadline=deadline
+                    )
+                
+                if not search_results:
+                    logger.warning(f"No results found for query: {query}")
+                    return "No relevant information found in the knowledge base.", []
+                
+                # Rerank results if requested
+                if rerank and len(search_results) > num_results:
+                    with span("retrieval.rerank", candidates=len(search_results)):
+                        search_results = self._rerank_results(query, search_results)[:num_results]
+                
+                # Remove duplicates while preserving order
+                with span("retrieval.dedupe"):
+                    unique_results = self._deduplicate_results(search_results)
+                
+                # Format context
+                with span("retrieval.format"):
+                    context = self._format_search_results(unique_results)
+                retrieval_span.set_attribute("chunks", len(unique_results))
             
             retrieval_time = (time.time() - start_time) * 1000
             logger.info(f"Retrieved {len(unique_results)} chunks in {retrieval_time:.2f}ms")
             
-            return context
+            scores = [r.get('rerank_score', r.get('score', 0.0)) for r in unique_results]
+            return context, scores
             
         except Exception as e:
             logger.error(f"Retrieval error: {e}")
             raise
     
+    @property
+    def degraded(self) -> bool:
+        """Whether retrieval is serving keyword matches over a partial index"""
+        return settings.DEGRADED_KEYWORD_RETRIEVAL and self.vector_store.initial_ingest_pending()
+    
     def _enhance_query(self, query: str) -> str:
         """Enhance query for better retrieval"""
         # Extract keywords
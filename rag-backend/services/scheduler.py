@@ -39,6 +39,10 @@ class UpdateScheduler:
         self._running = True
         logger.info("Update scheduler started")
         
+    def use_vector_store(self, vector_store):
+        """Write updates through the app's initialized vector store"""
+        self.data_updater.vector_store = vector_store
+        
     def stop(self):
         """Stop the scheduler"""
         if not self._running:
@@ -98,7 +102,8 @@ class UpdateScheduler:
             name='Knowledge Base Update',
             misfire_grace_time=3600,  # Allow up to 1 hour late
             coalesce=True,  # Only run once if multiple misfires
-            max_instances=1  # Only one update at a time
+            max_instances=1,  # Only one update at a time
+            replace_existing=True  # Jobs survive stop(); a re-elected leader re-adds them
         )
         
         logger.info(f"Scheduled knowledge base updates with trigger: {trigger}")
@@ -109,7 +114,8 @@ class UpdateScheduler:
                 self._run_update,
                 'date',  # Run once
                 id='startup_update',
-                name='Startup Knowledge Base Update'
+                name='Startup Knowledge Base Update',
+                replace_existing=True
             )
     
     def _add_cleanup_job(self):
@@ -119,7 +125,8 @@ class UpdateScheduler:
             self._run_cleanup,
             CronTrigger(day_of_week=0, hour=3, minute=0),  # Sunday 3 AM
             id='cleanup_old_entries',
-            name='Cleanup Old Entries'
+            name='Cleanup Old Entries',
+            replace_existing=True
         )
     
     async def _run_update(self):
@@ -0,0 +1,293 @@
+"""
+Conversation session storage
+Bounded in-memory store (LRU cap plus idle TTL) for single-process
+deployments, and a Redis store shared by all workers and replicas
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Compact turn record: (timestamp, query, answer, confidence, sources)
+Turn = Tuple[float, str, str, float, Tuple[str, ...]]
+
+class SessionStore:
+    """Base class for session backends"""
+
+    backend = "base"
+
+    def __init__(self, idle_ttl_seconds: float = 1800, max_turns: int = 10, max_answer_chars: int = 2000):
+        """
+        Args:
+            idle_ttl_seconds: Sessions untouched for this long are dropped
+            max_turns: History entries kept per session
+            max_answer_chars: Stored answers are truncated to this length
+        """
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_turns = max_turns
+        self.max_answer_chars = max_answer_chars
+
+    async def append_turn(
+        self,
+        session_id: str,
+        query: str,
+        answer: str,
+        confidence: float,
+        sources: List[str],
+        retrieval: Optional[Tuple[str, List[float]]] = None
+    ):
+        """
+        Add a query/answer pair to a session, creating it if needed
+
+        Args:
+            retrieval: (context, scores) the answer was built from, kept so
+                the next follow-up can reuse it instead of searching again
+        """
+        raise NotImplementedError
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return {"created_at", "history", "last_context", "last_scores"} for a session, or None"""
+        raise NotImplementedError
+
+    async def delete(self, session_id: str):
+        """Remove a session"""
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, Any]:
+        """Backend metrics"""
+        return {"backend": self.backend}
+
+    async def close(self):
+        """Release backend resources"""
+
+    def _compact(self, query: str, answer: str, confidence: float, sources: List[str]) -> Turn:
+        """Build the stored form of a turn"""
+        return (
+            round(time.time(), 3),
+            query,
+            answer[:self.max_answer_chars],
+            round(confidence, 3),
+            tuple(sources or ())
+        )
+
+    @staticmethod
+    def _expand(turn: Turn) -> Dict[str, Any]:
+        """History entry in the shape callers use"""
+        timestamp, query, answer, confidence, sources = turn
+        return {
+            "timestamp": timestamp,
+            "query": query,
+            "response": answer,
+            "confidence": confidence,
+            "sources": list(sources)
+        }
+
+class _Session:
+    """In-memory session record"""
+
+    __slots__ = ("created_at", "last_seen", "turns", "retrieval")
+
+    def __init__(self, now: float, max_turns: int):
+        self.created_at = now
+        self.last_seen = now
+        self.turns: deque = deque(maxlen=max_turns)
+        self.retrieval: Optional[Tuple[str, List[float]]] = None
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store with a session cap and idle expiry"""
+
+    backend = "memory"
+
+    def __init__(self, max_sessions: int = 10000, **kwargs):
+        """
+        Args:
+            max_sessions: Least recently used sessions are evicted past this
+        """
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        # Ordered by last access, so idle sessions collect at the front
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+
+    async def append_turn(
+        self,
+        session_id: str,
+        query: str,
+        answer: str,
+        confidence: float,
+        sources: List[str],
+        retrieval: Optional[Tuple[str, List[float]]] = None
+    ):
+        now = time.time()
+        self._expire(now)
+
+        session = self._touch(session_id, now)
+        if session is None:
+            session = _Session(now, self.max_turns)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted_capacity += 1
+
+        session.turns.append(self._compact(query, answer, confidence, sources))
+        session.retrieval = retrieval
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        self._expire(now)
+
+        session = self._touch(session_id, now)
+        if session is None:
+            return None
+        context, scores = session.retrieval or (None, [])
+        return {
+            "created_at": session.created_at,
+            "history": [self._expand(turn) for turn in session.turns],
+            "last_context": context,
+            "last_scores": list(scores)
+        }
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def stats(self) -> Dict[str, Any]:
+        self._expire(time.time())
+        return {
+            "backend": self.backend,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "evicted_idle": self.evicted_idle,
+            "evicted_capacity": self.evicted_capacity
+        }
+
+    def _touch(self, session_id: str, now: float) -> Optional[_Session]:
+        """Look up a session and mark it as most recently used"""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self, now: float):
+        """Drop sessions idle for longer than the TTL"""
+        cutoff = now - self.idle_ttl_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_seen >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted_idle += 1
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions in Redis, shared across uvicorn workers and replicas
+
+    Each session is a capped list of compact JSON turns, a creation
+    timestamp and the last retrieval, all expiring after the idle TTL.
+    Every access renews them.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, key_prefix: str = "session:", **kwargs):
+        """
+        Args:
+            url: Redis connection URL
+            key_prefix: Namespace for session keys
+        """
+        super().__init__(**kwargs)
+        import redis.asyncio as redis_asyncio
+
+        self.url = url
+        self.key_prefix = key_prefix
+        self.redis = redis_asyncio.from_url(url, decode_responses=True)
+
+    async def append_turn(
+        self,
+        session_id: str,
+        query: str,
+        answer: str,
+        confidence: float,
+        sources: List[str],
+        retrieval: Optional[Tuple[str, List[float]]] = None
+    ):
+        turns_key, created_key, context_key = self._keys(session_id)
+        record = json.dumps(self._compact(query, answer, confidence, sources), separators=(",", ":"))
+        ttl = max(1, int(self.idle_ttl_seconds))
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(created_key, time.time(), nx=True, ex=ttl)
+            pipe.expire(created_key, ttl)
+            pipe.rpush(turns_key, record)
+            pipe.ltrim(turns_key, -self.max_turns, -1)
+            pipe.expire(turns_key, ttl)
+            if retrieval is not None:
+                pipe.set(context_key, json.dumps(list(retrieval), separators=(",", ":")), ex=ttl)
+            else:
+                pipe.delete(context_key)
+            await pipe.execute()
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        turns_key, created_key, context_key = self._keys(session_id)
+        ttl = max(1, int(self.idle_ttl_seconds))
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(created_key)
+            pipe.lrange(turns_key, 0, -1)
+            pipe.get(context_key)
+            pipe.expire(created_key, ttl)
+            pipe.expire(turns_key, ttl)
+            pipe.expire(context_key, ttl)
+            created_at, records, retrieval, _, _, _ = await pipe.execute()
+
+        if created_at is None and not records:
+            return None
+        context, scores = json.loads(retrieval) if retrieval else (None, [])
+        return {
+            "created_at": float(created_at) if created_at else None,
+            "history": [self._expand(tuple(json.loads(record))) for record in records],
+            "last_context": context,
+            "last_scores": scores
+        }
+
+    async def delete(self, session_id: str):
+        await self.redis.delete(*self._keys(session_id))
+
+    async def stats(self) -> Dict[str, Any]:
+        stats = {"backend": self.backend, "url": self.url.split("@")[-1]}
+        try:
+            await self.redis.ping()
+            stats["connected"] = True
+        except Exception as e:
+            logger.warning(f"Redis session store unreachable: {e}")
+            stats["connected"] = False
+        return stats
+
+    async def close(self):
+        await self.redis.aclose()
+
+    def _keys(self, session_id: str) -> Tuple[str, str, str]:
+        """Keys holding a session's turns, creation time and last retrieval"""
+        base = f"{self.key_prefix}{session_id}"
+        return f"{base}:turns", f"{base}:created", f"{base}:context"
+
+def create_session_store() -> SessionStore:
+    """Build the configured session backend"""
+    options = {
+        "idle_ttl_seconds": settings.SESSION_IDLE_TTL_SECONDS,
+        "max_turns": settings.SESSION_MAX_TURNS,
+        "max_answer_chars": settings.SESSION_MAX_ANSWER_CHARS
+    }
+    if settings.SESSION_BACKEND == "redis":
+        logger.info("Using Redis session store")
+        return RedisSessionStore(settings.REDIS_URL, **options)
+    if settings.SESSION_BACKEND == "memory":
+        return InMemorySessionStore(max_sessions=settings.SESSION_MAX_SESSIONS, **options)
+    raise ValueError(f"Unsupported session backend: {settings.SESSION_BACKEND}")
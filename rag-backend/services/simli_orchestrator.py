@@ -3,27 +3,49 @@ Simli Orchestrator for coordinating between Simli, RAG, and LLM services
 """
 
 import logging
+import re
 import time
-from typing import Optional, Dict, Any
-import asyncio
+from typing import Optional, Dict, Any, AsyncGenerator, AsyncIterator, List, Tuple
 import json
 
 from fastapi import WebSocket
 
+from services.conversation import ConversationContext, ConversationManager
+from services.intent_matcher import IntentMatcher
 from services.retrieval import RetrievalService
 from services.llm_service import LLMService
+from services.query_router import QueryRouter, RouteDecision, FAST_ROUTE
+from services.session_store import SessionStore, create_session_store
+from services.single_flight import SingleFlight
+from services.tracing import span
+from services.stream_writer import CoalescingWriter
+from services.resilience import Deadline
+from services.upstream_governor import governor
+from services.usage_tracker import RequestUsage, current_usage, mark_first_token, record_shared_usage, usage_steps
 from models.schemas import RAGResponse
 from utils.config import settings
+from utils.speech_stream import SpeechSegmenter
 
 logger = logging.getLogger(__name__)
 
 class SimliOrchestrator:
     """Orchestrates the flow between Simli frontend, RAG backend, and LLM"""
     
-    def __init__(self, retrieval_service: RetrievalService, llm_service: LLMService):
+    def __init__(
+        self,
+        retrieval_service: RetrievalService,
+        llm_service: LLMService,
+        session_store: Optional[SessionStore] = None
+    ):
         self.retrieval_service = retrieval_service
         self.llm_service = llm_service
-        self.active_sessions = {}
+        self.sessions = session_store or create_session_store()
+        self.single_flight = SingleFlight() if settings.SINGLE_FLIGHT_ENABLED else None
+        # WebSockets waiting on each in-flight shared pipeline, for status updates
+        self._flight_listeners: Dict[str, List[WebSocket]] = {}
+        self.router = QueryRouter.from_settings()
+        self.conversation = ConversationManager.from_settings()
+        self.intents = IntentMatcher.from_settings() if settings.INTENTS_ENABLED else None
         
     async def process_query(
         self,
@@ -35,6 +57,11 @@ class SimliOrchestrator:
         """
         Process a complete query through the RAG pipeline
         
+        Greetings and other listed intents are answered from the intent table.
+        Concurrent identical queries (same normalized text and KB generation)
+        share a single retrieval and generation run. Queries within a session
+        with history are answered on their own, with the history in the prompt.
+        
         Args:
             query: User's query
             stream: Whether to stream the response
@@ -45,63 +72,43 @@ class SimliOrchestrator:
             Complete RAG response
         """
         start_time = time.time()
-        processing_steps = {}
+        deadline = Deadline.after(settings.REQUEST_DEADLINE_SECONDS)
+        
+        canned = self._canned_response(query)
+        if canned is not None:
+            canned.processing_steps.update(usage_steps())
+            return canned
         
         try:
             # Step 1: Send status update if websocket
             if websocket:
                 await self._send_status(websocket, "Searching knowledge base...")
             
-            # Step 2: Retrieve relevant context
-            retrieval_start = time.time()
-            context = await self.retrieval_service.retrieve_context(query, num_results=5)
-            processing_steps["retrieval_ms"] = (time.time() - retrieval_start) * 1000
-            
-            # Step 3: Send status update
-            if websocket:
-                await self._send_status(websocket, "Generating response...")
-            
-            # Step 4: Generate response with LLM
-            llm_start = time.time()
+            conversation = await self._load_conversation(query, session_id)
             
+            # Step 2: Retrieve context and generate the answer
             if stream and websocket:
                 # Stream response through websocket
-                answer = await self._stream_response(query, context, websocket)
-                processing_steps["llm_generation_ms"] = (time.time() - llm_start) * 1000
-                
-                # Calculate confidence after streaming
-                confidence = self.llm_service._calculate_confidence(answer, context)
-                sources = self.llm_service._extract_sources(context)
-                
-                rag_response = RAGResponse(
-                    query=query,
-                    context=context,
-                    answer=answer,
-                    confidence=confidence,
-                    sources=sources,
-                    processing_steps=processing_steps
-                )
+                rag_response = await self._stream_response(query, websocket, conversation)
+            elif self.single_flight and conversation.standalone:
+                rag_response = await self._coalesced_pipeline(query, websocket, deadline)
             else:
-                # Get complete response
-                rag_response = await self.llm_service.generate_response(
-                    query=query,
-                    context=context,
-                    stream=False
-                )
-                processing_steps["llm_generation_ms"] = (time.time() - llm_start) * 1000
-                rag_response.processing_steps = processing_steps
-            
-            # Step 5: Store in session if session_id provided
+                rag_response = await self._run_pipeline(query, websocket, deadline, conversation)
+            
+            # Step 3: Store in session if session_id provided
             if session_id:
                 await self._update_session(session_id, query, rag_response)
             
-            # Step 6: Calculate total time
+            # Step 4: Calculate total time and attach token/cost accounting
+            processing_steps = rag_response.processing_steps
             total_time = (time.time() - start_time) * 1000
             processing_steps["total_ms"] = total_time
+            if not processing_steps.get("coalesced"):
+                processing_steps.update(usage_steps())
             
             logger.info(
                 f"Query processed in {total_time:.2f}ms "
-                f"(retrieval: {processing_steps['retrieval_ms']:.2f}ms, "
+                f"(retrieval: {processing_steps.get('retrieval_ms', 0):.2f}ms, "
                 f"generation: {processing_steps.get('llm_generation_ms', 0):.2f}ms)"
             )
             
@@ -111,43 +118,462 @@ class SimliOrchestrator:
             logger.error(f"Orchestration error: {e}")
             raise
     
-    async def _stream_response(
+    def _canned_response(self, query: str) -> Optional[RAGResponse]:
+        """Answer from the intent table, or None to run the pipeline"""
+        if not self.intents:
+            return None
+        with span("intent_match") as matched:
+            match = self.intents.match(query)
+            matched.set_attribute("hit", match is not None)
+        if match is None:
+            return None
+        
+        logger.info(f"Canned answer for intent {match.intent} ({match.method}, {match.match_ms:.3f}ms)")
+        return RAGResponse(
+            query=query,
+            context="",
+            answer=match.answer,
+            confidence=1.0,
+            sources=[],
+            processing_steps={
+                "canned_answer": 1.0,
+                "intent_match_ms": match.match_ms,
+                "retrieval_ms": 0.0,
+                "llm_generation_ms": 0.0,
+                "total_ms": match.match_ms
+            }
+        )
+    
+    async def pregenerate_intents(self):
+        """Generate answers for intents that only have a prompt, with the fast model"""
+        if not self.intents:
+            return
+        
+        async def generate(prompt: str) -> str:
+            response = await self.llm_service.generate_response(
+                query=prompt,
+                context="",
+                max_tokens=settings.FAST_MAX_TOKENS,
+                model=settings.FAST_LLM_MODEL
+            )
+            return response.answer
+        
+        await self.intents.pregenerate(generate)
+    
+    async def _load_conversation(
         self,
         query: str,
-        context: str,
-        websocket: WebSocket
-    ) -> str:
-        """Stream LLM response through websocket"""
+        session_id: Optional[str],
+        prefetched: Optional[Tuple[str, List[float]]] = None
+    ) -> ConversationContext:
+        """
+        Rewrite, reuse and history decisions for a query in its session
+        
+        Args:
+            query: User's query
+            session_id: Session ID for conversation continuity
+            prefetched: (context, scores) already retrieved for this query,
+                e.g. speculatively from a partial voice transcript
+        """
+        if not session_id:
+            conversation = ConversationContext(retrieval_query=query)
+        else:
+            session = await self.sessions.get(session_id)
+            conversation = self.conversation.prepare(query, session)
+        
+        if prefetched is not None and conversation.reuse_context is None:
+            conversation.reuse_context, conversation.reuse_scores = prefetched
+            conversation.prefetched = True
+        return conversation
+    
+    async def prefetch_context(self, query: str, session_id: Optional[str] = None) -> Tuple[str, List[float]]:
+        """
+        Retrieve context for a query before it is final
+        
+        Used on partial voice transcripts so that retrieval overlaps with the
+        user still speaking; same-topic follow-ups reuse the previous turn.
+        
+        Returns:
+            Tuple of (context, relevance scores) for handle_voice_query
+        """
+        conversation = await self._load_conversation(query, session_id)
+        if conversation.reuse_context is not None:
+            return conversation.reuse_context, conversation.reuse_scores
+        context, scores = await self.retrieval_service.retrieve_scored_context(
+            conversation.retrieval_query,
+            num_results=5
+        )
+        return conversation.merged(context), scores
+    
+    async def _retrieve(
+        self,
+        conversation: ConversationContext,
+        deadline: Optional[Deadline],
+        processing_steps: Dict[str, float]
+    ) -> Tuple[str, List[float]]:
+        """Context for a turn: the previous turn's on a same-topic follow-up, else a search"""
+        processing_steps["query_rewritten"] = float(conversation.rewritten)
+        processing_steps["history_tokens"] = float(conversation.history_tokens)
+        processing_steps["context_reused"] = float(conversation.reuse_context is not None)
+        processing_steps["retrieval_prefetched"] = float(conversation.prefetched)
+        
+        if conversation.reuse_context is not None:
+            processing_steps["retrieval_ms"] = 0.0
+            return conversation.reuse_context, conversation.reuse_scores
+        
+        retrieval_start = time.time()
+        context, scores = await self.retrieval_service.retrieve_scored_context(
+            conversation.retrieval_query,
+            num_results=5,
+            deadline=deadline
+        )
+        processing_steps["retrieval_ms"] = (time.time() - retrieval_start) * 1000
+        processing_steps["degraded_retrieval"] = float(self.retrieval_service.degraded)
+        processing_steps["context_merged"] = float(conversation.merge_context is not None)
+        return conversation.merged(context), scores
+    
+    async def _coalesced_pipeline(
+        self,
+        query: str,
+        websocket: Optional[WebSocket],
+        deadline: Optional[Deadline]
+    ) -> RAGResponse:
+        """
+        Answer a standalone query with one pipeline run shared by identical concurrent queries
+        
+        The shared run sends its status updates to every caller waiting on
+        it and tracks its usage on its own. Each caller gets a copy of the
+        result carrying that usage; callers that joined a run already in
+        flight are marked coalesced.
+        """
+        key = self._flight_key(query)
+        listeners = self._flight_listeners.setdefault(key, [])
+        if websocket:
+            listeners.append(websocket)
+        led = False
+        
+        def start():
+            nonlocal led
+            led = True
+            return self._shared_pipeline(query, key, deadline)
+        
+        try:
+            with span("single_flight") as flight_span:
+                shared, usage = await self.single_flight.do(key, start)
+                flight_span.set_attribute("coalesced", not led)
+        finally:
+            if websocket:
+                listeners.remove(websocket)
+            if not listeners and self._flight_listeners.get(key) is listeners:
+                del self._flight_listeners[key]
+        
+        record_shared_usage(usage, charged=led)
+        # Each caller gets its own copy of the shared result
+        rag_response = shared.model_copy(deep=True, update={"query": query})
+        rag_response.processing_steps["coalesced"] = float(not led)
+        if not led:
+            # Charged to the caller that started the run, reported to all
+            rag_response.processing_steps.update(usage.to_steps())
+        return rag_response
+    
+    async def _shared_pipeline(
+        self,
+        query: str,
+        key: str,
+        deadline: Optional[Deadline]
+    ) -> Tuple[RAGResponse, RequestUsage]:
+        """Run the pipeline for a flight, tracking its usage apart from the caller that started it"""
+        usage = RequestUsage("single_flight")
+        # The flight runs in its own task, so this does not touch the caller's tracker
+        current_usage.set(usage)
+        response = await self._run_pipeline(query, deadline=deadline, flight_key=key)
+        return response, usage
+    
+    async def _run_pipeline(
+        self,
+        query: str,
+        websocket: Optional[WebSocket] = None,
+        deadline: Optional[Deadline] = None,
+        conversation: Optional[ConversationContext] = None,
+        flight_key: Optional[str] = None
+    ) -> RAGResponse:
+        """
+        Retrieve context within the deadline and generate a complete answer
+        
+        The answer itself is bounded by the LLM service's completion
+        timeout, which grows with max_tokens.
+        
+        Status updates go to websocket, or to every caller waiting on
+        flight_key when the run is shared.
+        """
+        conversation = conversation or ConversationContext(retrieval_query=query)
+        processing_steps = {}
+        
+        context, scores = await self._retrieve(conversation, deadline, processing_steps)
+        
+        decision = self.router.classify(query, scores)
+        processing_steps["fast_route"] = float(decision.route == FAST_ROUTE)
+        
+        listeners = [websocket] if websocket else list(self._flight_listeners.get(flight_key, []))
+        for listener in listeners:
+            await self._send_status(listener, "Generating response...")
+        
+        llm_start = time.time()
+        rag_response = await self.llm_service.generate_response(
+            query=query,
+            context=context,
+            stream=False,
+            max_tokens=decision.max_tokens,
+            model=decision.model,
+            history=conversation.history_messages
+        )
+        processing_steps["llm_generation_ms"] = (time.time() - llm_start) * 1000
+        self._record_route(decision, processing_steps["llm_generation_ms"], rag_response.answer)
+        rag_response.processing_steps = {**rag_response.processing_steps, **processing_steps}
+        rag_response.retrieval_scores = scores
+        
+        return rag_response
+    
+    async def _pipeline_events(
+        self,
+        query: str,
+        conversation: Optional[ConversationContext] = None
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Run the streaming pipeline as internal events
+        
+        Yields ("retrieved", context), then ("token", delta) for each LLM
+        delta, then ("response", RAGResponse) once generation finishes.
+        The request deadline covers retrieval and the first token.
+        """
+        conversation = conversation or ConversationContext(retrieval_query=query)
+        start_time = time.time()
+        deadline = Deadline.after(settings.REQUEST_DEADLINE_SECONDS)
+        processing_steps = {}
+        
+        context, scores = await self._retrieve(conversation, deadline, processing_steps)
+        yield ("retrieved", context)
+        
+        decision = self.router.classify(query, scores)
+        processing_steps["fast_route"] = float(decision.route == FAST_ROUTE)
+        
+        llm_start = time.time()
         full_response = []
         
+        async for chunk in self.llm_service.stream_response(
+            query,
+            context,
+            max_tokens=decision.max_tokens,
+            deadline=deadline,
+            model=decision.model,
+            history=conversation.history_messages,
+            processing_steps=processing_steps
+        ):
+            if not full_response:
+                processing_steps["time_to_first_token_ms"] = (time.time() - start_time) * 1000
+            full_response.append(chunk)
+            yield ("token", chunk)
+        
+        processing_steps["llm_generation_ms"] = (time.time() - llm_start) * 1000
+        processing_steps["total_ms"] = (time.time() - start_time) * 1000
+        self._record_route(decision, processing_steps["llm_generation_ms"], ''.join(full_response))
+        
+        rag_response = self.llm_service.build_rag_response(
+            query, context, ''.join(full_response), processing_steps
+        )
+        rag_response.retrieval_scores = scores
+        yield ("response", rag_response)
+    
+    def _pipeline_stream(
+        self,
+        query: str,
+        conversation: Optional[ConversationContext] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Pipeline events, shared with concurrent identical streaming queries"""
+        if self.single_flight and (conversation is None or conversation.standalone):
+            return self._coalesced_events(query)
+        return self._pipeline_events(query, conversation)
+    
+    async def _coalesced_events(self, query: str) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Pipeline events from one run shared by identical concurrent streaming queries
+        
+        As with _coalesced_pipeline, the shared run tracks its usage on its
+        own. When the response arrives, the subscriber that started the run
+        is charged for it and the others are marked coalesced.
+        """
+        led = False
+        
+        def start():
+            nonlocal led
+            led = True
+            return self._shared_events(query)
+        
+        async for kind, payload in self.single_flight.stream(self._flight_key(query), start):
+            if kind == "response":
+                shared, usage = payload
+                record_shared_usage(usage, charged=led)
+                payload = shared.model_copy(deep=True)
+                payload.processing_steps["coalesced"] = float(not led)
+                if not led:
+                    # Charged to the subscriber that started the run, reported to all
+                    payload.processing_steps.update(usage.to_steps())
+            yield (kind, payload)
+    
+    async def _shared_events(self, query: str) -> AsyncGenerator[Tuple[str, Any], None]:
+        """Pipeline events for a shared stream, with the response paired with the run's usage"""
+        usage = RequestUsage("single_flight")
+        # The stream is pumped by its own task, so this does not touch the subscriber's tracker
+        current_usage.set(usage)
+        async for kind, payload in self._pipeline_events(query):
+            yield (kind, (payload, usage) if kind == "response" else payload)
+    
+    def _record_route(self, decision: RouteDecision, latency_ms: float, answer: str):
+        """Feed route latency and completion size back to the router stats"""
+        self.router.record(decision, latency_ms, governor.estimate_tokens([answer], decision.model))
+    
+    def _flight_key(self, query: str) -> str:
+        """Coalescing key: normalized query text plus the KB generation"""
+        normalized = re.sub(r'\s+', ' ', query.lower()).strip().rstrip('?!. ')
+        generation = self.retrieval_service.vector_store.get_generation()
+        return f"{generation}:{normalized}"
+    
+    async def stream_query(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        prefetched: Optional[Tuple[str, List[float]]] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Run the RAG pipeline and yield events as the answer is generated
+        
+        Emits one "token" event per LLM delta and a final "done" event
+        carrying sources, confidence and timings. Failures are reported as
+        an "error" event so SSE clients always see a terminal event.
+        Concurrent identical queries receive the same token stream.
+        
+        Args:
+            query: User's query
+            session_id: Session ID for conversation continuity
+            prefetched: (context, scores) already retrieved for this query
+            
+        Yields:
+            Event dicts with a "type" key
+        """
         try:
-            # Start streaming
-            await websocket.send_json({
-                "type": "stream_start",
-                "message": "Starting response stream..."
-            })
+            canned = self._canned_response(query)
+            if canned is not None:
+                mark_first_token()
+                yield {"type": "token", "content": canned.answer}
+                yield {
+                    "type": "done",
+                    "query": query,
+                    "confidence": canned.confidence,
+                    "sources": canned.sources,
+                    "processing_steps": {**canned.processing_steps, **usage_steps()}
+                }
+                return
+            
+            rag_response = None
+            conversation = await self._load_conversation(query, session_id, prefetched)
+            
+            async for kind, payload in self._pipeline_stream(query, conversation):
+                if kind == "token":
+                    mark_first_token()
+                    yield {"type": "token", "content": payload}
+                elif kind == "response":
+                    rag_response = payload.model_copy(deep=True, update={"query": query})
+            
+            if session_id:
+                await self._update_session(session_id, query, rag_response)
+            
+            processing_steps = rag_response.processing_steps
+            if not processing_steps.get("coalesced"):
+                processing_steps.update(usage_steps())
+            logger.info(
+                f"Streamed query in {processing_steps['total_ms']:.2f}ms "
+                f"(first token: {processing_steps.get('time_to_first_token_ms', 0):.2f}ms)"
+            )
+            
+            yield {
+                "type": "done",
+                "query": query,
+                "confidence": rag_response.confidence,
+                "sources": rag_response.sources,
+                "processing_steps": processing_steps
+            }
+            
+        except Exception as e:
+            logger.error(f"Streaming orchestration error: {e}")
+            yield {"type": "error", "message": str(e)}
+    
+    async def stream_speech(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        prefetched: Optional[Tuple[str, List[float]]] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Run the RAG pipeline and yield speakable sentences for TTS
+        
+        Token events from stream_query are replaced by "speech" events, each
+        holding one complete sentence with markdown and links removed. The
+        first segment is cut at a clause boundary so the avatar can start
+        talking as early as possible. "done" and "error" events pass through.
+        """
+        segmenter = self._create_segmenter()
+        index = 0
+        
+        async for event in self.stream_query(query, session_id=session_id, prefetched=prefetched):
+            if event["type"] == "token":
+                segments = segmenter.feed(event["content"])
+            elif event["type"] == "done":
+                segments = segmenter.flush()
+            else:
+                segments = []
             
-            # Stream the response
-            async for chunk in self.llm_service._generate_streaming_response(
-                messages=[
-                    {"role": "system", "content": settings.SYSTEM_PROMPT},
-                    {"role": "user", "content": self.llm_service._construct_user_prompt(query, context)}
-                ],
-                query=query,
-                context=context,
-                temperature=None,
-                max_tokens=None
-            ):
-                full_response.append(chunk)
-                
-                # Send chunk through websocket
-                await websocket.send_json({
-                    "type": "stream_chunk",
-                    "content": chunk
-                })
-                
-                # Small delay to prevent overwhelming the client
-                await asyncio.sleep(0.01)
+            for segment in segments:
+                yield {"type": "speech", "text": segment, "index": index}
+                index += 1
+            
+            if event["type"] != "token":
+                yield event
+    
+    def _create_segmenter(self) -> SpeechSegmenter:
+        """Create a speech segmenter from the configured limits"""
+        return SpeechSegmenter(
+            first_clause_min_chars=settings.SPEECH_FIRST_CLAUSE_MIN_CHARS or None,
+            max_segment_chars=settings.SPEECH_MAX_SEGMENT_CHARS
+        )
+    
+    async def _stream_response(
+        self,
+        query: str,
+        websocket: WebSocket,
+        conversation: Optional[ConversationContext] = None
+    ) -> RAGResponse:
+        """Stream LLM response through websocket"""
+        rag_response = None
+        
+        try:
+            # Deltas are coalesced into frames sized to the client's drain rate
+            async with CoalescingWriter.from_settings(websocket.send_json) as writer:
+                async for kind, payload in self._pipeline_stream(query, conversation):
+                    if kind == "retrieved":
+                        await self._send_status(websocket, "Generating response...")
+                        
+                        # Start streaming
+                        await websocket.send_json({
+                            "type": "stream_start",
+                            "message": "Starting response stream..."
+                        })
+                    
+                    elif kind == "token":
+                        mark_first_token()
+                        await writer.write(payload)
+                    
+                    elif kind == "response":
+                        rag_response = payload.model_copy(deep=True, update={"query": query})
             
             # Send stream complete
             await websocket.send_json({
@@ -155,7 +581,7 @@ class SimliOrchestrator:
                 "message": "Response complete"
             })
             
-            return ''.join(full_response)
+            return rag_response
             
         except Exception as e:
             logger.error(f"Streaming error: {e}")
@@ -176,61 +602,48 @@ class SimliOrchestrator:
             logger.warning(f"Failed to send status: {e}")
     
     async def _update_session(self, session_id: str, query: str, response: RAGResponse):
-        """Update session history"""
-        if session_id not in self.active_sessions:
-            self.active_sessions[session_id] = {
-                "created_at": time.time(),
-                "history": []
-            }
-        
-        self.active_sessions[session_id]["history"].append({
-            "timestamp": time.time(),
-            "query": query,
-            "response": response.answer,
-            "confidence": response.confidence,
-            "sources": response.sources
-        })
-        
-        # Limit session history
-        if len(self.active_sessions[session_id]["history"]) > 10:
-            self.active_sessions[session_id]["history"] = \
-                self.active_sessions[session_id]["history"][-10:]
+        """Update session history, keeping the retrieval for follow-ups"""
+        await self.sessions.append_turn(
+            session_id,
+            query,
+            response.answer,
+            response.confidence,
+            response.sources,
+            retrieval=(response.context, response.retrieval_scores)
+        )
     
     async def handle_voice_query(
         self,
-        audio_data: bytes,
-        websocket: WebSocket,
-        session_id: str
-    ) -> Dict[str, Any]:
-        """
-        Handle voice input from Simli
-        
-        This is a placeholder for voice handling.
-        In production, you would:
-        1. Send audio to speech-to-text service
-        2. Process the transcribed text
-        3. Generate response
-        4. Convert to speech with ElevenLabs
-        5. Send back to Simli
+        transcript: str,
+        session_id: Optional[str] = None,
+        prefetched: Optional[Tuple[str, List[float]]] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
         """
-        # Placeholder implementation
-        logger.info("Voice query received (not implemented)")
+        Answer a finished voice turn as speakable sentences
         
-        await websocket.send_json({
-            "type": "error",
-            "message": "Voice processing not yet implemented. Please use text input."
-        })
+        The transcript comes from the streaming STT session that ran while the
+        user was talking, so no transcription round trip is left to pay here.
+        Context retrieved from a matching partial transcript is used as is.
         
-        return {"status": "not_implemented"}
+        Args:
+            transcript: Final transcript of the utterance
+            session_id: Session ID for conversation continuity
+            prefetched: (context, scores) from prefetch_context, if still valid
+            
+        Yields:
+            The same events as stream_speech
+        """
+        logger.info(f"Voice query: {transcript} (prefetched: {prefetched is not None})")
+        async for event in self.stream_speech(transcript, session_id=session_id, prefetched=prefetched):
+            yield event
     
     async def get_session_history(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get conversation history for a session"""
-        return self.active_sessions.get(session_id)
+        return await self.sessions.get(session_id)
     
     async def clear_session(self, session_id: str):
         """Clear a session's history"""
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
+        await self.sessions.delete(session_id)
     
     async def prepare_for_tts(self, response: str) -> str:
         """Prepare response text for text-to-speech"""
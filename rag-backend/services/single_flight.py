@@ -0,0 +1,140 @@
+"""
+Single-flight coalescing for concurrent identical requests
+Callers with the same key share one running pipeline instead of each starting their own
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    """An in-flight awaitable shared by several callers"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class _Broadcast:
+    """An in-flight event stream replayed to every subscriber"""
+
+    def __init__(self, source: Callable[[], AsyncIterator[Any]]):
+        self.events: List[Any] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: Callable[[], AsyncIterator[Any]]):
+        """Drain the source once, recording every event for subscribers"""
+        try:
+            async for event in source():
+                self.events.append(event)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        """Wake all subscribers waiting for the next event"""
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncGenerator[Any, None]:
+        """Yield all events from the start of the stream, then live ones"""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+class SingleFlight:
+    """Deduplicate concurrent work by key"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once for all concurrent callers sharing key
+
+        The shared task is only cancelled when every waiter has gone away,
+        so one caller disconnecting does not fail the others.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            logger.debug(f"Coalesced request onto in-flight call {key}")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    async def stream(
+        self,
+        key: str,
+        source: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Fan out one event stream to all concurrent subscribers sharing key
+
+        Late subscribers first receive the events already produced, so every
+        subscriber observes the identical sequence.
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _Broadcast(source)
+            self._streams[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            logger.debug(f"Coalesced stream onto in-flight pipeline {key}")
+
+        flight.subscribers += 1
+        try:
+            async for event in flight.subscribe():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        """Return coalescing counters"""
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
+
+    @staticmethod
+    def _forget(flights: Dict[str, Any], key: str, flight: Any):
+        """Remove a finished flight unless a newer one already replaced it"""
+        if flights.get(key) is flight:
+            del flights[key]
@@ -0,0 +1,187 @@
+"""
+Adaptive frame coalescing for streamed answers
+Token deltas are buffered and sent as one frame per time window, byte
+threshold or finished sentence. The window widens while the client drains
+slowly and shrinks back once it keeps up, so slow clients get fewer,
+larger frames and fast ones get near per-token latency.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"[.!?:;\n]\s*$")
+
+class CoalescingStats:
+    """Process-wide counters for coalesced stream frames"""
+
+    def __init__(self):
+        self.deltas = 0
+        self.frames = 0
+        self.bytes = 0
+        self.widened = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return frame counters and the average deltas per frame"""
+        return {
+            "deltas": self.deltas,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "deltas_per_frame": self.deltas / self.frames if self.frames else 0.0,
+            "window_widened": self.widened
+        }
+
+# Global counters for this process
+coalescing_stats = CoalescingStats()
+
+class CoalescingWriter:
+    """
+    Batches text deltas into frames sent by a background task
+
+    The first delta is sent immediately so time to first token is not
+    delayed; later deltas wait at most one window. Use as an async context
+    manager: a clean exit flushes what is buffered, an error or
+    cancellation drops it.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        frame: Optional[Dict[str, Any]] = None,
+        window_ms: float = 30,
+        max_window_ms: float = 250,
+        max_frame_bytes: int = 1024,
+        sentence_flush: bool = True
+    ):
+        """
+        Args:
+            send: Coroutine function sending one JSON frame
+            frame: Fields added to every frame (defaults to {"type": "stream_chunk"})
+            window_ms: Longest a delta waits while the client keeps up
+            max_window_ms: Upper bound for the window when the client drains slowly
+            max_frame_bytes: Send as soon as this much text is buffered
+            sentence_flush: Send at sentence boundaries without waiting for the window
+        """
+        self._send = send
+        self._frame = frame or {"type": "stream_chunk"}
+        self.base_window = window_ms / 1000
+        self.max_window = max_window_ms / 1000
+        self.window = self.base_window
+        self.max_frame_bytes = max_frame_bytes
+        self.sentence_flush = sentence_flush
+
+        self._buffer: List[str] = []
+        self._size = 0
+        self._first_buffered_at: Optional[float] = None
+        self._sent_first = False
+        self._closing = False
+        self._pending = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(
+        cls,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        frame: Optional[Dict[str, Any]] = None
+    ) -> "CoalescingWriter":
+        """Build a writer with the configured window and thresholds"""
+        return cls(
+            send,
+            frame,
+            window_ms=settings.WS_STREAM_WINDOW_MS,
+            max_window_ms=settings.WS_STREAM_MAX_WINDOW_MS,
+            max_frame_bytes=settings.WS_STREAM_MAX_FRAME_BYTES,
+            sentence_flush=settings.WS_STREAM_SENTENCE_FLUSH
+        )
+
+    async def __aenter__(self) -> "CoalescingWriter":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def write(self, text: str):
+        """Buffer a delta; raises if sending has already failed"""
+        if self._task.done():
+            # Surface the send error (e.g. the client went away) to the producer
+            self._task.result()
+            raise RuntimeError("Writer is closed")
+        if not text:
+            return
+
+        coalescing_stats.deltas += 1
+        self._buffer.append(text)
+        self._size += len(text.encode())
+        if self._first_buffered_at is None:
+            self._first_buffered_at = time.monotonic()
+
+        if (
+            not self._sent_first
+            or self._size >= self.max_frame_bytes
+            or (self.sentence_flush and _SENTENCE_END.search(text))
+        ):
+            self._ready.set()
+        self._pending.set()
+
+    async def close(self):
+        """Send whatever is buffered and stop the sender"""
+        self._closing = True
+        self._ready.set()
+        self._pending.set()
+        await self._task
+
+    async def _run(self):
+        """Send buffered text once the window elapses or a threshold is hit"""
+        while True:
+            await self._pending.wait()
+
+            if not self._ready.is_set():
+                remaining = self.window - (time.monotonic() - self._first_buffered_at)
+                if remaining > 0:
+                    try:
+                        await asyncio.wait_for(self._ready.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+
+            self._pending.clear()
+            self._ready.clear()
+            if self._buffer:
+                await self._flush()
+            if self._closing and not self._buffer:
+                return
+
+    async def _flush(self):
+        """Send the buffer as one frame and adapt the window to the send time"""
+        content = "".join(self._buffer)
+        size = self._size
+        self._buffer = []
+        self._size = 0
+        self._first_buffered_at = None
+        self._sent_first = True
+
+        started = time.monotonic()
+        await self._send({**self._frame, "content": content})
+        elapsed = time.monotonic() - started
+
+        coalescing_stats.frames += 1
+        coalescing_stats.bytes += size
+
+        # A send that outlasts the window means the client is not keeping
+        # up: let more text accumulate per frame, then ease back
+        if elapsed > self.window:
+            self.window = min(self.max_window, elapsed * 2)
+            coalescing_stats.widened += 1
+        else:
+            self.window = max(self.base_window, self.window * 0.75)
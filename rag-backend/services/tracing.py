@@ -0,0 +1,366 @@
+"""
+Stage-level tracing
+Nested spans for each request (root span per HTTP request or WebSocket
+query, children for retrieval, embedding, vector query, prompt build and
+generation), kept in per-stage latency windows and optionally exported as
+OTLP/JSON lines that an OpenTelemetry collector can read as they are
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+def new_request_id() -> str:
+    """Fresh request id for requests that did not bring one"""
+    return uuid.uuid4().hex[:16]
+
+class Span:
+    """One timed stage of a request"""
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.end_ns: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        """Attach a scalar attribute (str, bool, int or float)"""
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        """Mark the span failed, or cancelled when the client went away"""
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            self.attributes["cancelled"] = True
+            return
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        """Finish the span and hand it to the tracer (only the first call counts)"""
+        if self.end_ns is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.end_ns = self.start_ns + int(self.duration_ms * 1_000_000)
+        tracer.on_end(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The span in OTLP/JSON form"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2 if self.parent_id is None else 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+class _NoopSpan(Span):
+    """Stands in for a span outside traced requests; records nothing"""
+
+    def __init__(self):
+        super().__init__("noop", "")
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+class FileSpanExporter:
+    """
+    Appends finished spans to a file as OTLP/JSON, one export request per line
+
+    Spans are queued and written by a background thread, so request
+    handling never waits on the disk.
+    """
+
+    def __init__(self, path: str, service_name: str = "rag-backend", max_batch: int = 512):
+        self.path = path
+        self.service_name = service_name
+        self.max_batch = max_batch
+        self.exported = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=10000)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        """Queue a finished span (dropped if the writer has fallen far behind)"""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self, timeout: float = 2.0):
+        """Write what is queued and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            span = self._queue.get()
+            if span is None:
+                return
+            batch = [span]
+            while len(batch) < self.max_batch:
+                try:
+                    span = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if span is None:
+                    self._write(batch)
+                    return
+                batch.append(span)
+            self._write(batch)
+
+    def _write(self, spans: List[Span]):
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "rag-backend.tracing"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request, separators=(",", ":")) + "\n")
+            self.exported += len(spans)
+        except Exception as e:
+            self.dropped += len(spans)
+            logger.warning(f"Could not export spans to {self.path}: {e}")
+
+class Tracer:
+    """Collects finished spans into per-stage latency windows and the exporter"""
+
+    def __init__(self, enabled: bool = True, window: int = 1000, exporter: Optional[FileSpanExporter] = None):
+        """
+        Args:
+            enabled: When False no spans are created
+            window: Recent durations kept per span name
+            exporter: Destination for finished spans (None keeps stats only)
+        """
+        self.enabled = enabled
+        self.window = window
+        self.exporter = exporter
+        self._durations: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls) -> "Tracer":
+        """Build the process tracer from configuration"""
+        exporter = None
+        if settings.TRACING_ENABLED and settings.TRACE_EXPORT_PATH:
+            exporter = FileSpanExporter(settings.TRACE_EXPORT_PATH, settings.TRACE_SERVICE_NAME)
+        return cls(settings.TRACING_ENABLED, settings.TRACE_LATENCY_WINDOW, exporter)
+
+    def on_end(self, span: Span):
+        """Record a finished span"""
+        durations = self._durations.get(span.name)
+        if durations is None:
+            durations = self._durations[span.name] = deque(maxlen=self.window)
+        durations.append(span.duration_ms)
+        self._counts[span.name] = self._counts.get(span.name, 0) + 1
+        if span.status == STATUS_ERROR:
+            self._errors[span.name] = self._errors.get(span.name, 0) + 1
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def latency(self) -> Dict[str, Any]:
+        """Recent duration percentiles per stage"""
+        stages = {}
+        for name, durations in sorted(self._durations.items()):
+            ordered = sorted(durations)
+            stages[name] = {
+                "count": self._counts[name],
+                "errors": self._errors.get(name, 0),
+                "p50_ms": _percentile(ordered, 0.5),
+                "p90_ms": _percentile(ordered, 0.9),
+                "p95_ms": _percentile(ordered, 0.95),
+                "p99_ms": _percentile(ordered, 0.99),
+                "max_ms": ordered[-1] if ordered else 0.0
+            }
+        return {
+            "window": self.window,
+            "stages": stages,
+            "export": {
+                "path": self.exporter.path,
+                "exported": self.exporter.exported,
+                "dropped": self.exporter.dropped
+            } if self.exporter else None
+        }
+
+    def reset(self):
+        """Forget recorded durations"""
+        self._durations.clear()
+        self._counts.clear()
+        self._errors.clear()
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """Percentile of a sorted sample (0 when empty)"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+# Global tracer for this process
+tracer = Tracer.from_settings()
+
+# Span the current task is inside of, and the id of the request it serves
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+    """
+    Start a child span without making it current
+
+    For stages that cross yields in async generators, where a context
+    variable cannot be set and reset. The caller must end() the span;
+    one that is never ended is not recorded. Outside a traced request
+    this returns NOOP_SPAN.
+    """
+    parent = parent or current_span.get()
+    if not tracer.enabled or parent is None or parent is NOOP_SPAN:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time the enclosed block as a child of the current span
+
+    Outside a traced request (ingestion, scheduled updates) this records
+    nothing and yields NOOP_SPAN.
+    """
+    child = start_span(name, **attributes)
+    if child is NOOP_SPAN:
+        yield child
+        return
+
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set_error(e)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+@contextmanager
+def trace_request(name: str, request_id: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Root span for one request; its id is recorded as the request.id attribute
+
+    Args:
+        name: Span name, e.g. "POST /query" or "ws.query"
+        request_id: Id to trace under (defaults to the HTTP request's id)
+    """
+    if not tracer.enabled:
+        yield NOOP_SPAN
+        return
+
+    request_id = request_id or current_request_id.get() or new_request_id()
+    root = Span(name, uuid.uuid4().hex, attributes={"request.id": request_id, **attributes})
+    span_token = current_span.set(root)
+    id_token = current_request_id.set(request_id)
+    try:
+        yield root
+    except BaseException as e:
+        root.set_error(e)
+        raise
+    finally:
+        current_request_id.reset(id_token)
+        current_span.reset(span_token)
+        root.end()
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware carrying X-Request-ID through HTTP and WebSocket requests
+
+    The client's id is kept (or one is generated), made current for the
+    request's tasks and echoed on HTTP responses.
+    """
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next(
+            (value.decode("latin-1")[:128] for key, value in scope.get("headers", []) if key == self.header),
+            None
+        ) or new_request_id()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (self.header, request_id.encode("latin-1"))]}
+            await send(message)
+
+        token = current_request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_request_id.reset(token)
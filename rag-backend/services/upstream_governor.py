@@ -0,0 +1,266 @@
+"""
+Upstream governor for OpenAI calls
+Caps concurrency and enforces request/token-per-minute budgets with a priority queue
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import tiktoken
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Lower values are served first"""
+    VOICE = 0
+    INTERACTIVE = 1
+    INGEST = 2
+
+# Priority of upstream calls made from the current task (set by entry points)
+current_priority: ContextVar[Priority] = ContextVar("upstream_priority", default=Priority.INTERACTIVE)
+
+@contextmanager
+def upstream_priority(priority: Priority):
+    """Run the enclosed block with the given upstream priority"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+class TokenBucket:
+    """Continuously refilling bucket sized to a per-minute limit (or a smaller burst)"""
+
+    def __init__(self, per_minute: int, burst: Optional[int] = None):
+        self.capacity = float(burst or per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        """Add tokens accrued since the last update"""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (0 when it already is)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        """Consume amount (the caller has checked availability)"""
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        """Return unused reservation to the bucket"""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+class Lease:
+    """Permission to make one upstream call"""
+
+    def __init__(self, governor: "UpstreamGovernor", tokens: int):
+        self._governor = governor
+        self.tokens = tokens
+
+    def reconcile(self, actual_tokens: int):
+        """Settle the token reservation against what the call actually used"""
+        bucket = self._governor.tpm_bucket
+        unused = self.tokens - actual_tokens
+        if not unused or not bucket:
+            return
+        if unused > 0:
+            bucket.give_back(unused)
+            self._governor._dispatch()
+        else:
+            # Overran the estimate: the bucket may go negative and delay later calls
+            bucket.take(-unused)
+        self.tokens = actual_tokens
+
+class UpstreamGovernor:
+    """
+    Shared admission control for all OpenAI traffic
+
+    A call is granted when a concurrency slot is free and both the
+    request-per-minute and token-per-minute buckets can cover it. Waiters
+    are granted strictly in priority order, then FIFO, so voice traffic
+    overtakes queued ingestion embeddings.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0
+    ):
+        """
+        Args:
+            max_concurrency: Maximum simultaneous upstream calls
+            requests_per_minute: RPM budget (0 disables the bucket)
+            tokens_per_minute: TPM budget (0 disables the bucket)
+        """
+        self.max_concurrency = max_concurrency
+        self.rpm_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tpm_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.in_flight = 0
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._encodings: Dict[str, Any] = {}
+
+        # Metrics
+        self.granted = 0
+        self.throttled = 0
+        self._waits_ms: Dict[Priority, deque] = {p: deque(maxlen=1000) for p in Priority}
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        tokens: int = 0,
+        priority: Optional[Priority] = None
+    ) -> AsyncIterator[Lease]:
+        """
+        Wait for permission to call upstream and hold it for the block
+
+        Args:
+            tokens: Estimated tokens the call will consume
+            priority: Override the task's current priority
+        """
+        priority = current_priority.get() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (int(priority), next(self._sequence), tokens, future)
+        heapq.heappush(self._queue, entry)
+        enqueued = time.monotonic()
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot back
+                self._release()
+            else:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                self._dispatch()
+            raise
+
+        self._waits_ms[Priority(priority)].append((time.monotonic() - enqueued) * 1000)
+        try:
+            yield Lease(self, tokens)
+        finally:
+            self._release()
+
+    def _release(self):
+        """Free a concurrency slot and grant the next waiter"""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant queued calls in priority order while capacity allows"""
+        if self._wakeup:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._queue and self.in_flight < self.max_concurrency:
+            _, _, tokens, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            wait = max(
+                self.rpm_bucket.wait_time(1) if self.rpm_bucket else 0.0,
+                self.tpm_bucket.wait_time(tokens) if self.tpm_bucket else 0.0
+            )
+            if wait > 0:
+                # Head of line is rate limited: retry once the buckets refill
+                self.throttled += 1
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._queue)
+            if self.rpm_bucket:
+                self.rpm_bucket.take(1)
+            if self.tpm_bucket:
+                self.tpm_bucket.take(tokens)
+            self.in_flight += 1
+            self.granted += 1
+            future.set_result(None)
+
+    def estimate_tokens(self, texts: Iterable[str], model: str) -> int:
+        """Estimate prompt tokens for texts with the model's tokenizer"""
+        encoding = self._encoding_for(model)
+        total = 0
+        for text in texts:
+            total += len(encoding.encode(text)) if encoding else len(text) // 4 + 1
+        return total
+
+    def estimate_chat_tokens(self, messages: List[Dict[str, str]], model: str, max_tokens: int) -> int:
+        """Estimate TPM cost of a chat call: prompt plus the completion allowance"""
+        prompt = self.estimate_tokens((m["content"] for m in messages), model)
+        return prompt + 4 * len(messages) + 2 + max_tokens
+
+    def _encoding_for(self, model: str):
+        """Cached tiktoken encoding, or None when no tokenizer is available"""
+        if model not in self._encodings:
+            try:
+                try:
+                    self._encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self._encodings[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"No tokenizer for {model}, estimating by length: {e}")
+                self._encodings[model] = None
+        return self._encodings[model]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, wait-time and throughput metrics"""
+        depth = {p.name.lower(): 0 for p in Priority}
+        for priority, _, _, future in self._queue:
+            if not future.done():
+                depth[Priority(priority).name.lower()] += 1
+
+        waits = {}
+        for priority, samples in self._waits_ms.items():
+            ordered = sorted(samples)
+            waits[priority.name.lower()] = {
+                "count": len(ordered),
+                "avg_ms": sum(ordered) / len(ordered) if ordered else 0.0,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0,
+                "max_ms": ordered[-1] if ordered else 0.0
+            }
+
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": depth,
+            "granted": self.granted,
+            "throttled": self.throttled,
+            "wait_ms": waits,
+            "rpm_available": self.rpm_bucket.level if self.rpm_bucket else None,
+            "tpm_available": self.tpm_bucket.level if self.tpm_bucket else None
+        }
+
+# Global governor shared by every OpenAI caller in this process
+governor = UpstreamGovernor(
+    max_concurrency=settings.UPSTREAM_MAX_CONCURRENCY,
+    requests_per_minute=settings.UPSTREAM_RPM_LIMIT,
+    tokens_per_minute=settings.UPSTREAM_TPM_LIMIT
+)
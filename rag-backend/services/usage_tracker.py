@@ -0,0 +1,253 @@
+"""
+Per-request token, cost and latency accounting
+Upstream calls report usage into the request's tracker (found through a
+context variable), and finished requests are aggregated per endpoint
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from services.llm_providers import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens: (input, cached input, output)
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4-turbo": (10.00, 10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "text-embedding-ada-002": (0.10, 0.10, 0.0),
+    "text-embedding-3-small": (0.02, 0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.13, 0.0)
+}
+
+def _prices_for(model: str) -> Optional[Tuple[float, float, float]]:
+    """Prices for a model, matching dated snapshots by longest prefix"""
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int = 0, cached_tokens: int = 0) -> float:
+    """Estimated USD cost of a call (0 for unknown models)"""
+    prices = _prices_for(model)
+    if not prices:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (
+        uncached * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+class RequestUsage:
+    """Tokens, cost and timings accumulated while serving one request"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.embedding_tokens = 0
+        self.cost_usd = 0.0
+        self.generation_seconds = 0.0
+        self.first_token_ms: Optional[float] = None
+        self.cancelled = False
+        self.tokens_saved = 0
+
+    def add_chat(self, model: str, usage: TokenUsage, generation_seconds: float = 0.0):
+        """Record a chat completion"""
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.generation_seconds += generation_seconds
+        self.cost_usd += estimate_cost(
+            model, usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens
+        )
+
+    def add_embedding(self, model: str, tokens: int):
+        """Record an embedding call"""
+        self.embedding_tokens += tokens
+        self.cost_usd += estimate_cost(model, tokens)
+
+    def add_usage(self, other: "RequestUsage"):
+        """Record tokens, cost and generation time tracked elsewhere on this request's behalf"""
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.embedding_tokens += other.embedding_tokens
+        self.cost_usd += other.cost_usd
+        self.generation_seconds += other.generation_seconds
+
+    def mark_first_token(self):
+        """Record time to first token, measured from the start of the request"""
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.monotonic() - self.started) * 1000
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Completion tokens per second of generation time"""
+        if not self.completion_tokens or self.generation_seconds <= 0:
+            return None
+        return self.completion_tokens / self.generation_seconds
+
+    def to_steps(self) -> Dict[str, float]:
+        """Usage as processing_steps entries"""
+        steps = {
+            "prompt_tokens": float(self.prompt_tokens),
+            "completion_tokens": float(self.completion_tokens),
+            "cached_tokens": float(self.cached_tokens),
+            "embedding_tokens": float(self.embedding_tokens),
+            "cost_usd": self.cost_usd
+        }
+        if self.tokens_per_second is not None:
+            steps["tokens_per_second"] = self.tokens_per_second
+        return steps
+
+# Usage tracker of the request the current task is serving (set by entry points)
+current_usage: ContextVar[Optional[RequestUsage]] = ContextVar("request_usage", default=None)
+
+def record_chat_usage(model: str, usage: Optional[TokenUsage], generation_seconds: float = 0.0):
+    """Add a chat completion to the current request, if one is tracked"""
+    tracker = current_usage.get()
+    if tracker is not None and usage is not None:
+        tracker.add_chat(model, usage, generation_seconds)
+
+def record_embedding_usage(model: str, tokens: int):
+    """Add an embedding call to the current request, if one is tracked"""
+    tracker = current_usage.get()
+    if tracker is not None:
+        tracker.add_embedding(model, tokens)
+
+def mark_first_token():
+    """Record time to first token on the current request, if one is tracked"""
+    tracker = current_usage.get()
+    if tracker is not None:
+        tracker.mark_first_token()
+
+def record_shared_usage(usage: RequestUsage, charged: bool):
+    """
+    Attribute a pipeline run shared by coalesced requests to the current request
+
+    The request that started the run is charged for it; the others count
+    its tokens as saved, so spend is not counted once per caller.
+    """
+    tracker = current_usage.get()
+    if tracker is None:
+        return
+    if charged:
+        tracker.add_usage(usage)
+    else:
+        tracker.tokens_saved += usage.prompt_tokens + usage.completion_tokens
+
+def usage_steps() -> Dict[str, float]:
+    """processing_steps entries for the current request (empty if untracked)"""
+    tracker = current_usage.get()
+    return tracker.to_steps() if tracker is not None else {}
+
+def _percentile(ordered: list, fraction: float) -> float:
+    """Percentile of a sorted sample (0 when empty)"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class UsageStats:
+    """Per-endpoint aggregates of request latency, tokens and spend"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, usage: RequestUsage, latency_ms: float):
+        """Add a finished request"""
+        stats = self._endpoints.get(usage.endpoint)
+        if stats is None:
+            stats = {
+                "requests": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "embedding_tokens": 0,
+                "cost_usd": 0.0,
+                "cancelled": 0,
+                "tokens_saved": 0,
+                "latency_ms": deque(maxlen=self.window),
+                "first_token_ms": deque(maxlen=self.window),
+                "tokens_per_second": deque(maxlen=self.window)
+            }
+            self._endpoints[usage.endpoint] = stats
+
+        stats["requests"] += 1
+        stats["prompt_tokens"] += usage.prompt_tokens
+        stats["completion_tokens"] += usage.completion_tokens
+        stats["cached_tokens"] += usage.cached_tokens
+        stats["embedding_tokens"] += usage.embedding_tokens
+        stats["cost_usd"] += usage.cost_usd
+        stats["cancelled"] += int(usage.cancelled)
+        stats["tokens_saved"] += usage.tokens_saved
+        if usage.cancelled:
+            # Abandoned requests would skew latency towards disconnect times
+            return
+        stats["latency_ms"].append(latency_ms)
+        if usage.first_token_ms is not None:
+            stats["first_token_ms"].append(usage.first_token_ms)
+        if usage.tokens_per_second is not None:
+            stats["tokens_per_second"].append(usage.tokens_per_second)
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals and latency percentiles per endpoint"""
+        result = {}
+        for endpoint, stats in self._endpoints.items():
+            latency = sorted(stats["latency_ms"])
+            first_token = sorted(stats["first_token_ms"])
+            rates = stats["tokens_per_second"]
+            requests = stats["requests"]
+            result[endpoint] = {
+                "requests": requests,
+                "prompt_tokens": stats["prompt_tokens"],
+                "completion_tokens": stats["completion_tokens"],
+                "cached_tokens": stats["cached_tokens"],
+                "embedding_tokens": stats["embedding_tokens"],
+                "cost_usd": round(stats["cost_usd"], 6),
+                "avg_cost_usd": stats["cost_usd"] / requests if requests else 0.0,
+                "cancelled": stats["cancelled"],
+                "tokens_saved": stats["tokens_saved"],
+                "latency_ms": {
+                    "p50": _percentile(latency, 0.5),
+                    "p95": _percentile(latency, 0.95),
+                    "max": latency[-1] if latency else 0.0
+                },
+                "first_token_ms": {
+                    "p50": _percentile(first_token, 0.5),
+                    "p95": _percentile(first_token, 0.95)
+                },
+                "avg_tokens_per_second": sum(rates) / len(rates) if rates else 0.0
+            }
+        return result
+
+# Global aggregates for this process
+usage_stats = UsageStats()
+
+@contextmanager
+def track_usage(endpoint: str) -> Iterator[RequestUsage]:
+    """Track usage for the enclosed request and aggregate it on exit"""
+    usage = RequestUsage(endpoint)
+    token = current_usage.set(usage)
+    try:
+        yield usage
+    except (asyncio.CancelledError, GeneratorExit):
+        usage.cancelled = True
+        raise
+    finally:
+        current_usage.reset(token)
+        usage.finished = time.monotonic()
+        usage_stats.record(usage, (usage.finished - usage.started) * 1000)
@@ -4,32 +4,51 @@ Supports ChromaDB (local) with easy extension to Pinecone, Weaviate
 """
 
 import os
+import re
 import json
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 from datetime import datetime
 import hashlib
 
 import chromadb
-from chromadb.config import Settings as ChromaSettings
-from chromadb.utils import embedding_functions
+from chromadb.api import ServerAPI
+from chromadb.api.client import Client as ChromaClient
+from chromadb.config import Settings as ChromaSettings, System as ChromaSystem
 import numpy as np
-from tenacity import retry, stop_after_attempt, wait_exponential
 
 from models.schemas import GrantEntry, ProcessedChunk
+from services.cancellation import cancellation_stats
+from services.ingest_jobs import IngestProgress
+from services.llm_providers import get_provider
+from services.resilience import Deadline, embedding_policy
+from services.tracing import span
+from services.upstream_governor import governor, Priority
+from services.usage_tracker import record_embedding_usage
 from utils.config import settings
 from utils.text_processor import TextProcessor
 
 logger = logging.getLogger(__name__)
 
+async def _iterate(items: Iterable[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
 class VectorStoreService:
     """Service for managing vector storage and retrieval"""
     
     def __init__(self):
         self.client = None
         self.collection = None
+        # Chroma system behind the client, and index calls running per system
+        self._system = None
+        self._pins: Dict[Any, int] = {}
+        self._retired = set()
         self.embedding_function = None
+        self.provider = None
         self.text_processor = TextProcessor()
+        self._generation_cache: Tuple[float, int] = (-1.0, 0)
         
     async def initialize(self):
         """Initialize the vector store"""
@@ -50,20 +69,23 @@ class VectorStoreService:
             # Create persist directory if it doesn't exist
             os.makedirs(settings.CHROMA_PERSIST_DIR, exist_ok=True)
             
-            # Initialize ChromaDB client
-            self.client = chromadb.PersistentClient(
-                path=settings.CHROMA_PERSIST_DIR,
-                settings=ChromaSettings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            # Initialize ChromaDB client on a system of our own (rather than
+            # the one PersistentClient shares per path) so reload can stop it
+            system = ChromaSystem(ChromaSettings(
+                anonymized_telemetry=False,
+                allow_reset=True,
+                is_persistent=True,
+                persist_directory=settings.CHROMA_PERSIST_DIR
+            ))
+            system.instance(ServerAPI)
+            system.start()
+            self._system = system
+            self.client = ChromaClient.from_system(system)
             
-            # Set up embedding function
-            self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-                api_key=settings.OPENAI_API_KEY,
-                model_name=settings.EMBEDDING_MODEL
-            )
+            # Embeddings come from the configured provider; the collection's
+            # function only covers text-based Chroma calls and must match it
+            self.provider = get_provider()
+            self.embedding_function = self.provider.chroma_embedding_function(settings.EMBEDDING_MODEL)
             
             # Get or create collection
             self.collection = self.client.get_or_create_collection(
@@ -78,6 +100,53 @@ class VectorStoreService:
             logger.error(f"Failed to initialize ChromaDB: {e}")
             raise
     
+    async def reload(self):
+        """
+        Reopen the index to pick up writes made by another process
+        
+        Chroma keeps its HNSW index in memory per process, so another
+        worker's ingestion is only visible after reopening. A new system
+        reads the index from disk; the old one is stopped once the index
+        calls still running on it have returned.
+        """
+        if settings.VECTOR_DB_TYPE != "chroma" or self.client is None:
+            return
+        
+        # Behaviour checked against chromadb 0.4.22 by tests/test_worker_coordinator.py
+        retired = self._system
+        await self._init_chroma()
+        if self._pins.get(retired):
+            self._retired.add(retired)
+        else:
+            retired.stop()
+    
+    async def _index_call(self, method: str, **kwargs) -> Any:
+        """
+        Run a collection method off the event loop on the current index
+        
+        The call pins the system it started on, so a reload meanwhile does
+        not stop it underneath the worker thread, even if the caller is
+        cancelled and stops waiting.
+        """
+        system = self._system
+        self._pins[system] = self._pins.get(system, 0) + 1
+        call = asyncio.ensure_future(asyncio.to_thread(getattr(self.collection, method), **kwargs))
+        call.add_done_callback(lambda _: self._unpin(system, call))
+        return await asyncio.shield(call)
+    
+    def _unpin(self, system, call: asyncio.Future):
+        """Release an index call, stopping its system if a reload retired it"""
+        if not call.cancelled():
+            # Mark the error retrieved when the caller stopped waiting
+            call.exception()
+        self._pins[system] -= 1
+        if self._pins[system]:
+            return
+        del self._pins[system]
+        if system in self._retired:
+            self._retired.discard(system)
+            system.stop()
+    
     async def _init_pinecone(self):
         """Initialize Pinecone (placeholder for future implementation)"""
         raise NotImplementedError("Pinecone integration coming soon")
@@ -86,17 +155,23 @@ class VectorStoreService:
         """Initialize Weaviate (placeholder for future implementation)"""
         raise NotImplementedError("Weaviate integration coming soon")
     
-    async def ingest_data(self):
+    async def ingest_data(self, progress: Optional[IngestProgress] = None):
         """Ingest data from default knowledge base path"""
-        return await self.ingest_json_data(settings.KNOWLEDGE_BASE_PATH, force_update=False)
+        return await self.ingest_json_data(settings.KNOWLEDGE_BASE_PATH, force_update=False, progress=progress)
     
-    async def ingest_json_data(self, file_path: str, force_update: bool = False):
+    async def ingest_json_data(
+        self,
+        file_path: str,
+        force_update: bool = False,
+        progress: Optional[IngestProgress] = None
+    ):
         """
         Ingest JSON data from file into vector store
         
         Args:
             file_path: Path to JSON file containing grant/residency data
             force_update: Whether to update existing entries
+            progress: Updated after every batch, for job status
         """
         logger.info(f"Starting ingestion from {file_path}")
 
@@ -106,114 +181,266 @@ class VectorStoreService:
                 data = json.load(f)
 
             logger.info(f"Loaded JSON with keys: {data.keys() if isinstance(data, dict) else 'list'}")
-
-            # Process entries
-            entries_processed = 0
-            entries_added = 0
-            entries_updated = 0
-            errors = []
-
-            # Handle different JSON structures
-            if isinstance(data, list):
-                entries = data
-                logger.info(f"Found {len(entries)} entries in list format")
-            elif 'knowledge_base' in data:
-                entries = data['knowledge_base'].get('entries', [])
-                logger.info(f"Found {len(entries)} entries in knowledge_base.entries format")
-            else:
-                entries = data.get('entries', [])
-                logger.info(f"Found {len(entries)} entries in entries format")
-            
-            for entry_data in entries:
-                try:
-                    # Parse entry into GrantEntry model
-                    entry = GrantEntry(**entry_data)
-                    
-                    # Process the entry
-                    result = await self._process_entry(entry, force_update)
-                    
-                    entries_processed += 1
-                    if result == "added":
-                        entries_added += 1
-                    elif result == "updated":
-                        entries_updated += 1
-                        
-                except Exception as e:
-                    error_msg = f"Error processing entry {entry_data.get('id', 'unknown')}: {e}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
-            
-            logger.info(
-                f"Ingestion complete: {entries_processed} processed, "
-                f"{entries_added} added, {entries_updated} updated, {len(errors)} errors"
-            )
             
-            return {
-                "entries_processed": entries_processed,
-                "entries_added": entries_added,
-                "entries_updated": entries_updated,
-                "errors": errors
-            }
+            return await self.ingest_entries(self.extract_entries(data), force_update, progress)
             
         except Exception as e:
             logger.error(f"Failed to ingest data: {e}")
             raise
     
-    async def _process_entry(self, entry: GrantEntry, force_update: bool) -> str:
-        """Process a single grant/residency entry"""
-        # Generate unique ID for the entry
-        entry_id = self._generate_entry_id(entry)
+    @staticmethod
+    def extract_entries(data: Any) -> List[Dict[str, Any]]:
+        """Entries of a knowledge base document, whichever layout it uses"""
+        if isinstance(data, list):
+            entries = data
+            logger.info(f"Found {len(entries)} entries in list format")
+        elif 'knowledge_base' in data:
+            entries = data['knowledge_base'].get('entries', [])
+            logger.info(f"Found {len(entries)} entries in knowledge_base.entries format")
+        else:
+            entries = data.get('entries', [])
+            logger.info(f"Found {len(entries)} entries in entries format")
+        return entries
+    
+    async def ingest_entries(
+        self,
+        entries: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+        force_update: bool = False,
+        progress: Optional[IngestProgress] = None
+    ) -> Dict[str, Any]:
+        """
+        Ingest entries through the batched pipeline
         
-        # Check if entry exists
-        existing = self.collection.get(ids=[entry_id])
+        Entries are chunked as they arrive; every INGEST_BATCH_SIZE chunks
+        are embedded in one request and upserted together, so a large file
+        or a streamed upload shows progress while it is still being read.
         
-        if existing['ids'] and not force_update:
-            return "exists"
+        Args:
+            entries: Entry dicts (or NDJSON lines), as a list or an async iterator
+            force_update: Whether to update existing entries
+            progress: Updated after every batch, for job status
+            
+        Returns:
+            Counts of processed, added and updated entries, and errors
+        """
+        progress = progress or IngestProgress()
+        if progress.total_entries is None and isinstance(entries, list):
+            progress.total_entries = len(entries)
+        errors: List[str] = []
+        batch: List[Tuple[str, GrantEntry, List[str]]] = []
+        batch_chunks = 0
+        
+        if not isinstance(entries, AsyncIterable):
+            entries = _iterate(entries)
         
-        # Create comprehensive text for embedding
-        full_text = self._create_entry_text(entry)
+        async for entry_data in entries:
+            try:
+                if isinstance(entry_data, (str, bytes)):
+                    entry_data = json.loads(entry_data)
+                # Parse entry into GrantEntry model
+                entry = GrantEntry(**entry_data)
+                entry_id = self._generate_entry_id(entry)
+                chunks = self.text_processor.create_chunks(
+                    self._create_entry_text(entry),
+                    chunk_size=settings.CHUNK_SIZE,
+                    chunk_overlap=settings.CHUNK_OVERLAP
+                )
+            except Exception as e:
+                entry_name = entry_data.get('id', 'unknown') if isinstance(entry_data, dict) else 'unknown'
+                errors.append(f"Error processing entry {entry_name}: {e}")
+                logger.error(errors[-1])
+                progress.errors += 1
+                continue
+            
+            # A repeated entry overwrites the earlier one, as it would one at a time
+            if any(queued_id == entry_id for queued_id, _, _ in batch):
+                await self._ingest_batch(batch, force_update, progress, errors)
+                batch, batch_chunks = [], 0
+            
+            batch.append((entry_id, entry, chunks))
+            batch_chunks += len(chunks)
+            if batch_chunks >= settings.INGEST_BATCH_SIZE:
+                await self._ingest_batch(batch, force_update, progress, errors)
+                batch, batch_chunks = [], 0
         
-        # Create chunks
-        chunks = self.text_processor.create_chunks(
-            full_text,
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP
+        if batch:
+            await self._ingest_batch(batch, force_update, progress, errors)
+        
+        logger.info(
+            f"Ingestion complete: {progress.entries_processed} processed, "
+            f"{progress.entries_added} added, {progress.entries_updated} updated, {len(errors)} errors"
         )
         
-        # Process each chunk
+        if progress.entries_added or progress.entries_updated:
+            self.bump_generation()
+        
+        return {
+            "entries_processed": progress.entries_processed,
+            "entries_added": progress.entries_added,
+            "entries_updated": progress.entries_updated,
+            "chunks_embedded": progress.chunks_embedded,
+            "errors": errors
+        }
+    
+    async def _ingest_batch(
+        self,
+        batch: List[Tuple[str, GrantEntry, List[str]]],
+        force_update: bool,
+        progress: IngestProgress,
+        errors: List[str]
+    ):
+        """Embed and upsert the chunks of a batch of entries in one request"""
+        # Chunks are stored as <entry id>_chunk_<n>, all upserted together
+        first_chunks = {f"{entry_id}_chunk_0": entry_id for entry_id, _, _ in batch}
+        found = self.collection.get(ids=list(first_chunks), include=[])['ids']
+        existing = {first_chunks[chunk_id] for chunk_id in found}
+        pending = [item for item in batch if force_update or item[0] not in existing]
+        
         chunk_ids = []
         chunk_texts = []
         chunk_metadatas = []
         
-        for i, chunk_text in enumerate(chunks):
-            chunk_id = f"{entry_id}_chunk_{i}"
-            chunk_ids.append(chunk_id)
-            chunk_texts.append(chunk_text)
-            
-            # Create metadata
-            metadata = {
-                "source_id": entry_id,
-                "chunk_index": i,
-                "entry_name": entry.name,
-                "organization": entry.organization,
-                "type": entry.type,
-                "disciplines": ",".join(entry.disciplines) if entry.disciplines else "",
-                "location": entry.location or "",
-                "deadline": entry.deadline or "",
-                "website": entry.website or "",
-                "last_updated": datetime.utcnow().isoformat()
-            }
-            chunk_metadatas.append(metadata)
+        for entry_id, entry, chunks in pending:
+            for i, chunk_text in enumerate(chunks):
+                chunk_ids.append(f"{entry_id}_chunk_{i}")
+                chunk_texts.append(chunk_text)
+                
+                # Create metadata
+                chunk_metadatas.append({
+                    "source_id": entry_id,
+                    "chunk_index": i,
+                    "entry_name": entry.name,
+                    "organization": entry.organization,
+                    "type": entry.type,
+                    "disciplines": ",".join(entry.disciplines) if entry.disciplines else "",
+                    "location": entry.location or "",
+                    "deadline": entry.deadline or "",
+                    "website": entry.website or "",
+                    "last_updated": datetime.utcnow().isoformat()
+                })
         
         # Add or update in vector store
         if chunk_ids:
-            self.collection.upsert(
-                ids=chunk_ids,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas
-            )
+            try:
+                embeddings = await self.embed_texts(chunk_texts, priority=Priority.INGEST)
+                await self._index_call(
+                    "upsert",
+                    ids=chunk_ids,
+                    embeddings=embeddings,
+                    documents=chunk_texts,
+                    metadatas=chunk_metadatas
+                )
+            except Exception as e:
+                for _, entry, _ in pending:
+                    errors.append(f"Error processing entry {entry.id}: {e}")
+                logger.error(f"Failed to ingest batch of {len(pending)} entries: {e}")
+                progress.errors += len(pending)
+                progress.record_batch(len(batch) - len(pending), 0, 0, 0)
+                return
         
-        return "updated" if existing['ids'] else "added"
+        updated = sum(1 for entry_id, _, _ in pending if entry_id in existing)
+        progress.record_batch(len(batch), len(pending) - updated, updated, len(chunk_ids))
+    
+    def _generation_path(self) -> str:
+        """File recording the knowledge base generation next to the index"""
+        return os.path.join(settings.CHROMA_PERSIST_DIR, "kb_generation.json")
+    
+    def get_generation(self) -> int:
+        """
+        Get the current knowledge base generation
+        
+        The generation increases every time ingestion changes the index. It is
+        stored on disk so every VectorStoreService instance (including the one
+        owned by the update scheduler) observes the same value.
+        """
+        path = self._generation_path()
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return 0
+        
+        if mtime != self._generation_cache[0]:
+            with open(path, 'r', encoding='utf-8') as f:
+                generation = int(json.load(f).get("generation", 0))
+            self._generation_cache = (mtime, generation)
+        
+        return self._generation_cache[1]
+    
+    def bump_generation(self) -> int:
+        """Record that the knowledge base changed and return the new generation"""
+        generation = self.get_generation() + 1
+        path = self._generation_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"generation": generation, "updated_at": datetime.utcnow().isoformat()}, f)
+        os.replace(tmp_path, path)
+        
+        logger.info(f"Knowledge base generation is now {generation}")
+        return generation
+    
+    def _initial_ingest_marker(self) -> str:
+        """File present while the first ingestion of an empty index is running"""
+        return os.path.join(settings.CHROMA_PERSIST_DIR, "initial_ingest.json")
+    
+    def _read_initial_ingest_marker(self) -> Optional[Dict[str, Any]]:
+        """Contents of the initial ingest marker, or None without one"""
+        try:
+            with open(self._initial_ingest_marker(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Torn or foreign file: treat it as a run that never finished
+            logger.warning(f"Unreadable initial ingest marker: {e}")
+            return {}
+    
+    def _write_initial_ingest_marker(self, marker: Dict[str, Any]):
+        """Replace the marker atomically so other workers never read half of it"""
+        path = self._initial_ingest_marker()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(marker, f)
+        os.replace(tmp_path, path)
+    
+    def initial_ingest_pending(self) -> bool:
+        """
+        Whether the index is still being filled for the first time
+        
+        The marker is on disk so every worker sees it. A run that was
+        cancelled or failed marks it interrupted, so workers stop degrading
+        while the partial index waits for the next leader to resume it.
+        """
+        marker = self._read_initial_ingest_marker()
+        return marker is not None and marker.get("status", "running") == "running"
+    
+    def initial_ingest_unfinished(self) -> bool:
+        """Whether an initial ingest was started and never completed (left running by a crash, or interrupted)"""
+        return self._read_initial_ingest_marker() is not None
+    
+    async def initial_ingest(self, file_path: str, progress: Optional[IngestProgress] = None) -> Dict[str, Any]:
+        """
+        Ingest into an empty index, flagged so searches degrade meanwhile
+        
+        Entries already in the index are skipped, so resuming an
+        unfinished run only embeds what is missing.
+        """
+        marker = {"file_path": file_path, "started_at": datetime.utcnow().isoformat(), "status": "running"}
+        self._write_initial_ingest_marker(marker)
+        
+        try:
+            result = await self.ingest_json_data(file_path, force_update=False, progress=progress)
+        except BaseException as e:
+            self._write_initial_ingest_marker({
+                **marker,
+                "status": "interrupted",
+                "reason": "cancelled" if isinstance(e, asyncio.CancelledError) else str(e)
+            })
+            raise
+        os.remove(self._initial_ingest_marker())
+        return result
     
     def _generate_entry_id(self, entry: GrantEntry) -> str:
         """Generate a unique ID for an entry"""
@@ -274,12 +501,45 @@ class VectorStoreService:
         
         return "\n".join(sections)
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    async def embed_texts(
+        self,
+        texts: List[str],
+        priority: Optional[Priority] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[List[float]]:
+        """
+        Embed texts with the configured provider through the shared upstream governor
+        
+        Mirrors Chroma's OpenAIEmbeddingFunction (newlines replaced, results
+        ordered by index) so stored and query vectors stay comparable.
+        
+        Args:
+            texts: Texts to embed
+            priority: Upstream priority (defaults to the caller's context)
+            deadline: Request deadline bounding retries and hedges
+        """
+        inputs = [t.replace("\n", " ") for t in texts]
+        tokens = governor.estimate_tokens(inputs, settings.EMBEDDING_MODEL)
+        
+        async def attempt():
+            async with governor.acquire(tokens=tokens, priority=priority):
+                return await self.provider.embed(settings.EMBEDDING_MODEL, inputs)
+        
+        try:
+            with span("vector_store.embed", texts=len(inputs), tokens=tokens):
+                result = await embedding_policy.run(attempt, deadline)
+        except asyncio.CancelledError:
+            cancellation_stats.record_aborted("embedding")
+            raise
+        record_embedding_usage(settings.EMBEDDING_MODEL, result.tokens)
+        return result.vectors
+    
     async def search(
         self, 
         query: str, 
         num_results: int = 5,
-        filter_criteria: Optional[Dict[str, Any]] = None
+        filter_criteria: Optional[Dict[str, Any]] = None,
+        deadline: Optional[Deadline] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for similar documents in the vector store
@@ -288,6 +548,7 @@ class VectorStoreService:
             query: Search query
             num_results: Number of results to return
             filter_criteria: Optional metadata filters
+            deadline: Request deadline; the embedding call retries only within it
             
         Returns:
             List of search results with text, metadata, and scores
@@ -298,12 +559,15 @@ class VectorStoreService:
             if filter_criteria:
                 where_clause = filter_criteria
             
-            # Perform search
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=num_results,
-                where=where_clause
-            )
+            # Perform search (the local index query runs off the event loop)
+            query_embedding = (await self.embed_texts([query], deadline=deadline))[0]
+            with span("vector_store.query", n_results=num_results):
+                results = await self._index_call(
+                    "query",
+                    query_embeddings=[query_embedding],
+                    n_results=num_results,
+                    where=where_clause
+                )
             
             # Format results
             formatted_results = []
@@ -322,6 +586,54 @@ class VectorStoreService:
             logger.error(f"Search error: {e}")
             raise
     
+    async def keyword_search(
+        self,
+        query: str,
+        num_results: int = 5,
+        filter_criteria: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank indexed chunks by the share of query keywords they contain
+        
+        Needs no query embedding and reads chunks straight from storage, so
+        it also covers chunks added by another worker since the last reload.
+        Used while the initial ingestion is still running. Storage returns
+        at most DEGRADED_KEYWORD_CANDIDATES chunks containing a keyword, so
+        the cost does not grow with the partial index.
+        
+        Returns:
+            Results in the same shape as search(), scored 0-1
+        """
+        keywords = set(self.text_processor.extract_keywords(query))
+        if not keywords:
+            return []
+        
+        # $contains is case-sensitive; keywords are lowercase, titles are not
+        contains = [{"$contains": variant} for keyword in sorted(keywords) for variant in (keyword, keyword.capitalize())]
+        
+        with span("vector_store.keyword_search", keywords=len(keywords)):
+            chunks = await self._index_call(
+                "get",
+                where=filter_criteria,
+                where_document={"$or": contains},
+                limit=settings.DEGRADED_KEYWORD_CANDIDATES,
+                include=["documents", "metadatas"]
+            )
+        
+        results = []
+        for chunk_id, text, metadata in zip(chunks['ids'], chunks['documents'], chunks['metadatas']):
+            matched = len(keywords & set(re.findall(r'[a-z]+', text.lower())))
+            if matched:
+                results.append({
+                    'id': chunk_id,
+                    'text': text,
+                    'metadata': metadata,
+                    'score': matched / len(keywords)
+                })
+        
+        results.sort(key=lambda r: r['score'], reverse=True)
+        return results[:num_results]
+    
     async def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the vector store collection"""
         try:
@@ -340,7 +652,9 @@ class VectorStoreService:
                 "total_chunks": count,
                 "sample_entries": list(unique_sources)[:5],
                 "collection_name": self.collection.name,
-                "vector_db_type": settings.VECTOR_DB_TYPE
+                "vector_db_type": settings.VECTOR_DB_TYPE,
+                "generation": self.get_generation(),
+                "initial_ingest_pending": self.initial_ingest_pending()
             }
             
         except Exception as e:
@@ -0,0 +1,349 @@
+"""
+Streaming voice input
+PCM audio is fed chunk by chunk through an energy VAD (speech start and
+end-of-turn detection) and a streaming STT provider. Partial transcripts
+start retrieval early, so when the user stops talking the final transcript
+usually finds its context already fetched.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.config import settings
+from utils.text_processor import TextProcessor
+
+logger = logging.getLogger(__name__)
+
+SPEECH_START = "speech_start"
+END_OF_TURN = "end_of_turn"
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detector for 16-bit little-endian mono PCM
+
+    Speech starts after min_speech_ms of frames above the threshold; the
+    turn ends after end_of_turn_ms of frames below it. Chunks of any size
+    are accepted and split into fixed frames internally.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 20,
+        threshold_db: float = -45.0,
+        min_speech_ms: int = 60,
+        end_of_turn_ms: int = 600
+    ):
+        """
+        Args:
+            sample_rate: Samples per second of the incoming audio
+            frame_ms: Analysis frame length
+            threshold_db: Frame level (dBFS) counted as voiced
+            min_speech_ms: Voiced audio needed before speech is reported
+            end_of_turn_ms: Trailing silence that ends the turn
+        """
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db
+        self.min_speech_ms = min_speech_ms
+        self.end_of_turn_ms = end_of_turn_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self._pending = b""
+        self.reset()
+
+    @classmethod
+    def from_settings(cls, sample_rate: int) -> "EnergyVAD":
+        """Build a VAD with configured thresholds"""
+        return cls(
+            sample_rate=sample_rate,
+            threshold_db=settings.VAD_THRESHOLD_DB,
+            min_speech_ms=settings.VAD_MIN_SPEECH_MS,
+            end_of_turn_ms=settings.VAD_END_OF_TURN_MS
+        )
+
+    def reset(self):
+        """Forget the current turn"""
+        self.in_speech = False
+        self._voiced_ms = 0
+        self._silence_ms = 0
+
+    def process(self, pcm: bytes) -> List[str]:
+        """Feed audio and return the events it completes, in order"""
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+
+        events = []
+        for offset in range(0, usable, self.frame_bytes):
+            voiced = self.level_db(data[offset:offset + self.frame_bytes]) >= self.threshold_db
+
+            if not self.in_speech:
+                self._voiced_ms = self._voiced_ms + self.frame_ms if voiced else 0
+                if self._voiced_ms >= self.min_speech_ms:
+                    self.in_speech = True
+                    self._silence_ms = 0
+                    events.append(SPEECH_START)
+            else:
+                self._silence_ms = 0 if voiced else self._silence_ms + self.frame_ms
+                if self._silence_ms >= self.end_of_turn_ms:
+                    self.reset()
+                    events.append(END_OF_TURN)
+        return events
+
+    @staticmethod
+    def level_db(frame: bytes) -> float:
+        """RMS level of a PCM16 frame in dBFS"""
+        samples = np.frombuffer(frame, dtype="<i2").astype(np.float32)
+        if samples.size == 0:
+            return -math.inf
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        return 20 * math.log10(rms / 32768) if rms > 0 else -math.inf
+
+class STTStream:
+    """One utterance being transcribed while it is spoken"""
+
+    async def feed(self, pcm: bytes) -> Optional[str]:
+        """Send audio; returns the partial transcript when it has changed"""
+        raise NotImplementedError
+
+    async def finish(self) -> str:
+        """Final transcript once the audio is complete"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release the provider connection"""
+
+class STTProvider:
+    """Base class for streaming speech-to-text backends"""
+
+    name = "base"
+
+    async def open_stream(self, sample_rate: int, hint: Optional[str] = None) -> STTStream:
+        """
+        Start transcribing an utterance
+
+        Args:
+            sample_rate: Samples per second of the PCM16 audio
+            hint: Expected transcript; only meaningful for the stub provider
+        """
+        raise NotImplementedError
+
+class _StubSTTStream(STTStream):
+    """Reveals a known transcript word by word as voiced audio arrives"""
+
+    def __init__(self, transcript: str, sample_rate: int, words_per_second: float, threshold_db: float):
+        self._words = transcript.split()
+        self._bytes_per_second = sample_rate * 2
+        self._words_per_second = words_per_second
+        self._threshold_db = threshold_db
+        self._audio_bytes = 0
+        self._revealed = 0
+
+    async def feed(self, pcm: bytes) -> Optional[str]:
+        if EnergyVAD.level_db(pcm[:len(pcm) // 2 * 2]) < self._threshold_db:
+            return None
+        self._audio_bytes += len(pcm)
+        seconds = self._audio_bytes / self._bytes_per_second
+        revealed = min(len(self._words), int(seconds * self._words_per_second))
+        if revealed == self._revealed:
+            return None
+        self._revealed = revealed
+        return " ".join(self._words[:revealed])
+
+    async def finish(self) -> str:
+        return " ".join(self._words)
+
+class StubSTTProvider(STTProvider):
+    """
+    Local deterministic STT for tests and offline benchmarks
+
+    Only the loudness of the audio is used: the transcript is the client's
+    hint (or the configured default), revealed at a fixed speaking rate
+    over chunks louder than threshold_db.
+    """
+
+    name = "stub"
+
+    def __init__(self, transcript: str = "", words_per_second: float = 2.5, threshold_db: float = -45.0):
+        self.transcript = transcript
+        self.words_per_second = words_per_second
+        self.threshold_db = threshold_db
+
+    async def open_stream(self, sample_rate: int, hint: Optional[str] = None) -> STTStream:
+        return _StubSTTStream(hint or self.transcript, sample_rate, self.words_per_second, self.threshold_db)
+
+_stt_provider: Optional[STTProvider] = None
+
+def create_stt_provider(name: str) -> STTProvider:
+    """Build an STT provider by name"""
+    if name == "stub":
+        return StubSTTProvider(
+            settings.STT_STUB_TRANSCRIPT,
+            settings.STT_STUB_WORDS_PER_SECOND,
+            settings.VAD_THRESHOLD_DB
+        )
+    raise ValueError(f"Unsupported STT provider: {name}")
+
+def get_stt_provider() -> STTProvider:
+    """Process-wide provider selected by STT_PROVIDER"""
+    global _stt_provider
+    if _stt_provider is None:
+        _stt_provider = create_stt_provider(settings.STT_PROVIDER)
+        logger.info(f"Using STT provider: {_stt_provider.name}")
+    return _stt_provider
+
+class VoiceStats:
+    """Process-wide counters for voice turns and speculative retrieval"""
+
+    def __init__(self):
+        self.turns = 0
+        self.empty_turns = 0
+        self.prefetches = 0
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+
+    def stats(self) -> dict:
+        """Return voice turn and prefetch counters"""
+        used = self.prefetch_hits + self.prefetch_misses
+        return {
+            "turns": self.turns,
+            "empty_turns": self.empty_turns,
+            "prefetches": self.prefetches,
+            "prefetch_hits": self.prefetch_hits,
+            "prefetch_misses": self.prefetch_misses,
+            "prefetch_hit_rate": self.prefetch_hits / used if used else 0.0
+        }
+
+# Global counters for this process
+voice_stats = VoiceStats()
+
+Retrieval = Tuple[str, List[float]]
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+class VoiceTurn:
+    """
+    One spoken utterance: VAD, streaming STT and speculative retrieval
+
+    Retrieval is started once the partial transcript reaches
+    prefetch_min_words and restarted each time its keywords change. The
+    last prefetch is used only when the final transcript has the same
+    keywords (or the same words), since the words a speaker adds last are
+    usually the subject or the place being asked about.
+    """
+
+    def __init__(
+        self,
+        stt: STTStream,
+        vad: EnergyVAD,
+        prefetch: Optional[Callable[[str], Awaitable[Retrieval]]] = None,
+        prefetch_min_words: int = 3
+    ):
+        """
+        Args:
+            stt: Open transcription stream for this utterance
+            vad: Voice activity detector for the audio format
+            prefetch: Retrieval for a partial transcript (None disables)
+            prefetch_min_words: Words needed before the first prefetch
+        """
+        self.stt = stt
+        self.vad = vad
+        self.prefetch = prefetch
+        self.prefetch_min_words = prefetch_min_words
+        self.partial = ""
+        self.stt_finalize_ms: Optional[float] = None
+        self.text_processor = TextProcessor()
+        self._prefetch_words: List[str] = []
+        self._prefetch_keywords: Set[str] = set()
+        self._prefetch_task: Optional[asyncio.Task] = None
+
+    async def feed(self, pcm: bytes) -> List[Tuple[str, Any]]:
+        """
+        Feed audio and return events: ("speech_start", None),
+        ("partial", text) and ("end_of_turn", None)
+        """
+        vad_events = self.vad.process(pcm)
+        ended = END_OF_TURN in vad_events
+        if ended:
+            # Audio after the end of the turn belongs to the next utterance
+            vad_events = vad_events[:vad_events.index(END_OF_TURN)]
+        events: List[Tuple[str, Any]] = [(event, None) for event in vad_events]
+
+        partial = await self.stt.feed(pcm)
+        if partial:
+            self.partial = partial
+            events.append(("partial", partial))
+            self._maybe_prefetch(partial)
+
+        if ended:
+            events.append((END_OF_TURN, None))
+        return events
+
+    async def finish(self) -> Tuple[str, Optional[Retrieval]]:
+        """
+        Final transcript plus the prefetched retrieval if it still applies
+
+        Returns:
+            Tuple of (final transcript, (context, scores) or None)
+        """
+        started = time.monotonic()
+        final = (await self.stt.finish()).strip()
+        self.stt_finalize_ms = (time.monotonic() - started) * 1000
+        voice_stats.turns += 1
+        if not final:
+            voice_stats.empty_turns += 1
+
+        prefetched = None
+        if self._prefetch_task is not None:
+            if final and self._matches_prefetch(final):
+                prefetched = await self._prefetch_task
+            if prefetched is not None:
+                voice_stats.prefetch_hits += 1
+            else:
+                voice_stats.prefetch_misses += 1
+        return final, prefetched
+
+    async def close(self):
+        """Stop any speculative retrieval and release the STT stream"""
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+            await asyncio.gather(self._prefetch_task, return_exceptions=True)
+        await self.stt.close()
+
+    def _maybe_prefetch(self, partial: str):
+        """Start retrieval for a partial transcript that has grown enough"""
+        words = _words(partial)
+        if self.prefetch is None or len(words) < self.prefetch_min_words:
+            return
+        keywords = self._keywords(partial)
+        if self._prefetch_words and keywords == self._prefetch_keywords:
+            return
+
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch_words = words
+        self._prefetch_keywords = keywords
+        self._prefetch_task = asyncio.create_task(self._prefetch(partial))
+        voice_stats.prefetches += 1
+
+    async def _prefetch(self, partial: str) -> Optional[Retrieval]:
+        """Speculative retrieval; a failure only means the final query retrieves itself"""
+        try:
+            return await self.prefetch(partial)
+        except Exception as e:
+            logger.warning(f"Speculative retrieval failed: {e}")
+            return None
+
+    def _matches_prefetch(self, final: str) -> bool:
+        """Whether the final transcript asks what the prefetched partial asked"""
+        return _words(final) == self._prefetch_words or self._keywords(final) == self._prefetch_keywords
+
+    def _keywords(self, text: str) -> Set[str]:
+        return set(self.text_processor.extract_keywords(text))
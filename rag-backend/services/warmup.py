@@ -0,0 +1,157 @@
+"""
+Startup warm-up
+Runs before the app accepts traffic so the first request does not pay
+cold-start costs: tokenizer tables are loaded, upstream and session store
+connections are opened and pooled, the vector index is paged in and one
+synthetic query runs through the whole pipeline.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.upstream_governor import governor
+from services.usage_tracker import track_usage
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER = "tokenizer"
+CONNECTIONS = "connections"
+VECTOR_INDEX = "vector_index"
+SYNTHETIC_QUERY = "synthetic_query"
+
+ALL_STEPS = [TOKENIZER, CONNECTIONS, VECTOR_INDEX, SYNTHETIC_QUERY]
+
+class WarmupReport:
+    """Outcome and duration of each warm-up step"""
+
+    def __init__(self):
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.total_ms = 0.0
+        self.completed = False
+
+    def record(self, step: str, duration_ms: float, error: Optional[str] = None, **details: Any):
+        self.steps[step] = {"ok": error is None, "duration_ms": round(duration_ms, 2), **details}
+        if error is not None:
+            self.steps[step]["error"] = error
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-step durations and the overall outcome"""
+        return {
+            "completed": self.completed,
+            "ok": self.completed and all(step["ok"] for step in self.steps.values()),
+            "total_ms": round(self.total_ms, 2),
+            "steps": dict(self.steps)
+        }
+
+# Global warm-up report for this process
+warmup_report = WarmupReport()
+
+class Warmup:
+    """Runs the configured warm-up steps in order, recording each one"""
+
+    def __init__(
+        self,
+        vector_store,
+        orchestrator,
+        steps: Optional[List[str]] = None,
+        query: str = "",
+        step_timeout: float = 30.0,
+        report: Optional[WarmupReport] = None
+    ):
+        """
+        Args:
+            vector_store: Initialized VectorStoreService
+            orchestrator: SimliOrchestrator used for the synthetic query
+            steps: Steps to run, in order (all of them if None)
+            query: Text of the synthetic query (also used to probe the index)
+            step_timeout: Seconds before a step is abandoned
+            report: Where results are recorded (the process report if None)
+        """
+        self.vector_store = vector_store
+        self.orchestrator = orchestrator
+        self.steps = ALL_STEPS if steps is None else steps
+        self.query = query
+        self.step_timeout = step_timeout
+        self.report = report or warmup_report
+
+    @classmethod
+    def from_settings(cls, vector_store, orchestrator) -> "Warmup":
+        """Build the warm-up from configured steps, query and timeout"""
+        steps = [s.strip() for s in settings.WARMUP_STEPS.split(",") if s.strip()]
+        return cls(
+            vector_store,
+            orchestrator,
+            steps=steps,
+            query=settings.WARMUP_QUERY,
+            step_timeout=settings.WARMUP_STEP_TIMEOUT_SECONDS
+        )
+
+    async def run(self) -> WarmupReport:
+        """
+        Run every step; a failed or slow step is logged and skipped, never fatal
+
+        Returns:
+            The report with per-step durations
+        """
+        handlers: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]] = {
+            TOKENIZER: self._prime_tokenizer,
+            CONNECTIONS: self._open_connections,
+            VECTOR_INDEX: self._page_in_index,
+            SYNTHETIC_QUERY: self._synthetic_query
+        }
+        self.report.started_at = time.time()
+        start = time.perf_counter()
+
+        for step in self.steps:
+            handler = handlers.get(step)
+            if handler is None:
+                logger.warning(f"Unknown warm-up step: {step}")
+                continue
+
+            step_start = time.perf_counter()
+            try:
+                details = await asyncio.wait_for(handler(), self.step_timeout)
+                self.report.record(step, (time.perf_counter() - step_start) * 1000, **details)
+            except Exception as e:
+                error = "timed out" if isinstance(e, asyncio.TimeoutError) else f"{type(e).__name__}: {e}"
+                self.report.record(step, (time.perf_counter() - step_start) * 1000, error=error)
+                logger.warning(f"Warm-up step {step} failed: {error}")
+
+        self.report.total_ms = (time.perf_counter() - start) * 1000
+        self.report.completed = True
+        summary = ", ".join(f"{name} {step['duration_ms']:.0f}ms" for name, step in self.report.steps.items())
+        logger.info(f"Warm-up finished in {self.report.total_ms:.0f}ms ({summary})")
+        return self.report
+
+    async def _prime_tokenizer(self) -> Dict[str, Any]:
+        """Load the BPE tables for every model the pipeline counts tokens for"""
+        models = sorted({settings.LLM_MODEL, settings.FAST_LLM_MODEL, settings.EMBEDDING_MODEL})
+        for model in models:
+            governor.estimate_tokens([self.query or "warm-up"], model)
+        self.vector_store.text_processor.count_tokens(self.query or "warm-up")
+        return {"models": models}
+
+    async def _open_connections(self) -> Dict[str, Any]:
+        """Open pooled upstream and session store connections (TLS included)"""
+        await self.vector_store.provider.warm()
+        sessions = await self.orchestrator.sessions.stats()
+        return {"provider": self.vector_store.provider.name, "session_store": sessions.get("backend")}
+
+    async def _page_in_index(self) -> Dict[str, Any]:
+        """Run a probe search so the index is loaded from disk into memory"""
+        count = self.vector_store.collection.count()
+        if count == 0:
+            return {"chunks": 0, "skipped": "empty collection"}
+        results = await self.vector_store.search(self.query, num_results=1)
+        return {"chunks": count, "results": len(results)}
+
+    async def _synthetic_query(self) -> Dict[str, Any]:
+        """Answer one query end to end: retrieval, prompt build and generation"""
+        # Tracked under its own endpoint so its spend shows in /admin/usage
+        with track_usage("warmup"):
+            response = await self.orchestrator.process_query(self.query, stream=False)
+        return {"confidence": round(response.confidence, 3), "answer_chars": len(response.answer)}
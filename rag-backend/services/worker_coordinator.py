@@ -0,0 +1,328 @@
+"""
+Coordination between uvicorn workers sharing one knowledge base
+One worker wins a leader election (a file lock next to the index, or a
+Redis key) and runs the update scheduler; the others serve read-only and
+reopen the index whenever the leader publishes a new KB generation.
+"""
+
+import asyncio
+import fcntl
+import inspect
+import logging
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+LEADER = "leader"
+FOLLOWER = "follower"
+
+def worker_id() -> str:
+    """Identity of this worker in election records"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class LeaderElection:
+    """Base class for election backends"""
+
+    backend = "base"
+
+    def __init__(self):
+        self.is_leader = False
+
+    async def try_acquire(self) -> bool:
+        """Become leader if nobody holds leadership; True if this worker leads"""
+        raise NotImplementedError
+
+    async def renew(self) -> bool:
+        """Keep leadership alive; False if it was lost"""
+        return self.is_leader
+
+    async def release(self):
+        """Give up leadership"""
+        self.is_leader = False
+
+    async def current_leader(self) -> Optional[str]:
+        """Worker id of the current leader, if known"""
+        return worker_id() if self.is_leader else None
+
+class SingleWorkerElection(LeaderElection):
+    """Single-process deployments: this worker always leads"""
+
+    backend = "none"
+
+    async def try_acquire(self) -> bool:
+        self.is_leader = True
+        return True
+
+class FileLeaderElection(LeaderElection):
+    """
+    Exclusive lock on a file shared by every worker on the host
+
+    The kernel drops the lock when the leader exits, however it exits, so
+    a follower takes over at its next attempt.
+    """
+
+    backend = "file"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._fd: Optional[int] = None
+
+    async def try_acquire(self) -> bool:
+        if self.is_leader:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, worker_id().encode())
+        self._fd = fd
+        self.is_leader = True
+        return True
+
+    async def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self.is_leader = False
+
+    async def current_leader(self) -> Optional[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+class RedisLeaderElection(LeaderElection):
+    """
+    Leadership as a Redis key with a TTL, for workers on different hosts
+
+    The leader renews the key well within its TTL; if it stalls or dies the
+    key expires and another worker takes over.
+    """
+
+    backend = "redis"
+
+    # Only the holder may extend or delete the key
+    _RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, url: str, key: str = "rag-backend:leader", ttl_seconds: float = 30.0):
+        super().__init__()
+        import redis.asyncio as redis_asyncio
+
+        self.key = key
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.identity = worker_id()
+        self.redis = redis_asyncio.from_url(url, decode_responses=True)
+
+    async def try_acquire(self) -> bool:
+        if self.is_leader:
+            return await self.renew()
+        self.is_leader = bool(await self.redis.set(self.key, self.identity, nx=True, px=self.ttl_ms))
+        return self.is_leader
+
+    async def renew(self) -> bool:
+        try:
+            self.is_leader = bool(await self.redis.eval(self._RENEW, 1, self.key, self.identity, self.ttl_ms))
+        except Exception as e:
+            # Unreachable Redis: step down rather than risk two leaders
+            logger.warning(f"Could not renew leadership: {e}")
+            self.is_leader = False
+        return self.is_leader
+
+    async def release(self):
+        try:
+            if self.is_leader:
+                await self.redis.eval(self._RELEASE, 1, self.key, self.identity)
+        finally:
+            self.is_leader = False
+            await self.redis.aclose()
+
+    async def current_leader(self) -> Optional[str]:
+        try:
+            return await self.redis.get(self.key)
+        except Exception:
+            return None
+
+def create_leader_election() -> LeaderElection:
+    """Build the configured election backend"""
+    if settings.LEADER_ELECTION == "none":
+        return SingleWorkerElection()
+    if settings.LEADER_ELECTION == "file":
+        path = settings.LEADER_LOCK_PATH or os.path.join(settings.CHROMA_PERSIST_DIR, "leader.lock")
+        return FileLeaderElection(path)
+    if settings.LEADER_ELECTION == "redis":
+        return RedisLeaderElection(settings.REDIS_URL, settings.LEADER_KEY, settings.LEADER_TTL_SECONDS)
+    raise ValueError(f"Unsupported leader election backend: {settings.LEADER_ELECTION}")
+
+class WorkerCoordinator:
+    """
+    Runs the election for this worker and keeps its index current
+
+    The leader runs the callbacks that write (scheduler, ingestion); a
+    follower polls the KB generation the leader publishes and reloads its
+    index when it changes. A follower retries the election on every poll.
+    """
+
+    def __init__(
+        self,
+        election: LeaderElection,
+        vector_store,
+        on_elected: Optional[Callable[[], Any]] = None,
+        on_demoted: Optional[Callable[[], Any]] = None,
+        poll_interval: float = 5.0
+    ):
+        """
+        Args:
+            election: Backend deciding which worker leads
+            vector_store: This worker's VectorStoreService
+            on_elected: Called (or awaited) when this worker becomes leader
+            on_demoted: Called (or awaited) when it stops being leader
+            poll_interval: Seconds between generation checks and election attempts
+        """
+        self.election = election
+        self.vector_store = vector_store
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.poll_interval = poll_interval
+        self.generation = vector_store.get_generation()
+        self.elections = 0
+        self.reloads = 0
+        self.last_reload_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, vector_store, on_elected=None, on_demoted=None) -> "WorkerCoordinator":
+        """Build a coordinator with the configured election backend"""
+        return cls(
+            create_leader_election(),
+            vector_store,
+            on_elected=on_elected,
+            on_demoted=on_demoted,
+            poll_interval=settings.WORKER_POLL_SECONDS
+        )
+
+    @property
+    def is_leader(self) -> bool:
+        return self.election.is_leader
+
+    @property
+    def role(self) -> str:
+        return LEADER if self.is_leader else FOLLOWER
+
+    async def start(self):
+        """Run the first election now, then keep polling in the background"""
+        await self._elect()
+        if not self.is_leader:
+            logger.info(f"Worker {worker_id()} is a follower ({self.election.backend} election)")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling and hand leadership back"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            await self._call(self.on_demoted)
+        await self.election.release()
+
+    async def stats(self) -> Dict[str, Any]:
+        """Return this worker's role, the leader and index generation"""
+        return {
+            "worker": worker_id(),
+            "role": self.role,
+            "backend": self.election.backend,
+            "leader": await self.election.current_leader(),
+            "generation": self.generation,
+            "elections_won": self.elections,
+            "index_reloads": self.reloads,
+            "last_reload_at": self.last_reload_at
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                if self.is_leader:
+                    await self.confirm_leadership()
+                    # The leader's own writes need no reload
+                    self.generation = self.vector_store.get_generation()
+                    continue
+                await self.sync_generation()
+                await self._elect()
+            except Exception as e:
+                logger.error(f"Worker coordination error: {e}")
+
+    async def confirm_leadership(self) -> bool:
+        """
+        Renew leadership, stepping down at once if it was lost
+
+        Called on every poll and before index writes, so a worker whose
+        lease expired stops writing without waiting for the next poll.
+
+        Returns:
+            True if this worker still leads
+        """
+        if not self.is_leader:
+            return False
+        if await self.election.renew():
+            return True
+        logger.warning(f"Worker {worker_id()} lost leadership")
+        await self._call(self.on_demoted)
+        return False
+
+    async def sync_generation(self) -> bool:
+        """
+        Reload the index if the leader published a new generation
+
+        Returns:
+            True if the index was reloaded
+        """
+        generation = self.vector_store.get_generation()
+        if generation == self.generation:
+            return False
+        await self.vector_store.reload()
+        logger.info(f"Reloaded index for KB generation {generation} (was {self.generation})")
+        self.generation = generation
+        self.reloads += 1
+        self.last_reload_at = time.time()
+        return True
+
+    async def _elect(self):
+        if self.is_leader or not await self.election.try_acquire():
+            return
+        logger.info(f"Worker {worker_id()} elected leader ({self.election.backend} election)")
+        # Take over from the index the previous leader left behind
+        await self.sync_generation()
+        self.elections += 1
+        await self._call(self.on_elected)
+
+    @staticmethod
+    async def _call(callback: Optional[Callable[[], Any]]):
+        """Run a role callback (plain or async); failures are logged, not raised"""
+        if callback is None:
+            return
+        try:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.error(f"Worker role callback failed: {e}")
@@ -0,0 +1,100 @@
+"""
+WebSocket frame encodings for /ws/simli
+JSON text frames are the default; clients may negotiate MessagePack binary
+frames (same message types and fields) through the "simli.msgpack"
+subprotocol or a {"type": "hello", "encoding": "msgpack"} message
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from utils.config import settings
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for binary framing
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+class FrameCodec:
+    """Encodes outgoing messages for one negotiated encoding"""
+
+    name = "base"
+    subprotocol = ""
+
+    async def send(self, websocket: WebSocket, message: Dict[str, Any]):
+        """Encode and send one message"""
+        raise NotImplementedError
+
+class JSONCodec(FrameCodec):
+    """Compact JSON text frames"""
+
+    name = "json"
+    subprotocol = "simli.json"
+
+    async def send(self, websocket: WebSocket, message: Dict[str, Any]):
+        await websocket.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+class MessagePackCodec(FrameCodec):
+    """MessagePack binary frames"""
+
+    name = "msgpack"
+    subprotocol = "simli.msgpack"
+
+    async def send(self, websocket: WebSocket, message: Dict[str, Any]):
+        await websocket.send_bytes(msgpack.packb(message, use_bin_type=True))
+
+JSON_CODEC = JSONCodec()
+
+def available_codecs() -> Dict[str, FrameCodec]:
+    """Encodings this server accepts, by name"""
+    codecs: Dict[str, FrameCodec] = {JSON_CODEC.name: JSON_CODEC}
+    if settings.WS_MSGPACK_ENABLED and msgpack is not None:
+        codecs[MessagePackCodec.name] = MessagePackCodec()
+    return codecs
+
+def codec_for(name: Optional[str]) -> Optional[FrameCodec]:
+    """Codec for an encoding name, or None if unsupported"""
+    return available_codecs().get(name or "")
+
+def negotiate_subprotocol(requested: Iterable[str]) -> Optional[FrameCodec]:
+    """First requested subprotocol the server supports (None selects nothing)"""
+    by_subprotocol = {codec.subprotocol: codec for codec in available_codecs().values()}
+    for subprotocol in requested:
+        if subprotocol in by_subprotocol:
+            return by_subprotocol[subprotocol]
+    return None
+
+def supported_encodings() -> List[str]:
+    """Names of the encodings this server accepts"""
+    return list(available_codecs())
+
+async def receive_message(websocket: WebSocket) -> Dict[str, Any]:
+    """
+    Receive one client message in either encoding
+
+    Text frames are JSON and binary frames MessagePack, whatever was
+    negotiated, so clients can switch after the hello exchange.
+
+    Raises:
+        WebSocketDisconnect: The client closed the connection
+        ValueError: The frame could not be decoded
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+
+    if message.get("bytes") is not None:
+        if msgpack is None:
+            raise ValueError("Binary frames need MessagePack support on the server")
+        data = msgpack.unpackb(message["bytes"], raw=False)
+    else:
+        data = json.loads(message["text"])
+
+    if not isinstance(data, dict):
+        raise ValueError("Messages must be objects")
+    return data
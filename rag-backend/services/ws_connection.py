@@ -0,0 +1,541 @@
+"""
+Multiplexed Simli WebSocket connections
+Each connection reads messages in its own task and runs every query as a
+separate, cancellable task keyed by request id, so pings, cancels and
+barge-in queries are handled while earlier answers are still in flight
+"""
+
+import asyncio
+import base64
+import contextlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from services.admission import AdmissionRejected, Lane, admission, client_id
+from services.simli_orchestrator import SimliOrchestrator
+from services.stream_writer import CoalescingWriter
+from services.ws_codec import JSON_CODEC, FrameCodec, codec_for, receive_message, supported_encodings
+from services.tracing import current_request_id, new_request_id, trace_request
+from services.usage_tracker import track_usage
+from services.voice_input import END_OF_TURN, SPEECH_START, EnergyVAD, STTProvider, VoiceTurn, get_stt_provider
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+class WebSocketStats:
+    """Process-wide counters for multiplexed WebSocket queries"""
+
+    def __init__(self):
+        self.connections = 0
+        self.encodings: Dict[str, int] = {}
+        self.queries = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.superseded = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return connection and query counters"""
+        return {
+            "connections": self.connections,
+            "encodings": dict(self.encodings),
+            "queries": self.queries,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "superseded": self.superseded,
+            "rejected": self.rejected
+        }
+
+# Global counters for this process
+ws_stats = WebSocketStats()
+
+class SimliConnection:
+    """
+    One /ws/simli client
+
+    Protocol additions over the single-query loop:
+    - "query" messages may carry a "request_id" (one is assigned otherwise);
+      every frame produced for that query echoes it
+    - "stream": true streams the answer as coalesced "stream_chunk" frames
+    - a new query cancels the queries in flight (barge-in) unless it sets
+      "concurrent": true, in which case up to max_in_flight run side by side
+    - {"type": "cancel", "request_id": ...} cancels one query, or all of
+      them without a request_id; each is acknowledged with a "cancelled" frame
+    - {"type": "hello", "encoding": "msgpack"} switches server frames to
+      MessagePack (the reply is the first binary frame); client frames are
+      decoded by frame type either way
+    - voice input: {"type": "audio_start", "sample_rate": 16000} then
+      {"type": "audio", "data": ...} messages of 16-bit mono PCM (raw bytes
+      in MessagePack, base64 in JSON). The server replies with "vad" frames
+      (speech_start, end_of_turn), "transcript" frames (partial, then final)
+      and, for each turn, the speech frames of a "speech_stream" query.
+      {"type": "audio_end"} ends the turn without waiting for silence
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        orchestrator: SimliOrchestrator,
+        max_in_flight: int = 4,
+        barge_in: bool = True,
+        codec: FrameCodec = JSON_CODEC,
+        stt_provider: Optional[STTProvider] = None,
+        client: str = "local"
+    ):
+        """
+        Args:
+            websocket: Accepted client connection
+            orchestrator: Pipeline used to answer queries
+            max_in_flight: Concurrent queries allowed on this connection
+            barge_in: Whether a new query supersedes the ones in flight
+            codec: Encoding for server frames (negotiated subprotocol or JSON)
+            stt_provider: Speech-to-text for voice input (the configured one if None)
+            client: Rate-limit identity for admission control
+        """
+        self.websocket = websocket
+        self.orchestrator = orchestrator
+        self.codec = codec
+        self.max_in_flight = max_in_flight
+        self.barge_in = barge_in
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Starlette websockets do not support concurrent sends
+        self._send_lock = asyncio.Lock()
+        self._next_id = 0
+        self.stt_provider = stt_provider
+        # Voice input: options from audio_start and the utterance being heard
+        self._voice_options: Optional[Dict[str, Any]] = None
+        self._voice: Optional[VoiceTurn] = None
+        # The upgrade request's X-Request-ID; each query's trace id extends it
+        self.connection_id = current_request_id.get() or new_request_id()
+        self.client = client
+
+    @classmethod
+    def from_settings(
+        cls,
+        websocket: WebSocket,
+        orchestrator: SimliOrchestrator,
+        codec: FrameCodec = JSON_CODEC
+    ) -> "SimliConnection":
+        """Build a connection handler with configured limits"""
+        return cls(
+            websocket,
+            orchestrator,
+            max_in_flight=settings.WS_MAX_IN_FLIGHT,
+            barge_in=settings.WS_BARGE_IN,
+            codec=codec,
+            client=client_id(websocket.headers, websocket.client.host if websocket.client else None)
+        )
+
+    async def run(self):
+        """Serve the connection until the client disconnects"""
+        ws_stats.connections += 1
+        ws_stats.encodings[self.codec.name] = ws_stats.encodings.get(self.codec.name, 0) + 1
+        receiver = asyncio.create_task(self._receive_loop())
+        try:
+            await receiver
+        except WebSocketDisconnect:
+            logger.info("WebSocket disconnected")
+        except Exception as e:
+            logger.error(f"WebSocket error: {e}")
+            with contextlib.suppress(Exception):
+                await self.websocket.close(code=1011, reason=str(e))
+        finally:
+            receiver.cancel()
+            # Nobody is left to read the answers; free the upstream capacity
+            await self._cancel(list(self._tasks), reason=None)
+            if self._voice is not None:
+                await self._voice.close()
+
+    async def send(self, message: Dict[str, Any]):
+        """Send one frame, serialized with the other in-flight queries"""
+        async with self._send_lock:
+            await self.codec.send(self.websocket, message)
+
+    async def _receive_loop(self):
+        """Read and dispatch client messages without waiting on queries"""
+        while True:
+            data = await receive_message(self.websocket)
+            kind = data.get("type")
+
+            if kind == "query":
+                await self._start_query(data)
+
+            elif kind == "cancel":
+                request_id = data.get("request_id")
+                await self._cancel(
+                    [str(request_id)] if request_id is not None else list(self._tasks),
+                    reason="client"
+                )
+
+            elif kind == "ping":
+                await self.send({"type": "pong"})
+
+            elif kind == "hello":
+                await self._negotiate(data.get("encoding"))
+
+            elif kind == "audio_start":
+                await self._start_audio(data)
+
+            elif kind == "audio":
+                await self._feed_audio(data.get("data"))
+
+            elif kind == "audio_end":
+                if self._voice is not None:
+                    await self.send({"type": "vad", "event": END_OF_TURN})
+                    await self._end_voice_turn()
+
+    async def _negotiate(self, encoding: Optional[str]):
+        """Switch server frames to the requested encoding if supported"""
+        codec = codec_for(encoding or JSON_CODEC.name)
+        if codec is None:
+            await self.send({
+                "type": "error",
+                "message": f"Unsupported encoding: {encoding}",
+                "encodings": supported_encodings()
+            })
+            return
+
+        async with self._send_lock:
+            ws_stats.encodings[self.codec.name] -= 1
+            ws_stats.encodings[codec.name] = ws_stats.encodings.get(codec.name, 0) + 1
+            self.codec = codec
+        await self.send({"type": "hello", "encoding": codec.name, "encodings": supported_encodings()})
+
+    async def _start_query(self, data: Dict[str, Any]):
+        """Launch a query task, superseding or rejecting as configured"""
+        request_id = str(data.get("request_id") or self._new_request_id())
+
+        if request_id in self._tasks:
+            await self.send({
+                "type": "error",
+                "request_id": request_id,
+                "message": "A query with this request_id is already in flight"
+            })
+            return
+
+        if self.barge_in and not data.get("concurrent"):
+            await self._cancel(list(self._tasks), reason="superseded")
+        elif await self._over_limit(request_id):
+            return
+
+        ws_stats.queries += 1
+        task = asyncio.create_task(self._run_query(request_id, data))
+        self._tasks[request_id] = task
+        task.add_done_callback(lambda _: self._forget(request_id, task))
+
+    async def _over_limit(self, request_id: str) -> bool:
+        """Refuse a request when max_in_flight are already running on this connection"""
+        if len(self._tasks) < self.max_in_flight:
+            return False
+        ws_stats.rejected += 1
+        await self.send({
+            "type": "error",
+            "request_id": request_id,
+            "message": f"Too many queries in flight (limit {self.max_in_flight})"
+        })
+        return True
+
+    async def _cancel(self, request_ids: List[str], reason: Optional[str]):
+        """
+        Cancel queries and wait until their pipelines have unwound
+
+        Args:
+            request_ids: Queries to cancel (unknown ids are ignored)
+            reason: Sent to the client in a "cancelled" frame; None sends nothing
+        """
+        tasks = {}
+        for request_id in request_ids:
+            task = self._tasks.pop(request_id, None)
+            if task is not None and not task.done():
+                task.cancel()
+                tasks[request_id] = task
+
+        if not tasks:
+            return
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        if reason == "superseded":
+            ws_stats.superseded += len(tasks)
+        else:
+            ws_stats.cancelled += len(tasks)
+
+        if reason is not None:
+            for request_id in tasks:
+                await self.send({"type": "cancelled", "request_id": request_id, "reason": reason})
+
+    async def _run_query(self, request_id: str, data: Dict[str, Any]):
+        """Answer one query, tagging every frame with its request id"""
+        query_text = data.get("text", "") or data.get("content", "")
+        session_id = data.get("session_id")
+        logger.info(f"Received query {request_id} from Simli: {query_text}")
+        ws_stats.in_flight += 1
+        lease = None
+
+        with trace_request("ws.query", request_id=f"{self.connection_id}.{request_id}", **self._trace_attributes) as root:
+            try:
+                lease = await self._admit()
+                await self.send({
+                    "type": "processing",
+                    "request_id": request_id,
+                    "message": "Searching knowledge base..."
+                })
+
+                # Sentence-by-sentence speech for low-latency TTS
+                if data.get("speech_stream"):
+                    with track_usage("ws_speech"):
+                        await self._speak(request_id, self.orchestrator.stream_speech(query_text, session_id=session_id))
+                    return
+
+                # Token streaming, coalesced into frames
+                if data.get("stream"):
+                    with track_usage("ws_stream"):
+                        await self._stream_answer(request_id, query_text, session_id, data)
+                    return
+
+                # Get response through RAG pipeline
+                with track_usage("ws_query"):
+                    response = await self.orchestrator.process_query(
+                        query_text,
+                        stream=False,
+                        session_id=session_id
+                    )
+
+                # Send context chunks (optional, for debugging)
+                if response.sources and data.get("include_context", True):
+                    await self.send({
+                        "type": "context",
+                        "request_id": request_id,
+                        "chunks": [{"source": s, "text": s[:100] + "..."} for s in response.sources[:3]]
+                    })
+
+                # Send final response for Simli to speak
+                message = {
+                    "type": "response",
+                    "request_id": request_id,
+                    "text": response.answer,
+                    "confidence": response.confidence
+                }
+                if data.get("include_usage"):
+                    message["processing_steps"] = response.processing_steps
+                await self.send(message)
+                ws_stats.completed += 1
+
+            except asyncio.CancelledError:
+                logger.info(f"WebSocket query {request_id} cancelled")
+                raise
+            except WebSocketDisconnect:
+                pass
+            except AdmissionRejected as e:
+                await self._send_rejection(request_id, e)
+            except Exception as e:
+                ws_stats.failed += 1
+                root.set_error(e)
+                logger.error(f"WebSocket query {request_id} failed: {e}")
+                with contextlib.suppress(Exception):
+                    await self.send({"type": "error", "request_id": request_id, "message": str(e)})
+            finally:
+                ws_stats.in_flight -= 1
+                admission.release(lease)
+
+    async def _stream_answer(
+        self,
+        request_id: str,
+        query_text: str,
+        session_id: Optional[str],
+        data: Dict[str, Any]
+    ):
+        """Stream answer text as stream_chunk frames, then stream_complete"""
+        await self.send({"type": "stream_start", "request_id": request_id})
+        done: Dict[str, Any] = {"type": "error", "message": "Stream ended without a result"}
+
+        async with CoalescingWriter.from_settings(
+            self.send,
+            {"type": "stream_chunk", "request_id": request_id}
+        ) as writer:
+            async for event in self.orchestrator.stream_query(query_text, session_id=session_id):
+                if event["type"] == "token":
+                    await writer.write(event["content"])
+                    continue
+                done = event
+
+        if done["type"] == "error":
+            ws_stats.failed += 1
+            await self.send({"type": "stream_error", "request_id": request_id, "error": done["message"]})
+            return
+
+        message = {
+            "type": "stream_complete",
+            "request_id": request_id,
+            "confidence": done["confidence"],
+            "sources": done["sources"]
+        }
+        if data.get("include_usage"):
+            message["processing_steps"] = done["processing_steps"]
+        await self.send(message)
+        ws_stats.completed += 1
+
+    async def _speak(self, request_id: str, events):
+        """
+        Forward speech events, renaming the terminal "done" to speech_complete
+
+        The request counts as completed only if the stream reached "done"
+        """
+        completed = False
+        async for event in events:
+            if event["type"] == "done":
+                event = {**event, "type": "speech_complete"}
+                completed = True
+            await self.send({**event, "request_id": request_id})
+
+        if completed:
+            ws_stats.completed += 1
+        else:
+            ws_stats.failed += 1
+
+    async def _start_audio(self, data: Dict[str, Any]):
+        """Begin voice input; options apply to every turn until the next audio_start"""
+        if self._voice is not None:
+            await self._voice.close()
+            self._voice = None
+        self._voice_options = {
+            "sample_rate": int(data.get("sample_rate") or settings.VOICE_SAMPLE_RATE),
+            "session_id": data.get("session_id"),
+            # Expected transcript, honoured by the stub STT provider only
+            "transcript": data.get("transcript")
+        }
+        await self.send({"type": "listening", "sample_rate": self._voice_options["sample_rate"]})
+
+    async def _feed_audio(self, payload: Any):
+        """Run one audio chunk through VAD and STT, reporting what it completes"""
+        if self._voice_options is None:
+            await self.send({"type": "error", "message": "Send audio_start before audio"})
+            return
+        pcm = base64.b64decode(payload) if isinstance(payload, str) else bytes(payload or b"")
+
+        if self._voice is None:
+            self._voice = await self._open_voice_turn()
+
+        for event, value in await self._voice.feed(pcm):
+            if event == SPEECH_START:
+                await self.send({"type": "vad", "event": SPEECH_START})
+                # The user talking over the avatar interrupts its answer
+                if self.barge_in:
+                    await self._cancel(list(self._tasks), reason="superseded")
+            elif event == "partial":
+                await self.send({"type": "transcript", "text": value, "final": False})
+            elif event == END_OF_TURN:
+                await self.send({"type": "vad", "event": END_OF_TURN})
+                await self._end_voice_turn()
+
+    async def _open_voice_turn(self) -> VoiceTurn:
+        """Start listening for the next utterance"""
+        options = self._voice_options
+        provider = self.stt_provider or get_stt_provider()
+        stt = await provider.open_stream(options["sample_rate"], hint=options["transcript"])
+        session_id = options["session_id"]
+
+        async def prefetch(partial: str):
+            return await self.orchestrator.prefetch_context(partial, session_id=session_id)
+
+        return VoiceTurn(
+            stt,
+            EnergyVAD.from_settings(options["sample_rate"]),
+            prefetch=prefetch if settings.VOICE_PREFETCH_MIN_WORDS > 0 else None,
+            prefetch_min_words=max(settings.VOICE_PREFETCH_MIN_WORDS, 1)
+        )
+
+    async def _end_voice_turn(self):
+        """Answer the utterance heard so far as its own request"""
+        turn, self._voice = self._voice, None
+        request_id = self._new_request_id()
+        if await self._over_limit(request_id):
+            await turn.close()
+            return
+
+        ws_stats.queries += 1
+        task = asyncio.create_task(self._run_voice_turn(request_id, turn, dict(self._voice_options)))
+        self._tasks[request_id] = task
+        task.add_done_callback(lambda _: self._forget(request_id, task))
+
+    async def _run_voice_turn(self, request_id: str, turn: VoiceTurn, options: Dict[str, Any]):
+        """Finalize the transcript and speak the answer, tagging frames with the request id"""
+        ws_stats.in_flight += 1
+        lease = None
+        with trace_request("ws.voice", request_id=f"{self.connection_id}.{request_id}", **self._trace_attributes) as root:
+            try:
+                transcript, prefetched = await turn.finish()
+                await self.send({
+                    "type": "transcript",
+                    "request_id": request_id,
+                    "text": transcript,
+                    "final": True,
+                    "prefetched": prefetched is not None,
+                    "stt_finalize_ms": turn.stt_finalize_ms
+                })
+                if not transcript:
+                    ws_stats.completed += 1
+                    return
+
+                logger.info(f"Received voice query {request_id} from Simli: {transcript}")
+                lease = await self._admit()
+                with track_usage("ws_voice"):
+                    await self._speak(request_id, self.orchestrator.handle_voice_query(
+                        transcript,
+                        session_id=options["session_id"],
+                        prefetched=prefetched
+                    ))
+
+            except asyncio.CancelledError:
+                logger.info(f"WebSocket voice turn {request_id} cancelled")
+                raise
+            except WebSocketDisconnect:
+                pass
+            except AdmissionRejected as e:
+                await self._send_rejection(request_id, e)
+            except Exception as e:
+                ws_stats.failed += 1
+                root.set_error(e)
+                logger.error(f"WebSocket voice turn {request_id} failed: {e}")
+                with contextlib.suppress(Exception):
+                    await self.send({"type": "error", "request_id": request_id, "message": str(e)})
+            finally:
+                ws_stats.in_flight -= 1
+                admission.release(lease)
+                await turn.close()
+
+    async def _admit(self):
+        """Wait for a voice-lane pipeline slot, if admission control is on"""
+        if not settings.ADMISSION_ENABLED:
+            return None
+        return await admission.acquire(Lane.VOICE, self.client)
+
+    async def _send_rejection(self, request_id: str, error: AdmissionRejected):
+        """Tell the client a query was refused and when to retry"""
+        ws_stats.rejected += 1
+        with contextlib.suppress(Exception):
+            await self.send({
+                "type": "error",
+                "request_id": request_id,
+                "message": str(error),
+                "status": error.status_code,
+                "retry_after": error.retry_after
+            })
+
+    @property
+    def _trace_attributes(self) -> Dict[str, Any]:
+        return {"connection.id": self.connection_id, "ws.encoding": self.codec.name}
+
+    def _new_request_id(self) -> str:
+        self._next_id += 1
+        return f"r{self._next_id}"
+
+    def _forget(self, request_id: str, task: asyncio.Task):
+        """Drop a finished query unless a newer one reused its id"""
+        if self._tasks.get(request_id) is task:
+            del self._tasks[request_id]
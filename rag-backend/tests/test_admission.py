@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for admission control lanes, queueing and per-client rate limits
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.admission import AdmissionController, AdmissionRejected, Lane
+
+def test_voice_keeps_reserved_slots():
+    """Test agent and batch traffic cannot take the voice reservation, and waiters go by lane"""
+    print("\n=== Testing Priority Lanes ===")
+
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=3,
+            voice_reserved=1,
+            batch_max_concurrent=1,
+            queue_timeouts={lane: 0.2 for lane in Lane}
+        )
+        batch = await controller.acquire(Lane.BATCH, "eval")
+        agent = await controller.acquire(Lane.AGENT, "agent")
+
+        # Batch is capped at one slot and agents may not use the voice slot
+        try:
+            await controller.acquire(Lane.BATCH, "eval")
+            assert False, "batch must be refused once its cap is reached"
+        except AdmissionRejected as e:
+            assert e.status_code == 503 and e.reason == "queue_timeout" and e.retry_after >= 1
+        voice = await controller.acquire(Lane.VOICE, "avatar")
+
+        # With every slot busy, a queued voice query overtakes an earlier agent one
+        order = []
+
+        async def wait(lane, client):
+            lease = await controller.acquire(lane, client)
+            order.append(lane)
+            return lease
+
+        waiting_agent = asyncio.create_task(wait(Lane.AGENT, "agent"))
+        await asyncio.sleep(0.01)
+        waiting_voice = asyncio.create_task(wait(Lane.VOICE, "avatar"))
+        await asyncio.sleep(0.01)
+        assert controller.stats()["queue_depth"] == {"voice": 1, "agent": 1, "batch": 0}
+
+        controller.release(batch)
+        await asyncio.sleep(0.01)
+        assert order == [Lane.VOICE]
+        # Two slots busy still leaves only the voice reservation
+        controller.release(voice)
+        await asyncio.sleep(0.01)
+        assert order == [Lane.VOICE]
+        controller.release(agent)
+        await asyncio.sleep(0.01)
+        assert order == [Lane.VOICE, Lane.AGENT]
+
+        for lease in (await waiting_agent, await waiting_voice):
+            controller.release(lease)
+        stats = controller.stats()
+        print(stats)
+        assert stats["in_flight"] == {"voice": 0, "agent": 0, "batch": 0}
+        assert stats["rejected"]["batch"]["queue_timeout"] == 1
+
+    asyncio.run(scenario())
+
+def test_client_rate_limit_and_queue_cap():
+    """Test a bursting client gets 429 with Retry-After while others are admitted, and a full queue 503s at once"""
+    print("\n=== Testing Rate Limits ===")
+
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, client_rpm=60, client_burst=2)
+        controller.release(await controller.acquire(Lane.AGENT, "ip:1"))
+        controller.release(await controller.acquire(Lane.AGENT, "ip:1"))
+        try:
+            await controller.acquire(Lane.AGENT, "ip:1")
+            assert False, "the third request in a burst of two must be refused"
+        except AdmissionRejected as e:
+            assert e.status_code == 429 and e.retry_after == 1
+
+        held = await controller.acquire(Lane.AGENT, "ip:2")
+        queued = asyncio.create_task(controller.acquire(Lane.AGENT, "ip:3"))
+        await asyncio.sleep(0.01)
+        try:
+            await controller.acquire(Lane.AGENT, "ip:4")
+            assert False, "a full queue must refuse immediately"
+        except AdmissionRejected as e:
+            assert e.status_code == 503 and e.reason == "queue_full"
+
+        # A waiter that goes away leaves nothing behind
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        controller.release(held)
+        assert controller.stats()["in_flight"]["agent"] == 0
+
+    asyncio.run(scenario())
+
+def main():
+    """Run all tests"""
+    print("Admission Control Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_voice_keeps_reserved_slots,
+        test_client_rate_limit_and_queue_cap
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for client disconnect propagation and tokens-saved accounting
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.cancellation import CancellationStats, ClientDisconnected, cancellation_stats, run_until_disconnect
+from services.fake_llm import FakeLanguageModel
+from services.llm_providers import FakeProvider
+from services.llm_service import LLMService
+from services.usage_tracker import track_usage
+
+class FakeRequest:
+    """Request whose client disconnects after a delay"""
+
+    def __init__(self, disconnect_after: float):
+        self.disconnect_after = disconnect_after
+
+    async def receive(self):
+        await asyncio.sleep(self.disconnect_after)
+        return {"type": "http.disconnect"}
+
+def test_disconnect_cancels_work():
+    """Test that a disconnect cancels the pending work"""
+    print("\n=== Testing HTTP Disconnect ===")
+
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        with track_usage("test_disconnect") as usage:
+            try:
+                await run_until_disconnect(FakeRequest(0.05), work())
+            except ClientDisconnected:
+                return usage
+
+    usage = asyncio.run(scenario())
+    assert cancelled == [True]
+    assert usage.cancelled
+
+def test_result_returned_when_client_stays():
+    """Test that work finishing first returns its result"""
+    async def work():
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    assert asyncio.run(run_until_disconnect(FakeRequest(5), work())) == "answer"
+
+def test_tokens_saved_estimate():
+    """Test that savings are measured against typical answer length"""
+    stats = CancellationStats()
+    assert stats.expected_completion_tokens("gpt-4o", 300) == 300
+
+    stats.record_completion("gpt-4o", 100)
+    stats.record_completion("gpt-4o", 140)
+    assert stats.record_stream_closed("gpt-4o", generated_tokens=30, max_tokens=300) == 90
+    assert stats.record_stream_closed("gpt-4o", generated_tokens=500, max_tokens=300) == 0
+    assert stats.stats()["llm_streams_closed"] == 2
+    assert stats.stats()["cost_saved_usd"] > 0
+
+def test_abandoned_stream_is_closed():
+    """Test that leaving a stream early closes it and records the savings"""
+    print("\n=== Testing Abandoned Stream ===")
+
+    provider = FakeProvider(FakeLanguageModel(latency_ms=0, tokens_per_second=0, response_tokens=200))
+    service = LLMService(provider=provider)
+    service.cache = None
+
+    async def scenario():
+        with track_usage("test_stream") as usage:
+            stream = service.stream_response("Which residencies offer housing?", "context", max_tokens=300)
+            async for _ in stream:
+                break
+            await stream.aclose()
+            return usage
+
+    closed_before = cancellation_stats.counters["llm_streams_closed"]
+    usage = asyncio.run(scenario())
+    print(f"Tokens saved: {usage.tokens_saved}")
+    assert cancellation_stats.counters["llm_streams_closed"] == closed_before + 1
+    assert usage.completion_tokens < 5
+    assert usage.tokens_saved > 0
+
+def main():
+    """Run all tests"""
+    print("Cancellation Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_disconnect_cancels_work,
+        test_result_returned_when_client_stays,
+        test_tokens_saved_estimate,
+        test_abandoned_stream_is_closed
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
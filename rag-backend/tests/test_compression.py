@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for negotiated response compression
+"""
+
+import sys
+import gzip
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from services import compression
+from services.compression import CompressionMiddleware, negotiate_encoding
+
+def test_negotiation():
+    """Test Accept-Encoding parsing, q-values and the brotli fallback"""
+    print("\n=== Testing Encoding Negotiation ===")
+
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("*") in ("br", "gzip")
+
+    brotli = compression.brotli
+    try:
+        compression.brotli = object()
+        assert negotiate_encoding("gzip, br") == "br"
+        assert negotiate_encoding("gzip, br;q=0") == "gzip"
+        compression.brotli = None
+        assert negotiate_encoding("br, gzip") == "gzip"
+        assert negotiate_encoding("br") is None
+    finally:
+        compression.brotli = brotli
+
+def test_large_complete_responses_only():
+    """Test only complete bodies above the threshold are compressed, never SSE"""
+    print("\n=== Testing Compression Middleware ===")
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse("grant " * 200)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("grant")
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            for i in range(3):
+                yield f"data: {'token ' * 50}{i}\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    with TestClient(app) as client:
+        headers = {"accept-encoding": "gzip"}
+        response = client.get("/large", headers=headers)
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < 1200
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.text == "grant " * 200
+
+        assert "content-encoding" not in client.get("/small", headers=headers).headers
+        assert "content-encoding" not in client.get("/large", headers={"accept-encoding": "identity"}).headers
+
+        response = client.get("/events", headers=headers)
+        assert "content-encoding" not in response.headers
+        assert response.text.count("data:") == 3
+
+    assert gzip.decompress(compression.compress(b"grant" * 100, "gzip")) == b"grant" * 100
+
+def main():
+    """Run all tests"""
+    print("Compression Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_negotiation,
+        test_large_complete_responses_only
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for conversation-aware retrieval and history compaction
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.conversation import ConversationManager
+from services.session_store import InMemorySessionStore
+
+def _session(turns: int = 1, answer: str = "Yaddo offers residencies in Saratoga Springs."):
+    """Session record with the given number of turns"""
+    store = InMemorySessionStore()
+    for i in range(turns):
+        asyncio.run(store.append_turn(
+            "s1",
+            f"Tell me about Yaddo residency {i}",
+            answer,
+            0.9,
+            ["Yaddo"],
+            retrieval=("Yaddo - Saratoga Springs, NY. Deadline: January 1.", [0.91, 0.62])
+        ))
+    return asyncio.run(store.get("s1"))
+
+def test_first_turn_is_unchanged():
+    """Test that a query without history passes through untouched"""
+    print("\n=== Testing First Turn ===")
+
+    conversation = ConversationManager().prepare("What is Yaddo?", None)
+    assert conversation.retrieval_query == "What is Yaddo?"
+    assert conversation.history_messages == []
+    assert conversation.reuse_context is None
+
+def test_follow_up_rewritten_and_context_reused():
+    """Test that a follow-up is anchored to the previous entries and reuses them"""
+    print("\n=== Testing Follow-up ===")
+
+    conversation = ConversationManager().prepare("What about the deadline for that one?", _session())
+    print(f"Retrieval query: {conversation.retrieval_query}")
+    assert conversation.rewritten
+    assert "Yaddo" in conversation.retrieval_query
+    assert conversation.reuse_context.startswith("Yaddo")
+    assert conversation.reuse_scores == [0.91, 0.62]
+    assert [m["role"] for m in conversation.history_messages] == ["user", "assistant"]
+
+def test_new_topic_searches_again():
+    """Test that standalone queries and new entities trigger a fresh search"""
+    standalone = ConversationManager().prepare("Which residencies fund sculptors?", _session())
+    assert not standalone.rewritten and standalone.reuse_context is None
+    assert standalone.history_messages
+
+    new_entity = ConversationManager().prepare("And how does MacDowell compare?", _session())
+    assert new_entity.rewritten and new_entity.reuse_context is None
+
+def test_standalone_questions_with_reference_words():
+    """Test that "there", "it" or "them" alone do not make a new question a follow-up"""
+    print("\n=== Testing Reference Words ===")
+
+    manager = ConversationManager()
+    for query in (
+        "What grants are there for photographers?",
+        "Is it possible to find funding for sculptors?",
+        "Do residencies allow artists to bring kids in them?"
+    ):
+        conversation = manager.prepare(query, _session())
+        print(f"{query} -> {conversation.retrieval_query}")
+        assert not conversation.rewritten and conversation.retrieval_query == query
+        assert conversation.reuse_context is None
+        # The previous entry stays available in case it was meant after all
+        assert conversation.merged("Photography grants").startswith("Photography grants")
+        assert conversation.merged("Photography grants").endswith("Deadline: January 1.")
+
+    # A back-reference adding nothing new still reuses the previous entry
+    conversation = manager.prepare("When is its deadline?", _session())
+    assert conversation.rewritten and conversation.reuse_context.startswith("Yaddo")
+
+def test_history_stays_within_budget():
+    """Test that long histories are compacted under the token budget"""
+    print("\n=== Testing History Budget ===")
+
+    long_answer = "This residency supports artists. " * 80
+    manager = ConversationManager(history_token_budget=300, answer_token_limit=40)
+    conversation = manager.prepare("Tell me more about it", _session(turns=8, answer=long_answer))
+
+    print(f"History tokens: {conversation.history_tokens}, messages: {len(conversation.history_messages)}")
+    assert 0 < conversation.history_tokens <= 300
+    assert conversation.history_messages[-1]["role"] == "assistant"
+    assert conversation.history_messages[-1]["content"].endswith("…")
+    # Dropped turns survive as a short summary of what was asked
+    assert conversation.history_messages[0]["role"] == "system"
+
+def main():
+    """Run all tests"""
+    print("Conversation Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_first_turn_is_unchanged,
+        test_follow_up_rewritten_and_context_reused,
+        test_new_topic_searches_again,
+        test_standalone_questions_with_reference_words,
+        test_history_stays_within_budget
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Test script for background ingest jobs, the batched pipeline and degraded keyword retrieval
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.ingest_jobs import EntryStream, IngestCancelled, IngestJobConflict, IngestJobManager
+from services.retrieval import RetrievalService
+from services.vector_store import VectorStoreService
+from utils.config import settings
+from utils.text_processor import TextProcessor
+
+def test_jobs_run_in_background():
+    """Test job status moves from running to succeeded or failed, keeping results"""
+    print("\n=== Testing Ingest Jobs ===")
+
+    async def scenario():
+        manager = IngestJobManager(history=1)
+        release = asyncio.Event()
+
+        async def ingest(progress):
+            await release.wait()
+            return {"entries_processed": 3}
+
+        async def broken(progress):
+            raise ValueError("bad file")
+
+        job = manager.start("kb.json", ingest)
+        await asyncio.sleep(0)
+        assert job.status == "running" and manager.active is job
+        try:
+            manager.start("again.json", ingest)
+            assert False, "a second job must not start while one runs"
+        except IngestJobConflict as e:
+            assert e.active is job
+
+        release.set()
+        await job.task
+        assert job.status == "succeeded" and job.result == {"entries_processed": 3}
+        assert manager.active is None
+
+        failed = manager.start("other.json", broken)
+        await failed.task
+        assert failed.status == "failed" and failed.error == "bad file"
+
+        third = manager.start("third.json", ingest)
+        await asyncio.sleep(0)
+        # Only the most recent finished job is kept
+        assert [j["source"] for j in manager.list()] == ["third.json", "other.json"]
+        assert manager.get(job.id) is None
+        await third.task
+
+    asyncio.run(scenario())
+
+def test_streamed_entries_are_embedded_in_batches():
+    """Test NDJSON lines flow through a bounded stream into batched embedding calls"""
+    print("\n=== Testing Batched Streaming Ingest ===")
+
+    async def scenario():
+        store = _store([])
+        calls = []
+
+        async def embed_texts(texts, priority=None):
+            calls.append(len(texts))
+            await asyncio.sleep(0.01)
+            return [[0.0] for _ in texts]
+        store.embed_texts = embed_texts
+
+        lines = [
+            json.dumps({"id": str(i), "name": f"Residency {i}", "organization": "Org",
+                        "description": "Studio and stipend", "type": "residency", "disciplines": ["painting"]})
+            for i in range(10)
+        ]
+        lines.insert(3, "{not json")
+        body = ("\n".join(lines)).encode()
+
+        async def chunks():
+            for start in range(0, len(body), 50):
+                yield body[start:start + 50]
+
+        manager = IngestJobManager()
+        stream = EntryStream(maxsize=2)
+        job = manager.start("upload", lambda progress: store.ingest_entries(stream.entries(progress), progress=progress), stream)
+        job.progress.total_bytes = len(body)
+        assert await stream.feed_ndjson(chunks()) == 11
+        await job.task
+
+        print(calls, job.to_dict()["progress"])
+        assert job.status == "succeeded"
+        assert calls == [4, 4, 2]
+        assert job.result["entries_added"] == 10 and job.result["chunks_embedded"] == 10
+        assert len(job.result["errors"]) == 1 and job.progress.errors == 1
+        assert len(store.collection.upserted) == 10
+        assert job.to_dict()["progress"]["eta_seconds"] == 0
+
+        # Cancelling a job releases a producer blocked on the full buffer
+        stream = EntryStream(maxsize=1)
+        job = manager.start("upload", lambda progress: store.ingest_entries(stream.entries(progress), progress=progress), stream)
+
+        async def endless():
+            while True:
+                yield lines[0].encode() + b"\n"
+
+        producer = asyncio.create_task(stream.feed_ndjson(endless()))
+        await asyncio.sleep(0.05)
+        await manager.cancel(job.id)
+        try:
+            await asyncio.wait_for(producer, 1)
+            assert False, "the producer must be told the job stopped"
+        except IngestCancelled:
+            pass
+        assert job.status == "cancelled" and job.progress.entries_processed > 0
+
+    original_batch = settings.INGEST_BATCH_SIZE
+    settings.INGEST_BATCH_SIZE = 4
+    try:
+        asyncio.run(scenario())
+    finally:
+        settings.INGEST_BATCH_SIZE = original_batch
+
+class FakeCollection:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.upserted = {}
+        self.limits = []
+
+    def get(self, ids=None, where=None, where_document=None, limit=None, include=None):
+        if ids is not None:
+            return {"ids": [i for i in ids if i in self.upserted]}
+        chunks = self.chunks
+        if where_document is not None:
+            self.limits.append(limit)
+            needles = [clause["$contains"] for clause in where_document["$or"]]
+            chunks = [c for c in chunks if any(needle in c[1] for needle in needles)][:limit]
+        return {
+            "ids": [c[0] for c in chunks],
+            "documents": [c[1] for c in chunks],
+            "metadatas": [{"entry_name": c[0]} for c in chunks]
+        }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserted.update(zip(ids, documents))
+
+class FakeTextProcessor(TextProcessor):
+    def __init__(self):
+        pass
+
+    def create_chunks(self, text, chunk_size, chunk_overlap):
+        return [text]
+
+def _store(chunks):
+    store = VectorStoreService.__new__(VectorStoreService)
+    store.text_processor = FakeTextProcessor()
+    store.collection = FakeCollection(chunks)
+    store._system, store._pins, store._retired = None, {}, set()
+    store.bump_generation = lambda: 1
+    return store
+
+def test_keyword_retrieval_while_initial_ingest_runs():
+    """Test retrieval switches to keyword search while the ingest marker exists"""
+    print("\n=== Testing Degraded Retrieval ===")
+
+    store = _store([
+        ("yaddo", "Yaddo residency in Saratoga Springs for writers and painters"),
+        ("berlin", "Berlin residency for painters and sculptors, with a studio grant"),
+        ("nea", "NEA grant for arts organizations")
+    ])
+    results = asyncio.run(store.keyword_search("painters residency Berlin", num_results=5))
+    print([(r["id"], round(r["score"], 2)) for r in results])
+    assert [r["id"] for r in results] == ["berlin", "yaddo"]
+    assert results[0]["score"] == 1.0
+    # Only chunks containing a keyword are read, and never more than the cap
+    assert store.collection.limits == [settings.DEGRADED_KEYWORD_CANDIDATES]
+
+    async def vector_search(*args, **kwargs):
+        return [{"id": "vector", "text": "from the vector index", "metadata": {}, "score": 0.9}]
+    store.search = vector_search
+
+    retrieval = RetrievalService.__new__(RetrievalService)
+    retrieval.vector_store = store
+    retrieval.text_processor = store.text_processor
+
+    original_dir = settings.CHROMA_PERSIST_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.CHROMA_PERSIST_DIR = tmp
+        try:
+            with open(os.path.join(tmp, "initial_ingest.json"), "w") as f:
+                f.write("{}")
+            assert retrieval.degraded
+            context, _ = asyncio.run(retrieval.retrieve_scored_context("painters residency in Berlin", num_results=1))
+            assert "studio grant" in context
+
+            os.remove(os.path.join(tmp, "initial_ingest.json"))
+            assert not retrieval.degraded
+            context, _ = asyncio.run(retrieval.retrieve_scored_context("painters residency in Berlin", num_results=1))
+            assert "from the vector index" in context
+        finally:
+            settings.CHROMA_PERSIST_DIR = original_dir
+
+def test_interrupted_initial_ingest_resumes():
+    """Test an interrupted initial ingest stops degrading and resumes without re-embedding"""
+    print("\n=== Testing Initial Ingest Resume ===")
+
+    entries = [
+        {"id": str(i), "name": f"Residency {i}", "organization": "Org",
+         "description": "Studio and stipend", "type": "residency", "disciplines": ["painting"]}
+        for i in range(6)
+    ]
+
+    async def scenario(tmp):
+        file_path = os.path.join(tmp, "kb.json")
+        with open(file_path, "w") as f:
+            json.dump({"entries": entries}, f)
+
+        store = _store([])
+        embedded = []
+
+        async def embed_texts(texts, priority=None):
+            embedded.extend(texts)
+            await asyncio.sleep(0.01)
+            return [[0.0] for _ in texts]
+        store.embed_texts = embed_texts
+
+        # Cancelled part-way, e.g. the leader shutting down or being demoted
+        task = asyncio.create_task(store.initial_ingest(file_path))
+        while len(store.collection.upserted) < 2:
+            await asyncio.sleep(0.005)
+        assert store.initial_ingest_pending()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        done = len(store.collection.upserted)
+        assert not store.initial_ingest_pending() and store.initial_ingest_unfinished()
+
+        # The next run only embeds the entries that are missing
+        embedded.clear()
+        result = await store.initial_ingest(file_path)
+        print(result, f"{done} already indexed")
+        assert len(embedded) == len(entries) - done
+        assert len(store.collection.upserted) == len(entries)
+        assert result["entries_added"] == len(entries) - done
+        assert not store.initial_ingest_unfinished()
+
+        # A failing run is marked interrupted too, with the reason
+        try:
+            await store.initial_ingest(os.path.join(tmp, "missing.json"))
+            assert False, "a missing file must fail the ingest"
+        except FileNotFoundError:
+            pass
+        assert not store.initial_ingest_pending() and store.initial_ingest_unfinished()
+        with open(os.path.join(tmp, "initial_ingest.json")) as f:
+            assert "missing.json" in json.load(f)["reason"]
+
+    original = settings.CHROMA_PERSIST_DIR, settings.INGEST_BATCH_SIZE
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.CHROMA_PERSIST_DIR, settings.INGEST_BATCH_SIZE = tmp, 1
+        try:
+            asyncio.run(scenario(tmp))
+        finally:
+            settings.CHROMA_PERSIST_DIR, settings.INGEST_BATCH_SIZE = original
+
+def main():
+    """Run all tests"""
+    print("Ingest Jobs Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_jobs_run_in_background,
+        test_streamed_entries_are_embedded_in_batches,
+        test_keyword_retrieval_while_initial_ingest_runs,
+        test_interrupted_initial_ingest_resumes
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for the canned-answer intent matcher
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.intent_matcher import IntentMatcher
+
+INTENTS_FILE = Path(__file__).parent.parent / "data" / "intents.json"
+
+def _write_table(path: str, intents, mtime: float):
+    with open(path, "w") as f:
+        json.dump({"intents": intents}, f)
+    os.utime(path, (mtime, mtime))
+
+def test_shipped_table_matches_small_talk_only():
+    """Test exact, normalized and nearest matches, and that real questions fall through"""
+    print("\n=== Testing Intent Matching ===")
+
+    matcher = IntentMatcher(str(INTENTS_FILE))
+    cases = {
+        "hi": ("greeting", "exact"),
+        "Um, hello there!": ("greeting", "normalized"),
+        "hey, how's it going?": ("how_are_you", "nearest"),
+        "what can you do for me": ("capabilities", "nearest")
+    }
+    for query, expected in cases.items():
+        match = matcher.match(query)
+        print(f"{query!r} -> {match.intent} ({match.method}, {match.score:.2f}, {match.match_ms:.3f}ms)")
+        assert (match.intent, match.method) == expected
+        assert match.match_ms < 5
+
+    for query in [
+        "what can you do for sculptors",
+        "Hi, what residencies are in Berlin?",
+        "thanks, and what about the deadline for Yaddo?",
+        "who runs Yaddo"
+    ]:
+        assert matcher.match(query) is None, query
+
+    stats = matcher.stats()
+    assert stats["hits"] == 4 and stats["lookups"] == 8
+    assert stats["hits_by_intent"]["greeting"] == 2
+
+def test_table_hot_reload():
+    """Test that edits are picked up and an invalid file keeps the old table"""
+    print("\n=== Testing Hot Reload ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "intents.json")
+        _write_table(path, [{"name": "hours", "examples": ["are you open"], "answer": "Always."}], 1000)
+        matcher = IntentMatcher(path, reload_interval=0)
+        assert matcher.match("are you open").answer == "Always."
+
+        _write_table(path, [{"name": "hours", "examples": ["are you open"], "answer": "Day and night."}], 2000)
+        assert matcher.match("are you open").answer == "Day and night."
+
+        with open(path, "w") as f:
+            f.write("{not json")
+        os.utime(path, (3000, 3000))
+        assert matcher.match("are you open").answer == "Day and night."
+        assert matcher.stats()["reloads"] == 2
+
+def test_prompt_intents_are_pregenerated():
+    """Test that prompt-only intents answer once generated and fall through before"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "intents.json")
+        _write_table(path, [{"name": "joke", "examples": ["tell me a joke"], "prompt": "A short art joke"}], 1000)
+        matcher = IntentMatcher(path)
+        assert matcher.match("tell me a joke") is None
+
+        prompts = []
+
+        async def generate(prompt):
+            prompts.append(prompt)
+            return " Why did the painter cross the road? "
+
+        asyncio.run(matcher.pregenerate(generate))
+        asyncio.run(matcher.pregenerate(generate))
+        assert prompts == ["A short art joke"]
+        assert matcher.match("tell me a joke").answer == "Why did the painter cross the road?"
+
+def main():
+    """Run all tests"""
+    print("Intent Matcher Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_shipped_table_matches_small_talk_only,
+        test_table_hot_reload,
+        test_prompt_intents_are_pregenerated
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
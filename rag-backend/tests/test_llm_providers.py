@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for the deterministic fake LLM provider
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.fake_llm import FakeLanguageModel
+from services.llm_providers import FakeProvider
+
+MESSAGES = [
+    {"role": "system", "content": "You are an expert on art residencies."},
+    {"role": "user", "content": "Which residencies offer housing?"}
+]
+
+def _provider(**kwargs) -> FakeProvider:
+    """Fake provider with no artificial latency unless requested"""
+    options = {"latency_ms": 0, "tokens_per_second": 0, "embedding_latency_ms": 0}
+    options.update(kwargs)
+    return FakeProvider(FakeLanguageModel(**options))
+
+def test_complete_is_deterministic():
+    """Test that identical prompts produce identical answers"""
+    print("\n=== Testing Deterministic Completions ===")
+
+    provider = _provider(response_tokens=40)
+    first = asyncio.run(provider.complete("gpt-4o", MESSAGES))
+    second = asyncio.run(provider.complete("gpt-4o", MESSAGES))
+    other = asyncio.run(provider.complete("gpt-4o", MESSAGES[:1]))
+
+    assert first == second
+    assert first.text != other.text
+    assert first.finish_reason == "stop"
+    assert first.usage.completion_tokens == 40
+    print(f"Answer: {first.text[:80]}...")
+
+def test_stream_matches_complete():
+    """Test that streamed chunks join to the complete answer"""
+    print("\n=== Testing Streaming ===")
+
+    provider = _provider(response_tokens=30, chunk_tokens=4)
+
+    async def collect():
+        stream = await provider.stream("gpt-4o", MESSAGES)
+        return [delta async for delta in stream]
+
+    deltas = asyncio.run(collect())
+    complete = asyncio.run(provider.complete("gpt-4o", MESSAGES))
+
+    assert "".join(d.content for d in deltas) == complete.text
+    assert deltas[-1].finish_reason == "stop"
+    assert deltas[-1].usage == complete.usage
+    assert len(deltas) == 30 // 4 + 2
+    print(f"Received {len(deltas)} deltas")
+
+def test_max_tokens_truncates():
+    """Test that max_tokens cuts the answer with finish_reason=length"""
+    result = asyncio.run(_provider(response_tokens=40).complete("gpt-4o", MESSAGES, max_tokens=5))
+    assert result.finish_reason == "length"
+    assert result.usage.completion_tokens == 5
+
+def test_token_rate_paces_stream():
+    """Test that latency and token rate shape streaming timing"""
+    print("\n=== Testing Stream Pacing ===")
+
+    provider = _provider(latency_ms=50, tokens_per_second=200, response_tokens=20)
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        stream = await provider.stream("gpt-4o", MESSAGES)
+        first = None
+        async for delta in stream:
+            if first is None:
+                first = loop.time() - start
+        return first, loop.time() - start
+
+    first, total = asyncio.run(timed())
+    assert first >= 0.05
+    assert total >= 0.05 + 19 / 200
+    print(f"First token: {first * 1000:.0f}ms, total: {total * 1000:.0f}ms")
+
+def test_embeddings():
+    """Test embedding shape, determinism and lexical similarity"""
+    provider = _provider()
+    result = asyncio.run(provider.embed("text-embedding-ada-002", [
+        "visual arts residency housing",
+        "housing for visual arts residency",
+        "music composition grant"
+    ]))
+
+    assert result.tokens == 12
+    vectors = result.vectors
+    assert len(vectors) == 3 and len(vectors[0]) == 1536
+    similar = sum(a * b for a, b in zip(vectors[0], vectors[1]))
+    unrelated = sum(a * b for a, b in zip(vectors[0], vectors[2]))
+    assert similar > 0.8 > unrelated
+
+    function = provider.chroma_embedding_function("text-embedding-ada-002")
+    assert function(["visual arts residency housing"])[0] == vectors[0]
+
+def main():
+    """Run all tests"""
+    print("LLM Provider Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_complete_is_deterministic,
+        test_stream_matches_complete,
+        test_max_tokens_truncates,
+        test_token_rate_paces_stream,
+        test_embeddings
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the load-test harness's mix parsing and reporting
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from examples.load_test import Results, parse_args, parse_mix, percentile, render_markdown
+
+def test_mix_and_percentiles():
+    """Test query mix weights are normalized and percentiles use nearest rank"""
+    print("\n=== Testing Mix and Percentiles ===")
+
+    assert parse_mix("query:3,ws:1") == {"query": 0.75, "ws": 0.25}
+    assert parse_mix("retrieve_context") == {"retrieve_context": 1.0}
+    for bad in ("chat:1", "query:0"):
+        try:
+            parse_mix(bad)
+            assert False, f"{bad!r} must be rejected"
+        except ValueError:
+            pass
+
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) is None
+
+def test_report():
+    """Test the summary counts errors per kind and renders as Markdown"""
+    print("\n=== Testing Report ===")
+
+    results = Results()
+    results.users_started = 3
+    for latency in (100.0, 200.0, 300.0):
+        results.record("query_stream", latency, ttft_ms=latency / 10)
+    results.record("query_stream", 5.0, error="http_429")
+    results.record("retrieve_context", 20.0)
+
+    summary = results.summary(wall_s=2.0)
+    stream = summary["endpoints"]["query_stream"]
+    assert stream["requests"] == 4 and stream["ok"] == 3
+    assert stream["errors"] == {"http_429": 1}
+    assert stream["error_rate"] == 0.25
+    assert stream["latency_ms"]["p50"] == 200.0
+    assert stream["ttft_ms"]["p99"] == 30.0
+    assert summary["endpoints"]["retrieve_context"]["ttft_ms"] is None
+    assert "ws" not in summary["endpoints"]
+    assert summary["throughput_rps"] == 2.0
+
+    args = parse_args(["--mix", "query_stream:1,retrieve_context:1"])
+    config = {**vars(args), "mix": parse_mix(args.mix)}
+    markdown = render_markdown({"config": config, "summary": summary, "server": {}})
+    print(markdown)
+    assert "| query_stream | 4 | 25.00% | 1.5 | 200 | 300 | 300 | 20 | 30 | 30 |" in markdown
+    assert "- query_stream: http_429 x1" in markdown
+
+def main():
+    """Run all tests"""
+    print("Load Test Harness Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_mix_and_percentiles,
+        test_report
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for complexity-based model routing
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.query_router import QueryRouter, FAST_ROUTE, FULL_ROUTE
+
+CLEAR_MATCH = [1.4, 1.1, 0.9]
+CLOSE_MATCH = [1.1, 1.05, 1.0]
+
+def _router(**kwargs) -> QueryRouter:
+    """Router with explicit models so tests don't depend on .env"""
+    options = {"fast_model": "fast-model", "full_model": "full-model"}
+    options.update(kwargs)
+    return QueryRouter(**options)
+
+def test_factual_lookups_take_fast_route():
+    """Test that short single-fact questions use the fast model"""
+    print("\n=== Testing Fast Route ===")
+
+    router = _router(fast_max_tokens=250)
+    for query in (
+        "What's the deadline for Yaddo?",
+        "How much is the MacDowell stipend?",
+        "Where is Headlands located?"
+    ):
+        decision = router.classify(query, CLEAR_MATCH)
+        assert decision.route == FAST_ROUTE, (query, decision.reason)
+        assert decision.model == "fast-model"
+        assert decision.max_tokens == 250
+        print(f"  {query} -> {decision.route} ({decision.reason})")
+
+def test_complex_queries_take_full_route():
+    """Test that comparisons, advice and open questions use the full model"""
+    print("\n=== Testing Full Route ===")
+
+    router = _router()
+    for query in (
+        "Compare the deadlines for Yaddo and MacDowell",
+        "Should I apply to Yaddo this year?",
+        "Tell me about residencies in Europe",
+        "What is the deadline for a residency in Europe that supports digital artists working with sound and video?"
+    ):
+        decision = router.classify(query, CLEAR_MATCH)
+        assert decision.route == FULL_ROUTE, (query, decision.reason)
+        assert decision.model == "full-model"
+        print(f"  {query} -> {decision.route} ({decision.reason})")
+
+def test_ambiguous_retrieval_takes_full_route():
+    """Test that a factual question without a clear best match uses the full model"""
+    router = _router(min_score_gap=0.1)
+    assert router.classify("When is the deadline?", CLOSE_MATCH).route == FULL_ROUTE
+    assert router.classify("When is the deadline?", []).route == FULL_ROUTE
+    assert router.classify("When is the deadline?", [0.8]).route == FAST_ROUTE
+
+def test_routing_disabled():
+    """Test that a disabled router always picks the full model"""
+    router = _router(enabled=False)
+    assert router.classify("What's the deadline for Yaddo?", CLEAR_MATCH).route == FULL_ROUTE
+
+def test_route_stats():
+    """Test per-route latency and token accounting"""
+    router = _router()
+    fast = router.classify("What's the deadline for Yaddo?", CLEAR_MATCH)
+    router.record(fast, 120.0, 40)
+    router.record(fast, 80.0, 20)
+
+    stats = router.stats()["routes"]
+    assert stats[FAST_ROUTE]["count"] == 2
+    assert stats[FAST_ROUTE]["avg_latency_ms"] == 100.0
+    assert stats[FAST_ROUTE]["avg_completion_tokens"] == 30.0
+    assert stats[FULL_ROUTE]["count"] == 0
+
+def main():
+    """Run all tests"""
+    print("Query Router Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_factual_lookups_take_fast_route,
+        test_complex_queries_take_full_route,
+        test_ambiguous_retrieval_takes_full_route,
+        test_routing_disabled,
+        test_route_stats
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
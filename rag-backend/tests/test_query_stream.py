@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for the streamed /query contract (Server-Sent Events)
+"""
+
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import app.main as main_module
+from models.schemas import QueryRequest
+from services.fake_llm import FakeLanguageModel
+from services.llm_providers import FakeProvider
+from services.llm_service import LLMService
+from services.session_store import InMemorySessionStore
+from services.simli_orchestrator import SimliOrchestrator
+
+class FakeVectorStore:
+    def get_generation(self):
+        return 1
+
+class FakeRetrieval:
+    """Returns one source, or fails like an unavailable vector store"""
+
+    def __init__(self, fail: bool = False):
+        self.vector_store = FakeVectorStore()
+        self.degraded = False
+        self.fail = fail
+
+    async def retrieve_scored_context(self, query, num_results=5, deadline=None):
+        if self.fail:
+            raise RuntimeError("vector store unavailable")
+        return "**Yaddo**\nSaratoga Springs, NY. Deadline: January 1.", [0.9]
+
+def _sse_events(retrieval: FakeRetrieval) -> list:
+    """Run a streamed query through the SSE encoder and parse the data lines"""
+    llm = LLMService(provider=FakeProvider(FakeLanguageModel(latency_ms=0, tokens_per_second=0, response_tokens=30)))
+    llm.cache = None
+    orchestrator = SimliOrchestrator(retrieval, llm, session_store=InMemorySessionStore())
+    orchestrator.single_flight = None
+    orchestrator.intents = None
+
+    async def collect():
+        lines = []
+        async for line in main_module._sse_query_events(QueryRequest(query="Tell me about Yaddo", stream=True)):
+            lines.append(line)
+        return lines
+
+    previous = main_module.simli_orchestrator
+    main_module.simli_orchestrator = orchestrator
+    try:
+        lines = asyncio.run(collect())
+    finally:
+        main_module.simli_orchestrator = previous
+
+    events = []
+    for line in lines:
+        assert line.startswith("data: ") and line.endswith("\n\n"), line
+        events.append(json.loads(line[len("data: "):]))
+    return events
+
+def test_tokens_then_single_done():
+    """Test token events arrive first and one terminal done carries sources and steps"""
+    print("\n=== Testing SSE Token Stream ===")
+    events = _sse_events(FakeRetrieval())
+    kinds = [event["type"] for event in events]
+    print(kinds[:3], "...", kinds[-2:])
+
+    assert kinds.count("done") == 1 and kinds[-1] == "done"
+    assert set(kinds[:-1]) == {"token"} and len(kinds) > 2
+    answer = "".join(event["content"] for event in events[:-1])
+    assert FakeLanguageModel.count_tokens(answer) == 30
+
+    done = events[-1]
+    print({key: done[key] for key in ("query", "confidence", "sources")})
+    assert done["query"] == "Tell me about Yaddo"
+    assert done["sources"] == ["Yaddo"]
+    steps = done["processing_steps"]
+    for step in ("retrieval_ms", "time_to_first_token_ms", "llm_generation_ms", "total_ms", "completion_tokens"):
+        assert step in steps, step
+    assert steps["completion_tokens"] == 30
+
+def test_failure_yields_error_event():
+    """Test a pipeline failure ends the stream with an error event instead of done"""
+    print("\n=== Testing SSE Error Event ===")
+    events = _sse_events(FakeRetrieval(fail=True))
+    print(events)
+    assert [event["type"] for event in events] == ["error"]
+    assert "vector store unavailable" in events[0]["message"]
+
+def main():
+    """Run all tests"""
+    print("Query Stream Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_tokens_then_single_done,
+        test_failure_yields_error_event
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test script for deadline-aware retries, hedging and completion timeouts
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.fake_llm import FakeLanguageModel
+from services.llm_providers import FakeProvider
+from services.llm_service import LLMService
+from services.resilience import Deadline, DeadlineExceeded, RetryPolicy
+from utils.config import settings
+
+class Flaky(Exception):
+    """Stand-in for a transient upstream error"""
+
+def test_deadline_expiry():
+    """Test a slow attempt is cut off at the deadline and an expired one never starts"""
+    print("\n=== Testing Deadline Expiry ===")
+    assert Deadline.after(0) is None and Deadline.after(None) is None
+    policy = RetryPolicy("test", retry_on=(Flaky,))
+    calls = []
+
+    async def slow():
+        calls.append(time.monotonic())
+        await asyncio.sleep(1)
+
+    async def run(deadline):
+        try:
+            await policy.run(slow, deadline)
+        except DeadlineExceeded as e:
+            return e
+        raise AssertionError("deadline did not fire")
+
+    start = time.monotonic()
+    error = asyncio.run(run(Deadline(0.05)))
+    elapsed = time.monotonic() - start
+    print(f"{error} after {elapsed * 1000:.0f}ms")
+    assert elapsed < 0.5 and len(calls) == 1
+
+    expired = Deadline(0)
+    assert expired.expired and expired.remaining() == 0
+    asyncio.run(run(expired))
+    assert len(calls) == 1
+    assert policy.counters["deadline_exceeded"] == 2
+
+def test_retry_stops_when_budget_is_too_small():
+    """Test retries happen while they fit and stop once backoff plus an attempt would not"""
+    print("\n=== Testing Retry Budget ===")
+    outcomes = []
+
+    def flaky_twice():
+        async def attempt():
+            outcomes.append("call")
+            if len(outcomes) <= 2:
+                raise Flaky()
+            return "ok"
+        return attempt()
+
+    policy = RetryPolicy("test", max_attempts=3, base_delay=0.01, max_delay=0.01, retry_on=(Flaky,))
+    assert asyncio.run(policy.run(flaky_twice, Deadline(5))) == "ok"
+    assert policy.counters["retries"] == 2 and policy.counters["attempts"] == 3
+
+    # A 1s minimum attempt never fits in a 0.5s deadline, so the first error is final
+    outcomes.clear()
+    tight = RetryPolicy(
+        "test", max_attempts=3, base_delay=0.01, max_delay=0.01,
+        min_attempt_budget=1.0, retry_on=(Flaky,)
+    )
+    try:
+        asyncio.run(tight.run(flaky_twice, Deadline(0.5)))
+        raise AssertionError("expected the error to surface")
+    except Flaky:
+        pass
+    print(f"Tight policy: {tight.counters}")
+    assert len(outcomes) == 1 and tight.counters["retries"] == 0
+
+    # Attempts run out before the deadline does
+    outcomes.clear()
+    capped = RetryPolicy("test", max_attempts=2, base_delay=0.01, max_delay=0.01, retry_on=(Flaky,))
+    try:
+        asyncio.run(capped.run(flaky_twice, Deadline(5)))
+        raise AssertionError("expected the error to surface")
+    except Flaky:
+        pass
+    assert len(outcomes) == 2
+
+def test_hedge_fires_after_p95_and_cancels_loser():
+    """Test a duplicate starts after the p95 delay, wins, and the stuck request is cancelled"""
+    print("\n=== Testing Hedging ===")
+    policy = RetryPolicy("test", hedge=True, hedge_min_delay=0.01, retry_on=(Flaky,))
+    for _ in range(policy.latency.min_samples):
+        policy.latency.record(0.05)
+    assert policy.latency.p95() == 0.05
+
+    started = []
+    cancelled = []
+
+    def call():
+        async def attempt():
+            index = len(started)
+            started.append(time.monotonic())
+            if index == 0:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(index)
+                    raise
+            return f"attempt {index}"
+        return attempt()
+
+    async def run():
+        result = await policy.run(call, Deadline(2))
+        # Let the cancelled primary observe its cancellation
+        await asyncio.sleep(0)
+        return result
+
+    result = asyncio.run(run())
+    hedge_delay = started[1] - started[0]
+    print(f"{result}, hedge after {hedge_delay * 1000:.0f}ms")
+    assert result == "attempt 1"
+    assert hedge_delay >= 0.045
+    assert cancelled == [0]
+    assert policy.counters["hedges"] == 1 and policy.counters["hedge_wins"] == 1
+
+    # Below the minimum sample count nothing is hedged
+    fresh = RetryPolicy("test", hedge=True, retry_on=(Flaky,))
+
+    async def quick():
+        return "done"
+
+    assert asyncio.run(fresh.run(quick)) == "done"
+    assert fresh.counters["hedges"] == 0
+
+def test_complete_generation_outlives_request_deadline():
+    """Test a long non-streamed answer is bounded by its own timeout, not the request deadline"""
+    print("\n=== Testing Completion Timeout ===")
+    model = FakeLanguageModel(latency_ms=0, tokens_per_second=400, response_tokens=80)
+    service = LLMService(provider=FakeProvider(model))
+    service.cache = None
+
+    async def run():
+        # The request deadline is long gone before the 0.2s answer finishes
+        return await service.generate_response(
+            "What is RAG?", "Context about RAG", stream=False, deadline=Deadline(0.05)
+        )
+
+    response = asyncio.run(run())
+    tokens = FakeLanguageModel.count_tokens(response.answer)
+    print(f"Answer tokens: {tokens}")
+    assert tokens == 80
+
+    timeout = service._completion_deadline(800)
+    expected = settings.COMPLETION_TIMEOUT_SECONDS + 800 / settings.COMPLETION_MIN_TOKENS_PER_SECOND
+    assert abs(timeout.budget - expected) < 1e-6
+    assert timeout.budget > settings.REQUEST_DEADLINE_SECONDS
+
+def main():
+    """Run all tests"""
+    print("Resilience Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_deadline_expiry,
+        test_retry_stops_when_budget_is_too_small,
+        test_hedge_fires_after_p95_and_cancels_loser,
+        test_complete_generation_outlives_request_deadline
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM response cache (LRU, TTL, disk tier and KB generations)
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.response_cache import ResponseCache
+
+def _key(text: str) -> str:
+    return ResponseCache.make_key("gpt-4o", [{"role": "user", "content": text}], {"temperature": 0.3})
+
+def test_make_key():
+    """Test keys depend on the prompt and parameters, not dict ordering"""
+    print("\n=== Testing Cache Keys ===")
+    messages = [{"role": "user", "content": "What is Yaddo?"}]
+    key = ResponseCache.make_key("gpt-4o", messages, {"temperature": 0.3, "max_tokens": 100})
+    assert key == ResponseCache.make_key("gpt-4o", messages, {"max_tokens": 100, "temperature": 0.3})
+    assert key != ResponseCache.make_key("gpt-4o-mini", messages, {"temperature": 0.3, "max_tokens": 100})
+    assert key != ResponseCache.make_key("gpt-4o", messages, {"temperature": 0.7, "max_tokens": 100})
+    assert key != _key("What is MacDowell?")
+
+def test_lru_eviction():
+    """Test the least recently used answer is dropped first"""
+    print("\n=== Testing LRU Eviction ===")
+    cache = ResponseCache(max_entries=2)
+    cache.put(_key("a"), "answer a")
+    cache.put(_key("b"), "answer b")
+    # Touch a so b becomes the oldest
+    assert cache.get(_key("a")) == "answer a"
+    cache.put(_key("c"), "answer c")
+
+    print(cache.stats())
+    assert cache.get(_key("b")) is None
+    assert cache.get(_key("a")) == "answer a" and cache.get(_key("c")) == "answer c"
+    assert cache.stats()["entries"] == 2
+
+    # Empty answers are never cached
+    cache.put(_key("d"), "")
+    assert cache.get(_key("d")) is None
+
+def test_ttl_expiry():
+    """Test answers older than the TTL are misses and get evicted"""
+    print("\n=== Testing TTL Expiry ===")
+    cache = ResponseCache(ttl_seconds=0.05)
+    cache.put(_key("a"), "answer a")
+    assert cache.get(_key("a")) == "answer a"
+    time.sleep(0.1)
+    assert cache.get(_key("a")) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.hits == 1 and cache.misses == 1
+
+def test_disk_tier_survives_restart():
+    """Test a new instance reads answers written atomically by an earlier one"""
+    print("\n=== Testing Disk Tier ===")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        ResponseCache(cache_dir=cache_dir).put(_key("a"), "answer a")
+
+        files = [str(path.relative_to(cache_dir)) for path in Path(cache_dir).rglob("*") if path.is_file()]
+        print(files)
+        assert files == [os.path.join(_key("a")[:2], f"{_key('a')}.json")]
+
+        restarted = ResponseCache(cache_dir=cache_dir)
+        assert restarted.get(_key("a")) == "answer a"
+        assert restarted.stats()["entries"] == 1
+
+        # A corrupt file is a miss, not an error
+        corrupt = Path(cache_dir, _key("b")[:2], f"{_key('b')}.json")
+        corrupt.parent.mkdir(exist_ok=True)
+        corrupt.write_text("{not json")
+        assert restarted.get(_key("b")) is None
+
+def test_generation_change_invalidates():
+    """Test re-ingesting the knowledge base drops memory and disk answers"""
+    print("\n=== Testing KB Generation Invalidation ===")
+    generation = [1]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResponseCache(cache_dir=cache_dir, generation_source=lambda: generation[0])
+        cache.put(_key("a"), "answer a")
+        assert cache.get(_key("a")) == "answer a"
+
+        generation[0] = 2
+        assert cache.get(_key("a")) is None
+        assert cache.stats()["generation"] == 2 and cache.stats()["entries"] == 0
+
+        # Another process on the new generation ignores the stale disk entry too
+        other = ResponseCache(cache_dir=cache_dir, generation_source=lambda: generation[0])
+        assert other.get(_key("a")) is None
+
+        # A failing source keeps the last known generation
+        def broken():
+            raise RuntimeError("vector store unavailable")
+
+        cache.put(_key("b"), "answer b")
+        cache.generation_source = broken
+        assert cache.get(_key("b")) == "answer b"
+
+def main():
+    """Run all tests"""
+    print("Response Cache Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_make_key,
+        test_lru_eviction,
+        test_ttl_expiry,
+        test_disk_tier_survives_restart,
+        test_generation_change_invalidates
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded in-memory session store
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.session_store import InMemorySessionStore
+
+def _add(store: InMemorySessionStore, session_id: str, n: int = 1):
+    """Append n turns to a session"""
+    for i in range(n):
+        asyncio.run(store.append_turn(session_id, f"q{i}", f"answer {i}", 0.81234, ["Yaddo"]))
+
+def test_history_shape_and_trim():
+    """Test that history keeps the last turns in the expected shape"""
+    print("\n=== Testing History ===")
+
+    store = InMemorySessionStore(max_turns=3, max_answer_chars=5)
+    _add(store, "s1", 5)
+
+    session = asyncio.run(store.get("s1"))
+    history = session["history"]
+    assert [turn["query"] for turn in history] == ["q2", "q3", "q4"]
+    assert history[-1]["response"] == "answe"
+    assert history[-1]["confidence"] == 0.812
+    assert history[-1]["sources"] == ["Yaddo"]
+    assert session["created_at"] <= history[0]["timestamp"]
+    print(f"Kept {len(history)} turns")
+
+def test_capacity_evicts_least_recently_used():
+    """Test that the session cap evicts the least recently used session"""
+    print("\n=== Testing Capacity Eviction ===")
+
+    store = InMemorySessionStore(max_sessions=2)
+    _add(store, "a")
+    _add(store, "b")
+    asyncio.run(store.get("a"))
+    _add(store, "c")
+
+    assert asyncio.run(store.get("b")) is None
+    assert asyncio.run(store.get("a")) is not None
+    stats = asyncio.run(store.stats())
+    assert stats["sessions"] == 2 and stats["evicted_capacity"] == 1
+    print(stats)
+
+def test_idle_sessions_expire():
+    """Test that idle sessions are dropped after the TTL"""
+    store = InMemorySessionStore(idle_ttl_seconds=0.05)
+    _add(store, "idle")
+    time.sleep(0.1)
+    _add(store, "active")
+
+    assert asyncio.run(store.get("idle")) is None
+    assert asyncio.run(store.get("active")) is not None
+    assert asyncio.run(store.stats())["evicted_idle"] == 1
+
+def test_delete():
+    """Test clearing a session"""
+    store = InMemorySessionStore()
+    _add(store, "s1")
+    asyncio.run(store.delete("s1"))
+    asyncio.run(store.delete("missing"))
+    assert asyncio.run(store.get("s1")) is None
+
+def main():
+    """Run all tests"""
+    print("Session Store Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_history_shape_and_trim,
+        test_capacity_evicts_least_recently_used,
+        test_idle_sessions_expire,
+        test_delete
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
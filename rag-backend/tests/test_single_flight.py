@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for coalescing identical concurrent queries
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.fake_llm import FakeLanguageModel
+from services.llm_providers import FakeProvider
+from services.llm_service import LLMService
+from services.session_store import InMemorySessionStore
+from services.simli_orchestrator import SimliOrchestrator
+from services.single_flight import SingleFlight
+from services.usage_tracker import track_usage
+
+class FakeVectorStore:
+    def get_generation(self):
+        return 1
+
+class FakeRetrieval:
+    """Slow enough for a second caller to join the first one's search"""
+
+    def __init__(self):
+        self.vector_store = FakeVectorStore()
+        self.degraded = False
+        self.searches = 0
+
+    async def retrieve_scored_context(self, query, num_results=5, deadline=None):
+        self.searches += 1
+        await asyncio.sleep(0.05)
+        return "Yaddo - Saratoga Springs, NY. Deadline: January 1.", [0.9]
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+def test_coalesced_callers_get_status_and_usage():
+    """Test both callers of a shared run get status frames and its token usage"""
+    print("\n=== Testing Coalesced Queries ===")
+
+    llm = LLMService(provider=FakeProvider(FakeLanguageModel(latency_ms=0, tokens_per_second=0, response_tokens=40)))
+    llm.cache = None
+    retrieval = FakeRetrieval()
+    orchestrator = SimliOrchestrator(retrieval, llm, session_store=InMemorySessionStore())
+    orchestrator.single_flight = SingleFlight()
+    orchestrator.intents = None
+
+    async def ask(websocket):
+        with track_usage("test_query") as usage:
+            response = await orchestrator.process_query("Tell me about Yaddo", websocket=websocket)
+            return response, usage
+
+    async def scenario():
+        sockets = [FakeWebSocket(), FakeWebSocket()]
+        first = asyncio.create_task(ask(sockets[0]))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(ask(sockets[1]))
+        return sockets, await first, await second
+
+    sockets, (leader, leader_usage), (follower, follower_usage) = asyncio.run(scenario())
+    assert retrieval.searches == 1 and orchestrator.single_flight.coalesced == 1
+
+    for websocket in sockets:
+        print(websocket.sent)
+        assert [m["message"] for m in websocket.sent] == ["Searching knowledge base...", "Generating response..."]
+
+    steps = leader.processing_steps, follower.processing_steps
+    print(steps)
+    assert steps[0]["coalesced"] == 0.0 and steps[1]["coalesced"] == 1.0
+    for step in steps:
+        assert step["completion_tokens"] > 0 and step["cost_usd"] > 0
+    assert steps[0]["completion_tokens"] == steps[1]["completion_tokens"]
+
+    # Spend is charged once; the follower records the tokens it did not spend
+    assert leader_usage.completion_tokens == steps[0]["completion_tokens"]
+    assert follower_usage.completion_tokens == 0 and follower_usage.tokens_saved > 0
+
+def test_coalesced_streams_share_usage():
+    """Test streamed subscribers are charged or credited per run, even after the leader leaves"""
+    print("\n=== Testing Coalesced Streams ===")
+
+    def orchestrator_with(tokens_per_second):
+        model = FakeLanguageModel(latency_ms=0, tokens_per_second=tokens_per_second, response_tokens=40)
+        llm = LLMService(provider=FakeProvider(model))
+        llm.cache = None
+        orchestrator = SimliOrchestrator(FakeRetrieval(), llm, session_store=InMemorySessionStore())
+        orchestrator.single_flight = SingleFlight()
+        orchestrator.intents = None
+        return orchestrator
+
+    async def listen(orchestrator, stop_after_tokens=None):
+        with track_usage("test_stream") as usage:
+            events = []
+            stream = orchestrator.stream_query("Tell me about Yaddo")
+            async for event in stream:
+                events.append(event)
+                if stop_after_tokens and len(events) == stop_after_tokens:
+                    # Client went away mid-answer
+                    await stream.aclose()
+                    break
+            return events, usage
+
+    async def scenario(orchestrator, stop_after_tokens=None):
+        first = asyncio.create_task(listen(orchestrator, stop_after_tokens))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(listen(orchestrator))
+        return await first, await second
+
+    orchestrator = orchestrator_with(0)
+    (leader_events, leader_usage), (follower_events, follower_usage) = asyncio.run(scenario(orchestrator))
+    assert orchestrator.single_flight.coalesced == 1
+    done = leader_events[-1], follower_events[-1]
+    steps = [event["processing_steps"] for event in done]
+    print(steps)
+    assert done[0]["type"] == done[1]["type"] == "done"
+    assert steps[0]["coalesced"] == 0.0 and steps[1]["coalesced"] == 1.0
+    assert steps[0]["completion_tokens"] == steps[1]["completion_tokens"] > 0
+    assert leader_usage.completion_tokens == steps[0]["completion_tokens"]
+    assert follower_usage.completion_tokens == 0 and follower_usage.tokens_saved > 0
+
+    # The leader disconnects after one token; the run finishes for the follower
+    orchestrator = orchestrator_with(400)
+    (leader_events, leader_usage), (follower_events, follower_usage) = asyncio.run(scenario(orchestrator, 1))
+    assert len(leader_events) == 1 and follower_events[-1]["type"] == "done"
+    assert leader_usage.completion_tokens == 0
+    assert follower_usage.completion_tokens == 0 and follower_usage.tokens_saved > 0
+
+def main():
+    """Run all tests"""
+    print("Single-Flight Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_coalesced_callers_get_status_and_usage,
+        test_coalesced_streams_share_usage
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
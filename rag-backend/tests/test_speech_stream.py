@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental speech segmentation
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.speech_stream import SpeechSegmenter, clean_for_speech
+
+SAMPLE_RESPONSE = (
+    "Yaddo is one of the oldest residencies in the US, founded in 1900. "
+    "The deadline is Jan. 5 for most disciplines! "
+    "See [the application page](https://yaddo.org/apply) or https://yaddo.org for details.\n\n"
+    "## Other options\n"
+    "- **MacDowell**: rolling deadlines\n"
+    "---\n"
+    "Good luck with your $3.5k budget"
+)
+
+def _segment(text: str, step: int, **kwargs) -> list:
+    """Feed text in fixed-size deltas and collect all segments"""
+    segmenter = SpeechSegmenter(**kwargs)
+    segments = []
+    for i in range(0, len(text), step):
+        segments.extend(segmenter.feed(text[i:i + step]))
+    segments.extend(segmenter.flush())
+    return segments
+
+def test_segments_independent_of_delta_size():
+    """Test that chunking of the token stream does not change the output"""
+    print("\n=== Testing Delta Size Independence ===")
+
+    # First-clause cuts depend on arrival timing, so compare sentences only
+    expected = _segment(SAMPLE_RESPONSE, len(SAMPLE_RESPONSE), first_clause_min_chars=None)
+    for step in (1, 2, 5, 13):
+        segments = _segment(SAMPLE_RESPONSE, step, first_clause_min_chars=None)
+        assert segments == expected, f"step={step}"
+
+    for segment in expected:
+        print(f"  - {segment}")
+
+def test_markdown_and_links_removed():
+    """Test that markdown, links and list markers never reach TTS"""
+    print("\n=== Testing Markdown Stripping ===")
+
+    segments = _segment(SAMPLE_RESPONSE, 3)
+    joined = " ".join(segments)
+
+    for marker in ("**", "##", "](", "http", "---"):
+        assert marker not in joined, marker
+    assert "See the application page or link in description for details." in segments
+    assert "MacDowell: rolling deadlines" in segments
+    assert "The deadline is Jan. 5 for most disciplines!" in segments
+    print(f"Cleaned {len(segments)} segments")
+
+def test_first_clause_first():
+    """Test that the first segment is cut at a clause boundary"""
+    print("\n=== Testing First Clause Scheduling ===")
+
+    segmenter = SpeechSegmenter(first_clause_min_chars=24)
+    first = segmenter.feed("Yaddo is one of the oldest residencies in the US, founded")
+    assert first == ["Yaddo is one of the oldest residencies in the US,"]
+
+    # Later clauses wait for the full sentence
+    assert segmenter.feed(" in 1900, and it is free, with meals") == []
+    print(f"First segment: {first[0]}")
+
+def test_first_clause_disabled():
+    """Test sentence-only segmentation when first-clause scheduling is off"""
+    segmenter = SpeechSegmenter(first_clause_min_chars=None)
+    assert segmenter.feed("Yaddo is one of the oldest residencies in the US, founded") == []
+
+def test_long_segment_split():
+    """Test that runaway sentences are split at whitespace"""
+    segmenter = SpeechSegmenter(first_clause_min_chars=None, max_segment_chars=40)
+    segments = segmenter.feed("word " * 20)
+    assert segments and all(len(s) <= 40 for s in segments)
+
+def test_clean_for_speech():
+    """Test single-segment cleaning"""
+    assert clean_for_speech("- **Deadline:** March 1") == "Deadline: March 1"
+    assert clean_for_speech("---") == ""
+    assert clean_for_speech("Visit www.example.org now.") == "Visit link in description now."
+
+def main():
+    """Run all tests"""
+    print("Speech Stream Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_segments_independent_of_delta_size,
+        test_markdown_and_links_removed,
+        test_first_clause_first,
+        test_first_clause_disabled,
+        test_long_segment_split,
+        test_clean_for_speech
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
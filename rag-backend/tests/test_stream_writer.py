@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for adaptive frame coalescing of streamed tokens
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.stream_writer import CoalescingWriter
+
+class Recorder:
+    """Frame sink with an optional per-send delay"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.frames = []
+
+    async def send(self, frame):
+        if self.fail:
+            raise ConnectionError("client gone")
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+async def _write_all(writer: CoalescingWriter, deltas, gap: float = 0.0):
+    async with writer:
+        for delta in deltas:
+            await writer.write(delta)
+            await asyncio.sleep(gap)
+    return writer
+
+def test_deltas_coalesced_without_loss():
+    """Test that fast deltas share frames and arrive intact and in order"""
+    print("\n=== Testing Coalescing ===")
+
+    sink = Recorder()
+    deltas = [f"word{i} " for i in range(60)]
+    asyncio.run(_write_all(CoalescingWriter(sink.send, window_ms=20, sentence_flush=False), deltas, gap=0.001))
+
+    print(f"{len(deltas)} deltas -> {len(sink.frames)} frames")
+    assert "".join(f["content"] for f in sink.frames) == "".join(deltas)
+    assert sink.frames[0]["content"] == "word0 "
+    assert len(sink.frames) < len(deltas) / 3
+    assert all(f["type"] == "stream_chunk" for f in sink.frames)
+
+def test_sentence_and_size_flush():
+    """Test that sentence ends and the byte threshold flush without waiting"""
+    sink = Recorder()
+    writer = CoalescingWriter(sink.send, frame={"type": "stream_chunk", "request_id": "r1"}, window_ms=10000, max_frame_bytes=10)
+
+    async def scenario():
+        async with writer:
+            for delta in ["Hi", " there", ".", " More", " words", " here"]:
+                await writer.write(delta)
+                await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    contents = [f["content"] for f in sink.frames]
+    print(contents)
+    assert contents[:3] == ["Hi", " there.", " More words"]
+    assert sink.frames[0]["request_id"] == "r1"
+
+def test_slow_client_widens_window():
+    """Test that slow sends widen the window, producing fewer frames"""
+    print("\n=== Testing Slow Client ===")
+
+    deltas = [f"w{i} " for i in range(40)]
+    fast, slow = Recorder(), Recorder(delay=0.05)
+    asyncio.run(_write_all(CoalescingWriter(fast.send, window_ms=5, sentence_flush=False), deltas, gap=0.005))
+    writer = asyncio.run(_write_all(CoalescingWriter(slow.send, window_ms=5, sentence_flush=False), deltas, gap=0.005))
+
+    print(f"fast: {len(fast.frames)} frames, slow: {len(slow.frames)} frames")
+    assert writer.window > writer.base_window
+    assert len(slow.frames) < len(fast.frames)
+    assert "".join(f["content"] for f in slow.frames) == "".join(deltas)
+
+def test_send_failure_reaches_producer():
+    """Test that a failed send is raised from the next write"""
+    async def scenario():
+        async with CoalescingWriter(Recorder(fail=True).send) as writer:
+            await writer.write("first")
+            await asyncio.sleep(0.01)
+            await writer.write("second")
+
+    try:
+        asyncio.run(scenario())
+    except ConnectionError:
+        return
+    raise AssertionError("send failure was swallowed")
+
+def main():
+    """Run all tests"""
+    print("Stream Writer Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_deltas_coalesced_without_loss,
+        test_sentence_and_size_flush,
+        test_slow_client_widens_window,
+        test_send_failure_reaches_producer
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Test script for stage-level tracing spans and the OTLP file exporter
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.fake_llm import FakeLanguageModel
+from services.llm_providers import FakeProvider
+from services.llm_service import LLMService
+from services.response_cache import ResponseCache
+from services.tracing import (
+    NOOP_SPAN, FileSpanExporter, RequestIdMiddleware,
+    current_request_id, span, start_span, trace_request, tracer
+)
+
+def test_spans_nest_under_the_request():
+    """Test parent links, request ids and that nothing is recorded outside a request"""
+    print("\n=== Testing Span Nesting ===")
+    tracer.reset()
+
+    with span("retrieval") as outside:
+        assert outside is NOOP_SPAN
+
+    with trace_request("POST /query", request_id="abc123") as root:
+        assert current_request_id.get() == "abc123"
+        with span("retrieval", num_results=5) as retrieval:
+            with span("vector_store.query") as query:
+                pass
+        generation = start_span("llm.generate", model="fast")
+        first_token = start_span("llm.first_token", parent=generation)
+        first_token.end()
+        generation.end()
+
+    assert current_request_id.get() is None
+    assert root.attributes["request.id"] == "abc123"
+    assert retrieval.parent_id == root.span_id and query.parent_id == retrieval.span_id
+    assert first_token.parent_id == generation.span_id and generation.parent_id == root.span_id
+    assert {s.trace_id for s in (retrieval, query, generation, first_token)} == {root.trace_id}
+
+    stages = tracer.latency()["stages"]
+    print(sorted(stages))
+    assert sorted(stages) == ["POST /query", "llm.first_token", "llm.generate", "retrieval", "vector_store.query"]
+    assert all(stage["count"] == 1 for stage in stages.values())
+
+def test_errors_and_cancellation():
+    """Test failed spans are counted as errors and cancelled ones are only marked"""
+    tracer.reset()
+
+    async def cancelled():
+        with trace_request("ws.query"):
+            with span("retrieval") as retrieval:
+                await asyncio.sleep(1)
+        return retrieval
+
+    async def scenario():
+        task = asyncio.create_task(cancelled())
+        await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    try:
+        with trace_request("POST /query"):
+            with span("llm.generate"):
+                raise RuntimeError("upstream down")
+    except RuntimeError:
+        pass
+
+    stages = tracer.latency()["stages"]
+    assert stages["retrieval"]["errors"] == 0 and stages["retrieval"]["count"] == 1
+    assert stages["llm.generate"]["errors"] == 1
+
+def test_latency_percentiles():
+    """Test per-stage percentiles over the recent window"""
+    print("\n=== Testing Latency Percentiles ===")
+    tracer.reset()
+
+    with trace_request("POST /query") as root:
+        for ms in range(1, 101):
+            child = start_span("retrieval.rerank", parent=root)
+            child.end()
+            # Durations are measured; pin them for a deterministic check
+            tracer._durations["retrieval.rerank"][-1] = float(ms)
+
+    rerank = tracer.latency()["stages"]["retrieval.rerank"]
+    print(rerank)
+    assert rerank["count"] == 100
+    assert (rerank["p50_ms"], rerank["p95_ms"], rerank["max_ms"]) == (51.0, 96.0, 100.0)
+
+def test_file_exporter_writes_otlp_json():
+    """Test finished spans are written as OTLP/JSON resourceSpans lines"""
+    print("\n=== Testing OTLP File Export ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traces", "spans.jsonl")
+        exporter = FileSpanExporter(path, service_name="rag-test")
+        tracer.exporter = exporter
+        try:
+            with trace_request("POST /query", request_id="r-1"):
+                with span("retrieval", num_results=3, cached=False):
+                    pass
+        finally:
+            tracer.exporter = None
+            exporter.shutdown()
+
+        with open(path) as f:
+            requests = [json.loads(line) for line in f]
+
+    spans = [s for r in requests for scope in r["resourceSpans"][0]["scopeSpans"] for s in scope["spans"]]
+    resource = requests[0]["resourceSpans"][0]["resource"]["attributes"]
+    assert resource == [{"key": "service.name", "value": {"stringValue": "rag-test"}}]
+    assert [s["name"] for s in spans] == ["retrieval", "POST /query"]
+
+    retrieval, root = spans
+    assert retrieval["parentSpanId"] == root["spanId"] and "parentSpanId" not in root
+    assert retrieval["traceId"] == root["traceId"] and len(root["traceId"]) == 32
+    assert {"key": "num_results", "value": {"intValue": "3"}} in retrieval["attributes"]
+    assert {"key": "cached", "value": {"boolValue": False}} in retrieval["attributes"]
+    assert int(root["endTimeUnixNano"]) >= int(retrieval["endTimeUnixNano"])
+    assert exporter.exported == 2 and exporter.dropped == 0
+
+def test_request_id_middleware():
+    """Test client ids are kept, missing ones generated, and both echoed"""
+    print("\n=== Testing Request Id Middleware ===")
+
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(current_request_id.get())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def call(headers):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await RequestIdMiddleware(app)({"type": "http", "headers": headers}, None, send)
+        return dict(sent[0]["headers"])[b"x-request-id"].decode()
+
+    assert asyncio.run(call([(b"x-request-id", b"client-42")])) == "client-42"
+    generated = asyncio.run(call([]))
+    assert len(generated) == 16 and seen == ["client-42", generated]
+
+def test_llm_cache_hits_are_visible():
+    """Test cached answers mark the enclosing span and processing_steps, for complete and streamed calls"""
+    print("\n=== Testing Cache Hit Tracing ===")
+    tracer.reset()
+
+    service = LLMService(provider=FakeProvider(FakeLanguageModel(latency_ms=0, tokens_per_second=0, response_tokens=20)))
+    service.cache = ResponseCache()
+
+    async def scenario():
+        await service.generate_response("What is Yaddo?", "context")
+        with trace_request("POST /query") as root:
+            response = await service.generate_response("What is Yaddo?", "context")
+
+        steps = {}
+        with trace_request("POST /query", stream=True) as stream_root:
+            async for _ in service.stream_response("What is Yaddo?", "context", processing_steps=steps):
+                pass
+        return root, response, stream_root, steps
+
+    root, response, stream_root, steps = asyncio.run(scenario())
+    assert response.processing_steps["llm_cache_hit"] == 1.0
+    assert root.attributes["llm.cache_hit"] is True
+    assert steps["llm_cache_hit"] == 1.0 and stream_root.attributes["llm.cache_hit"] is True
+    # The complete hit adds no empty llm.generate span; the streamed replay keeps its own
+    assert tracer.latency()["stages"]["llm.generate"]["count"] == 1
+
+def main():
+    """Run all tests"""
+    print("Tracing Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_spans_nest_under_the_request,
+        test_errors_and_cancellation,
+        test_latency_percentiles,
+        test_file_exporter_writes_otlp_json,
+        test_request_id_middleware,
+        test_llm_cache_hits_are_visible
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test script for the upstream governor's priority queue, rate buckets and leases
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.upstream_governor import Priority, TokenBucket, UpstreamGovernor, upstream_priority
+
+async def _hold(governor: UpstreamGovernor, release: asyncio.Event, **kwargs):
+    """Take a slot and keep it until release is set"""
+    async with governor.acquire(**kwargs):
+        await release.wait()
+
+def test_priority_ordering():
+    """Test queued voice calls are served before interactive and ingest ones"""
+    print("\n=== Testing Priority Ordering ===")
+
+    async def run():
+        governor = UpstreamGovernor(max_concurrency=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(governor, release))
+        await asyncio.sleep(0)
+        order = []
+
+        async def call(name, priority):
+            async with governor.acquire(priority=priority):
+                order.append(name)
+
+        async def call_from_context(name, priority):
+            with upstream_priority(priority):
+                async with governor.acquire():
+                    order.append(name)
+
+        waiters = [
+            asyncio.create_task(call("ingest", Priority.INGEST)),
+            asyncio.create_task(call("interactive", Priority.INTERACTIVE)),
+            asyncio.create_task(call_from_context("voice", Priority.VOICE)),
+            asyncio.create_task(call("ingest-2", Priority.INGEST))
+        ]
+        await asyncio.sleep(0.01)
+        assert governor.stats()["queue_depth"] == {"voice": 1, "interactive": 1, "ingest": 2}
+
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return order, governor
+
+    order, governor = asyncio.run(run())
+    print(f"Served: {order}")
+    assert order == ["voice", "interactive", "ingest", "ingest-2"]
+    assert governor.in_flight == 0 and governor.granted == 5
+
+def test_rate_buckets_throttle():
+    """Test the RPM and TPM buckets hold calls back until they refill"""
+    print("\n=== Testing RPM/TPM Throttling ===")
+
+    async def timed_calls(governor, tokens):
+        grants = []
+        for _ in range(2):
+            async with governor.acquire(tokens=tokens):
+                grants.append(time.monotonic())
+        return grants[1] - grants[0]
+
+    # 6000 RPM with a burst of one: the second request waits ~10ms
+    rpm = UpstreamGovernor(max_concurrency=4)
+    rpm.rpm_bucket = TokenBucket(6000, burst=1)
+    gap = asyncio.run(timed_calls(rpm, 0))
+    print(f"RPM gap: {gap * 1000:.1f}ms")
+    assert gap >= 0.008 and rpm.throttled >= 1
+
+    # 60000 TPM with a 100-token burst: a second 100-token call waits ~100ms
+    tpm = UpstreamGovernor(max_concurrency=4)
+    tpm.tpm_bucket = TokenBucket(60000, burst=100)
+    gap = asyncio.run(timed_calls(tpm, 100))
+    print(f"TPM gap: {gap * 1000:.1f}ms")
+    assert gap >= 0.09 and tpm.throttled >= 1
+
+    # Without buckets nothing is throttled
+    free = UpstreamGovernor(max_concurrency=4)
+    assert asyncio.run(timed_calls(free, 100)) < 0.05 and free.throttled == 0
+
+def test_cancelled_waiter_releases_slot():
+    """Test a cancelled waiter leaves the queue and never leaks a slot"""
+    print("\n=== Testing Cancelled Waiters ===")
+
+    async def run():
+        governor = UpstreamGovernor(max_concurrency=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(governor, release))
+        await asyncio.sleep(0)
+
+        # Cancelled while queued
+        waiter = asyncio.create_task(_hold(governor, asyncio.Event()))
+        await asyncio.sleep(0.01)
+        assert governor.stats()["queue_depth"]["interactive"] == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert governor.stats()["queue_depth"]["interactive"] == 0
+
+        # Cancelled once the slot has been granted to it
+        raced = asyncio.create_task(_hold(governor, asyncio.Event()))
+        await asyncio.sleep(0.01)
+        release.set()
+        await holder
+        assert governor.in_flight == 1
+        raced.cancel()
+        await asyncio.gather(raced, return_exceptions=True)
+        assert governor.in_flight == 0
+
+        # The slot is free for the next caller
+        async with governor.acquire():
+            assert governor.in_flight == 1
+        return governor
+
+    governor = asyncio.run(run())
+    print(f"Stats: {governor.stats()['in_flight']} in flight, {governor.granted} granted")
+    assert governor.in_flight == 0
+
+def test_lease_reconcile():
+    """Test reconcile refunds an overestimate and debits an overrun"""
+    print("\n=== Testing Lease Reconcile ===")
+
+    async def run():
+        governor = UpstreamGovernor(max_concurrency=4, tokens_per_minute=1000)
+        async with governor.acquire(tokens=400) as lease:
+            after_reserve = governor.tpm_bucket.level
+            lease.reconcile(100)
+            refunded = governor.tpm_bucket.level
+        async with governor.acquire(tokens=100) as lease:
+            before_overrun = governor.tpm_bucket.level
+            lease.reconcile(500)
+            debited = governor.tpm_bucket.level
+            assert lease.tokens == 500
+            # Settling twice changes nothing
+            lease.reconcile(500)
+            assert governor.tpm_bucket.level - debited < 1
+        return after_reserve, refunded, before_overrun, debited
+
+    after_reserve, refunded, before_overrun, debited = asyncio.run(run())
+    print(f"Levels: {after_reserve:.0f} -> {refunded:.0f}, {before_overrun:.0f} -> {debited:.0f}")
+    assert abs(after_reserve - 600) < 1 and abs(refunded - 900) < 1
+    assert abs(before_overrun - 800) < 1 and abs(debited - 400) < 1
+
+    # No TPM bucket: reconcile is a no-op
+    governor = UpstreamGovernor(max_concurrency=1)
+
+    async def unbudgeted():
+        async with governor.acquire(tokens=10) as lease:
+            lease.reconcile(50)
+            return lease.tokens
+
+    assert asyncio.run(unbudgeted()) == 10
+
+def main():
+    """Run all tests"""
+    print("Upstream Governor Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_priority_ordering,
+        test_rate_buckets_throttle,
+        test_cancelled_waiter_releases_slot,
+        test_lease_reconcile
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
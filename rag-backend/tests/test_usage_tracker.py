@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for per-request token, cost and latency accounting
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.llm_providers import TokenUsage
+from services.usage_tracker import (
+    RequestUsage, UsageStats, current_usage, estimate_cost,
+    record_chat_usage, track_usage, usage_stats
+)
+
+def test_estimate_cost():
+    """Test per-model pricing, dated snapshots and discounted cached input"""
+    print("\n=== Testing Cost Estimates ===")
+    assert estimate_cost("gpt-4o", 1_000_000) == 2.50
+    assert estimate_cost("gpt-4o", 0, 1_000_000) == 10.00
+
+    # Dated snapshots use the longest matching name, so mini is not priced as gpt-4o
+    assert estimate_cost("gpt-4o-2024-08-06", 1_000_000) == 2.50
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000) == 0.15
+
+    # Cached prompt tokens are billed at the cached rate, the rest at the input rate
+    cost = estimate_cost("gpt-4o", 1000, completion_tokens=200, cached_tokens=400)
+    expected = (600 * 2.50 + 400 * 1.25 + 200 * 10.00) / 1_000_000
+    print(f"gpt-4o with cache: ${cost:.6f}")
+    assert abs(cost - expected) < 1e-12
+    assert estimate_cost("gpt-4o", 100, cached_tokens=500) == 500 * 1.25 / 1_000_000
+
+    assert estimate_cost("text-embedding-3-small", 1_000_000) == 0.02
+    assert estimate_cost("some-local-model", 1_000_000, 1_000_000) == 0.0
+
+def test_track_usage_marks_cancelled():
+    """Test cancelled tasks and closed generators are recorded as cancelled"""
+    print("\n=== Testing Cancelled Requests ===")
+
+    async def cancelled_request():
+        ready = asyncio.Event()
+        usages = []
+
+        async def request():
+            with track_usage("test_cancelled_task") as usage:
+                usages.append(usage)
+                record_chat_usage("gpt-4o", TokenUsage(prompt_tokens=100, completion_tokens=5))
+                ready.set()
+                await asyncio.sleep(5)
+
+        task = asyncio.create_task(request())
+        await ready.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return usages[0]
+
+    usage = asyncio.run(cancelled_request())
+    assert usage.cancelled and usage.finished is not None
+    assert usage.prompt_tokens == 100
+
+    async def events():
+        with track_usage("test_closed_stream"):
+            for i in range(10):
+                yield i
+
+    async def disconnect():
+        stream = events()
+        assert await stream.__anext__() == 0
+        await stream.aclose()
+
+    asyncio.run(disconnect())
+    assert current_usage.get() is None
+
+    with track_usage("test_completed") as completed:
+        pass
+    assert not completed.cancelled
+
+    stats = usage_stats.stats()
+    print({name: stats[name]["cancelled"] for name in ("test_cancelled_task", "test_closed_stream", "test_completed")})
+    assert stats["test_cancelled_task"]["cancelled"] == 1
+    assert stats["test_cancelled_task"]["prompt_tokens"] == 100
+    assert stats["test_closed_stream"]["cancelled"] == 1
+    assert stats["test_completed"]["cancelled"] == 0
+
+def test_usage_stats_percentiles():
+    """Test latency percentiles per endpoint, leaving cancelled requests out"""
+    print("\n=== Testing Usage Percentiles ===")
+    stats = UsageStats()
+    for latency in range(1, 101):
+        usage = RequestUsage("query")
+        usage.first_token_ms = latency / 2
+        usage.completion_tokens = 50
+        usage.generation_seconds = 1.0
+        stats.record(usage, float(latency))
+
+    abandoned = RequestUsage("query")
+    abandoned.cancelled = True
+    stats.record(abandoned, 10_000.0)
+
+    query = stats.stats()["query"]
+    print(query["latency_ms"], query["first_token_ms"])
+    assert query["requests"] == 101 and query["cancelled"] == 1
+    assert query["latency_ms"] == {"p50": 51.0, "p95": 96.0, "max": 100.0}
+    assert query["first_token_ms"] == {"p50": 25.5, "p95": 48.0}
+    assert query["avg_tokens_per_second"] == 50.0
+    assert query["completion_tokens"] == 5000
+
+    # The window keeps only the most recent samples
+    windowed = UsageStats(window=10)
+    for latency in range(1, 101):
+        windowed.record(RequestUsage("query"), float(latency))
+    assert windowed.stats()["query"]["latency_ms"]["p50"] == 96.0
+
+    assert UsageStats().stats() == {}
+
+def main():
+    """Run all tests"""
+    print("Usage Tracker Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_estimate_cost,
+        test_track_usage_marks_cancelled,
+        test_usage_stats_percentiles
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
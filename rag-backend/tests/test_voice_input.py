@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming voice input: VAD, stub STT and speculative retrieval
+"""
+
+import sys
+import json
+import base64
+import asyncio
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.voice_input import EnergyVAD, StubSTTProvider, VoiceTurn, SPEECH_START, END_OF_TURN
+from services.ws_connection import SimliConnection, ws_stats
+
+RATE = 16000
+
+def tone(ms: int, amplitude: float = 0.3) -> bytes:
+    """A 220 Hz tone as 16-bit PCM"""
+    t = np.arange(RATE * ms // 1000) / RATE
+    return (np.sin(2 * np.pi * 220 * t) * amplitude * 32767).astype("<i2").tobytes()
+
+def silence(ms: int) -> bytes:
+    return bytes(RATE * ms // 1000 * 2)
+
+def chunks(pcm: bytes, size: int = 1234):
+    """Odd-sized chunks, so frames straddle chunk boundaries"""
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+def test_vad_detects_speech_and_end_of_turn():
+    """Test speech start and end-of-turn across arbitrary chunk sizes"""
+    print("\n=== Testing VAD ===")
+
+    vad = EnergyVAD(sample_rate=RATE, end_of_turn_ms=400)
+    events = []
+    for chunk in chunks(silence(200) + tone(500) + silence(200) + tone(100) + silence(500)):
+        events.extend(vad.process(chunk))
+    print(events)
+    # The 200 ms pause is shorter than the end-of-turn silence
+    assert events == [SPEECH_START, END_OF_TURN]
+
+    quiet = EnergyVAD(sample_rate=RATE)
+    assert quiet.process(tone(500, amplitude=0.001)) == []
+
+def test_stub_stt_reveals_words_as_audio_arrives():
+    """Test partial transcripts grow with audio and finish with the full text"""
+    async def scenario():
+        stream = await StubSTTProvider(words_per_second=4).open_stream(RATE, hint="what grants are open now")
+        partials = [await stream.feed(tone(250)) for _ in range(6)]
+        partials.append(await stream.feed(silence(1000)))
+        return partials, await stream.finish()
+
+    partials, final = asyncio.run(scenario())
+    print(partials)
+    assert partials[:3] == ["what", "what grants", "what grants are"]
+    assert partials[5:] == [None, None]
+    assert final == "what grants are open now"
+
+def test_prefetch_reused_only_when_final_matches():
+    """Test speculative retrieval is used only when the final transcript has its keywords"""
+    print("\n=== Testing Speculative Retrieval ===")
+
+    async def turn(hint: str, final_override: str = None):
+        calls = []
+
+        async def prefetch(partial):
+            calls.append(partial)
+            return (f"context for {partial}", [0.9])
+
+        stream = await StubSTTProvider(words_per_second=10).open_stream(RATE, hint=hint)
+        voice = VoiceTurn(stream, EnergyVAD(sample_rate=RATE), prefetch=prefetch, prefetch_min_words=3)
+        for chunk in chunks(tone(1000), size=1600):
+            await voice.feed(chunk)
+            await asyncio.sleep(0)
+        if final_override is not None:
+            voice.stt._words = final_override.split()
+        result = await voice.finish()
+        await voice.close()
+        return calls, result
+
+    calls, (final, prefetched) = asyncio.run(turn("tell me about open residencies in berlin"))
+    print(calls)
+    # Restarted on each new keyword; "in" alone changes nothing
+    assert calls == [
+        "tell me about",
+        "tell me about open",
+        "tell me about open residencies",
+        "tell me about open residencies in berlin"
+    ]
+    assert final == "tell me about open residencies in berlin"
+    assert prefetched == ("context for tell me about open residencies in berlin", [0.9])
+
+    # Same keywords, different casing and filler: still the same question
+    _, (_, prefetched) = asyncio.run(turn("tell me about open residencies in berlin", "Tell me about the open residencies in Berlin."))
+    assert prefetched == ("context for tell me about open residencies in berlin", [0.9])
+
+    # One content word only in the final transcript changes what is asked
+    _, (_, prefetched) = asyncio.run(turn("which residencies accept", "which residencies accept sculptors"))
+    assert prefetched is None
+
+    # The recogniser revised the ending: the prefetch no longer applies
+    _, (_, prefetched) = asyncio.run(turn("tell me about open residencies in berlin", "tell me about grants instead"))
+    assert prefetched is None
+
+class FakeWebSocket:
+    """Client side of a connection: scripted inbound messages, recorded frames"""
+
+    def __init__(self):
+        self.inbound: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+
+    async def receive(self):
+        message = await self.inbound.get()
+        if message is None:
+            return {"type": "websocket.disconnect", "code": 1000}
+        return {"type": "websocket.receive", "text": json.dumps(message)}
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+class VoiceOrchestrator:
+    """Speaks the transcript back, recording prefetches and answered turns"""
+
+    def __init__(self):
+        self.prefetched = []
+        self.answered = []
+
+    async def prefetch_context(self, query, session_id=None):
+        self.prefetched.append(query)
+        return ("ctx", [0.8])
+
+    async def handle_voice_query(self, transcript, session_id=None, prefetched=None):
+        self.answered.append((transcript, prefetched))
+        yield {"type": "speech", "text": f"You asked: {transcript}.", "index": 0}
+        yield {"type": "done", "query": transcript, "confidence": 0.9, "sources": [], "processing_steps": {}}
+
+def test_voice_turn_over_websocket():
+    """Test audio in, partial and final transcripts, then the spoken answer"""
+    print("\n=== Testing Voice Over WebSocket ===")
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        orchestrator = VoiceOrchestrator()
+        connection = SimliConnection(websocket, orchestrator, stt_provider=StubSTTProvider(words_per_second=8))
+        server = asyncio.create_task(connection.run())
+
+        await websocket.inbound.put({"type": "audio_start", "sample_rate": RATE, "transcript": "which residencies fund sculptors"})
+        for chunk in chunks(tone(700) + silence(700), size=3200):
+            await websocket.inbound.put({"type": "audio", "data": base64.b64encode(chunk).decode()})
+        await asyncio.sleep(0.2)
+        await websocket.inbound.put(None)
+        await server
+        return websocket, orchestrator
+
+    websocket, orchestrator = asyncio.run(scenario())
+    kinds = [(m["type"], m.get("event") or m.get("final")) for m in websocket.sent]
+    print(kinds)
+    assert kinds[0] == ("listening", None)
+    assert ("vad", SPEECH_START) in kinds and ("vad", END_OF_TURN) in kinds
+
+    final = [m for m in websocket.sent if m["type"] == "transcript" and m["final"]][0]
+    assert final["text"] == "which residencies fund sculptors" and final["prefetched"]
+    # Earlier prefetches may be cancelled before they start; the last one has every keyword
+    assert orchestrator.prefetched[-1] == "which residencies fund sculptors"
+    assert orchestrator.answered == [("which residencies fund sculptors", ("ctx", [0.8]))]
+
+    spoken = [m for m in websocket.sent if m["type"] in ("speech", "speech_complete")]
+    assert [m["type"] for m in spoken] == ["speech", "speech_complete"]
+    assert all(m["request_id"] == final["request_id"] for m in spoken)
+
+class FailingVoiceOrchestrator(VoiceOrchestrator):
+    """Speaks slowly, then ends the answer with an error event"""
+
+    async def handle_voice_query(self, transcript, session_id=None, prefetched=None):
+        self.answered.append((transcript, prefetched))
+        yield {"type": "speech", "text": "Let me check.", "index": 0}
+        await asyncio.sleep(0.1)
+        yield {"type": "error", "message": "generation failed"}
+
+def test_voice_turns_limited_and_errors_counted():
+    """Test voice turns obey max_in_flight and a stream ending in error is not counted as completed"""
+    print("\n=== Testing Voice Turn Limits ===")
+
+    async def scenario():
+        websocket = FakeWebSocket()
+        orchestrator = FailingVoiceOrchestrator()
+        connection = SimliConnection(
+            websocket,
+            orchestrator,
+            max_in_flight=1,
+            barge_in=False,
+            stt_provider=StubSTTProvider(words_per_second=8)
+        )
+        server = asyncio.create_task(connection.run())
+
+        await websocket.inbound.put({"type": "audio_start", "sample_rate": RATE, "transcript": "which residencies fund sculptors"})
+        for _ in range(2):
+            await websocket.inbound.put({"type": "audio", "data": base64.b64encode(tone(600)).decode()})
+            await websocket.inbound.put({"type": "audio_end"})
+        await asyncio.sleep(0.3)
+        await websocket.inbound.put(None)
+        await server
+        return websocket, orchestrator
+
+    completed, failed, rejected = ws_stats.completed, ws_stats.failed, ws_stats.rejected
+    websocket, orchestrator = asyncio.run(scenario())
+    errors = [m for m in websocket.sent if m["type"] == "error"]
+    print(errors)
+    assert len(orchestrator.answered) == 1
+    assert any(m["message"] == "Too many queries in flight (limit 1)" for m in errors)
+    assert any(m["message"] == "generation failed" for m in errors)
+    assert ws_stats.rejected == rejected + 1
+    assert ws_stats.failed == failed + 1 and ws_stats.completed == completed
+
+def main():
+    """Run all tests"""
+    print("Voice Input Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_vad_detects_speech_and_end_of_turn,
+        test_stub_stt_reveals_words_as_audio_arrives,
+        test_prefetch_reused_only_when_final_matches,
+        test_voice_turn_over_websocket,
+        test_voice_turns_limited_and_errors_counted
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for the startup warm-up steps
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services.warmup import Warmup, WarmupReport
+
+class FakeProvider:
+    name = "fake"
+
+    def __init__(self):
+        self.warmed = 0
+
+    async def warm(self):
+        self.warmed += 1
+
+class FakeVectorStore:
+    def __init__(self, chunks: int):
+        self.provider = FakeProvider()
+        self.text_processor = SimpleNamespace(count_tokens=lambda text: len(text.split()))
+        self.collection = SimpleNamespace(count=lambda: chunks)
+        self.searches = []
+
+    async def search(self, query, num_results=5):
+        self.searches.append(query)
+        return [{"id": "a", "score": 0.9}][:num_results]
+
+class FakeSessions:
+    async def stats(self):
+        return {"backend": "memory"}
+
+class FakeOrchestrator:
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.sessions = FakeSessions()
+        self.delay = delay
+        self.error = error
+        self.queries = []
+
+    async def process_query(self, query, stream=False):
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(answer="Several residencies fund painters.", confidence=0.81234)
+
+def test_all_steps_run_and_report_durations():
+    """Test each step runs once, in order, with its duration recorded"""
+    print("\n=== Testing Warm-up Steps ===")
+
+    vector_store, orchestrator = FakeVectorStore(chunks=12), FakeOrchestrator()
+    warmup = Warmup(vector_store, orchestrator, query="painting residencies", report=WarmupReport())
+    report = asyncio.run(warmup.run()).stats()
+    print(report)
+
+    assert report["completed"] and report["ok"]
+    assert list(report["steps"]) == ["tokenizer", "connections", "vector_index", "synthetic_query"]
+    assert all(step["duration_ms"] >= 0 for step in report["steps"].values())
+    assert vector_store.provider.warmed == 1
+    assert vector_store.searches == ["painting residencies"] == orchestrator.queries
+    assert report["steps"]["vector_index"]["chunks"] == 12
+    assert report["steps"]["synthetic_query"]["confidence"] == 0.812
+
+def test_failures_are_recorded_not_fatal():
+    """Test a failing or slow step is reported and the rest still run"""
+    print("\n=== Testing Warm-up Failures ===")
+
+    vector_store = FakeVectorStore(chunks=0)
+    slow = Warmup(
+        vector_store,
+        FakeOrchestrator(delay=1.0),
+        steps=["vector_index", "synthetic_query", "connections"],
+        query="q",
+        step_timeout=0.05,
+        report=WarmupReport()
+    )
+    report = asyncio.run(slow.run()).stats()
+    print(report)
+    assert report["completed"] and not report["ok"]
+    assert report["steps"]["vector_index"]["skipped"] == "empty collection"
+    assert report["steps"]["synthetic_query"]["error"] == "timed out"
+    assert report["steps"]["connections"]["ok"]
+    assert vector_store.searches == []
+
+    failing = Warmup(vector_store, FakeOrchestrator(error=RuntimeError("no key")), steps=["synthetic_query", "bogus"], report=WarmupReport())
+    report = asyncio.run(failing.run()).stats()
+    assert report["steps"]["synthetic_query"]["error"] == "RuntimeError: no key"
+    assert "bogus" not in report["steps"]
+
+def main():
+    """Run all tests"""
+    print("Warm-up Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_all_steps_run_and_report_durations,
+        test_failures_are_recorded_not_fatal
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Test script for leader election and generation following across workers
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from services import llm_providers
+from services.fake_llm import FakeLanguageModel
+from services.llm_providers import FakeProvider
+from services.vector_store import VectorStoreService
+from services.worker_coordinator import FileLeaderElection, LeaderElection, WorkerCoordinator, worker_id
+from utils.config import settings
+
+# Another worker adding a chunk to the shared index
+WRITER = """
+import sys, chromadb
+client = chromadb.PersistentClient(path=sys.argv[1])
+collection = client.get_or_create_collection("art_grants_residencies")
+collection.add(ids=["written_by_leader"], documents=["Yaddo residency"], embeddings=[[0.1] * 8])
+"""
+
+class FakeVectorStore:
+    """Shared KB generation, as the leader publishes it on disk"""
+
+    published = {"generation": 0}
+
+    def __init__(self):
+        self.reloads = 0
+
+    def get_generation(self):
+        return self.published["generation"]
+
+    async def reload(self):
+        self.reloads += 1
+
+class LeaseElection(LeaderElection):
+    """Leadership that lapses when the test says the lease expired"""
+
+    backend = "lease"
+
+    def __init__(self):
+        super().__init__()
+        self.lease_valid = True
+
+    async def try_acquire(self) -> bool:
+        self.is_leader = self.lease_valid
+        return self.is_leader
+
+    async def renew(self) -> bool:
+        self.is_leader = self.is_leader and self.lease_valid
+        return self.is_leader
+
+def test_file_lock_elects_one_leader():
+    """Test only one holder of the lock file leads, and a follower takes over"""
+    print("\n=== Testing File Election ===")
+
+    async def scenario():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index", "leader.lock")
+            first, second = FileLeaderElection(path), FileLeaderElection(path)
+
+            assert await first.try_acquire()
+            assert not await second.try_acquire()
+            assert await second.current_leader() == worker_id()
+
+            await first.release()
+            assert await second.try_acquire() and second.is_leader
+            await second.release()
+
+    asyncio.run(scenario())
+
+def test_follower_reloads_and_takes_over():
+    """Test followers reload on new generations and run leader duties once elected"""
+    print("\n=== Testing Worker Coordination ===")
+
+    async def scenario():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "leader.lock")
+            FakeVectorStore.published["generation"] = 3
+            events = []
+
+            async def lead(name):
+                events.append(f"{name} elected")
+
+            workers = {}
+            for name in ("a", "b"):
+                workers[name] = WorkerCoordinator(
+                    FileLeaderElection(path),
+                    FakeVectorStore(),
+                    on_elected=lambda name=name: lead(name),
+                    on_demoted=lambda name=name: events.append(f"{name} demoted"),
+                    poll_interval=0.01
+                )
+                await workers[name].start()
+            a, b = workers["a"], workers["b"]
+            assert (a.role, b.role) == ("leader", "follower")
+
+            # The leader publishes a new generation; the follower reopens its index
+            FakeVectorStore.published["generation"] = 4
+            await asyncio.sleep(0.05)
+            assert b.vector_store.reloads == 1 and b.generation == 4
+            assert a.vector_store.reloads == 0 and a.generation == 4
+
+            # The leader exits; the follower wins the next election
+            await a.stop()
+            await asyncio.sleep(0.05)
+            stats = await b.stats()
+            print(stats, events)
+            assert stats["role"] == "leader" and stats["elections_won"] == 1
+            assert events == ["a elected", "a demoted", "b elected"]
+            await b.stop()
+
+    asyncio.run(scenario())
+
+def test_reload_sees_other_workers_writes():
+    """Test a reloaded store sees another process's writes and stops the old system once idle"""
+    print("\n=== Testing Index Reload ===")
+
+    class SlowCollection:
+        """Collection whose reads block until released"""
+
+        def __init__(self, collection, release):
+            self.collection = collection
+            self.release = release
+
+        def get(self, **kwargs):
+            self.release.wait()
+            return self.collection.get(**kwargs)
+
+    def spy_on_stop(system, stopped):
+        original = system.stop
+        system.stop = lambda: (stopped.append(system), original())
+
+    async def scenario(tmp):
+        store = VectorStoreService()
+        await store.initialize()
+        # Load this process's in-memory index before the other worker writes
+        store.collection.add(ids=["seed"], documents=["seed"], embeddings=[[0.9] * 8])
+        assert store.collection.query(query_embeddings=[[0.1] * 8], n_results=2)["ids"] == [["seed"]]
+        subprocess.run([sys.executable, "-c", WRITER, tmp], check=True)
+
+        # A read is still running on the old index when the reload happens
+        stopped = []
+        old_system = store._system
+        spy_on_stop(old_system, stopped)
+        release = threading.Event()
+        store.collection = SlowCollection(store.collection, release)
+        pending = asyncio.create_task(store._index_call("get", ids=["seed"], include=[]))
+        await asyncio.sleep(0.05)
+
+        await store.reload()
+        found = store.collection.query(query_embeddings=[[0.1] * 8], n_results=2)
+        assert found["ids"] == [["written_by_leader", "seed"]]
+        assert store._system is not old_system and stopped == []
+
+        # It finishes on the old system, which is stopped right after
+        release.set()
+        assert (await pending)["ids"] == ["seed"]
+        await asyncio.sleep(0)
+        assert stopped == [old_system]
+
+        # With nothing running, the replaced system is stopped at once
+        current = store._system
+        spy_on_stop(current, stopped)
+        await store.reload()
+        assert stopped == [old_system, current]
+        assert store.collection.count() == 2
+
+    original = settings.CHROMA_PERSIST_DIR, llm_providers._provider
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.CHROMA_PERSIST_DIR = tmp
+        llm_providers._provider = FakeProvider(FakeLanguageModel())
+        try:
+            asyncio.run(scenario(tmp))
+        finally:
+            settings.CHROMA_PERSIST_DIR, llm_providers._provider = original
+
+def test_demoted_leader_stops_writing():
+    """Test losing the lease cancels the running ingest and refuses further writes"""
+    print("\n=== Testing Demotion ===")
+    from fastapi import HTTPException
+    import app.main as main_module
+    from services.ingest_jobs import ingest_jobs
+
+    async def scenario():
+        election = LeaseElection()
+        coordinator = WorkerCoordinator(
+            election,
+            FakeVectorStore(),
+            on_demoted=main_module._step_down,
+            poll_interval=60
+        )
+        await coordinator.start()
+        assert coordinator.is_leader
+
+        previous = main_module.worker
+        main_module.worker = coordinator
+        try:
+            await main_module._require_leader()
+
+            job = ingest_jobs.start("test data", lambda progress: asyncio.sleep(5))
+            await asyncio.sleep(0)
+
+            # The lease lapses; the next write notices before the poll does
+            election.lease_valid = False
+            try:
+                await main_module._require_leader()
+                raise AssertionError("write accepted on a demoted worker")
+            except HTTPException as e:
+                print(e.detail)
+                assert e.status_code == 409
+            assert job.status == "cancelled" and ingest_jobs.active is None
+            assert coordinator.role == "follower"
+            assert not await coordinator.confirm_leadership()
+        finally:
+            main_module.worker = previous
+            await coordinator.stop()
+
+    asyncio.run(scenario())
+
+def main():
+    """Run all tests"""
+    print("Worker Coordinator Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_file_lock_elects_one_leader,
+        test_follower_reloads_and_takes_over,
+        test_reload_sees_other_workers_writes,
+        test_demoted_leader_stops_writing
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test script for multiplexed, cancellable Simli WebSocket queries
+"""
+
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+import msgpack
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models.schemas import RAGResponse
+from services.ws_connection import SimliConnection
+
+class FakeWebSocket:
+    """Client side of a connection: scripted inbound messages, recorded frames"""
+
+    def __init__(self):
+        self.inbound: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+        self.binary_frames = 0
+
+    async def receive(self):
+        message = await self.inbound.get()
+        if message is None:
+            return {"type": "websocket.disconnect", "code": 1000}
+        if isinstance(message, bytes):
+            return {"type": "websocket.receive", "bytes": message}
+        return {"type": "websocket.receive", "text": json.dumps(message)}
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        self.binary_frames += 1
+        self.sent.append(msgpack.unpackb(data))
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+    def frames(self, kind):
+        return [m for m in self.sent if m["type"] == kind]
+
+class SlowOrchestrator:
+    """Answers after a delay, recording which queries were cancelled"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.cancelled = []
+
+    async def process_query(self, query, stream=False, session_id=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(query)
+            raise
+        return RAGResponse(
+            query=query, context="", answer=f"answer to {query}",
+            confidence=0.9, sources=[], processing_steps={}
+        )
+
+async def _serve(messages, orchestrator, pause: float = 0.05, **kwargs):
+    """Feed messages one by one, then disconnect once answers settle"""
+    websocket = FakeWebSocket()
+    connection = SimliConnection(websocket, orchestrator, **kwargs)
+    server = asyncio.create_task(connection.run())
+    for message in messages:
+        await websocket.inbound.put(message)
+        await asyncio.sleep(pause)
+    await asyncio.sleep(orchestrator.delay + 0.1)
+    await websocket.inbound.put(None)
+    await server
+    return websocket
+
+def test_ping_answered_while_query_runs():
+    """Test that the receive loop stays responsive during a query"""
+    print("\n=== Testing Ping During Query ===")
+
+    websocket = asyncio.run(_serve(
+        [{"type": "query", "text": "q1", "request_id": "a"}, {"type": "ping"}],
+        SlowOrchestrator()
+    ))
+    kinds = [m["type"] for m in websocket.sent]
+    print(kinds)
+    assert kinds.index("pong") < kinds.index("response")
+    assert websocket.frames("response")[0]["request_id"] == "a"
+
+def test_new_query_supersedes_in_flight():
+    """Test barge-in: the earlier query is cancelled and only the new one answers"""
+    print("\n=== Testing Barge-in ===")
+
+    orchestrator = SlowOrchestrator()
+    websocket = asyncio.run(_serve(
+        [{"type": "query", "text": "first"}, {"type": "query", "text": "second"}],
+        orchestrator
+    ))
+    assert orchestrator.cancelled == ["first"]
+    assert websocket.frames("cancelled") == [{"type": "cancelled", "request_id": "r1", "reason": "superseded"}]
+    assert [m["text"] for m in websocket.frames("response")] == ["answer to second"]
+
+def test_cancel_message():
+    """Test explicit cancellation by request id"""
+    orchestrator = SlowOrchestrator()
+    websocket = asyncio.run(_serve(
+        [{"type": "query", "text": "q", "request_id": "x"}, {"type": "cancel", "request_id": "x"}],
+        orchestrator
+    ))
+    assert orchestrator.cancelled == ["q"]
+    assert websocket.frames("cancelled")[0]["reason"] == "client"
+    assert not websocket.frames("response")
+
+def test_concurrent_queries_limited():
+    """Test concurrent queries run side by side up to the per-connection limit"""
+    print("\n=== Testing Concurrent Queries ===")
+
+    websocket = asyncio.run(_serve(
+        [{"type": "query", "text": f"q{i}", "concurrent": True} for i in range(3)],
+        SlowOrchestrator(),
+        pause=0.01,
+        max_in_flight=2
+    ))
+    assert sorted(m["request_id"] for m in websocket.frames("response")) == ["r1", "r2"]
+    assert websocket.frames("error")[0]["request_id"] == "r3"
+
+def test_disconnect_cancels_in_flight():
+    """Test that queries still running when the client leaves are cancelled"""
+    async def scenario():
+        orchestrator = SlowOrchestrator(delay=5)
+        websocket = FakeWebSocket()
+        server = asyncio.create_task(SimliConnection(websocket, orchestrator).run())
+        await websocket.inbound.put({"type": "query", "text": "q"})
+        await asyncio.sleep(0.05)
+        await websocket.inbound.put(None)
+        await asyncio.wait_for(server, 1)
+        return orchestrator
+
+    assert asyncio.run(scenario()).cancelled == ["q"]
+
+def test_hello_switches_to_msgpack():
+    """Test that a hello negotiates binary frames for everything after it"""
+    print("\n=== Testing MessagePack Negotiation ===")
+
+    websocket = asyncio.run(_serve(
+        [
+            {"type": "hello", "encoding": "msgpack"},
+            msgpack.packb({"type": "query", "text": "q", "request_id": "m"})
+        ],
+        SlowOrchestrator(delay=0.01)
+    ))
+    assert websocket.sent[0] == {"type": "hello", "encoding": "msgpack", "encodings": ["json", "msgpack"]}
+    assert websocket.binary_frames == len(websocket.sent)
+    assert websocket.frames("response")[0]["request_id"] == "m"
+
+    rejected = asyncio.run(_serve([{"type": "hello", "encoding": "xml"}], SlowOrchestrator(delay=0)))
+    assert rejected.frames("error") and rejected.binary_frames == 0
+
+def main():
+    """Run all tests"""
+    print("WebSocket Connection Test Suite")
+    print("=" * 50)
+
+    tests = [
+        test_ping_answered_while_query_runs,
+        test_new_query_supersedes_in_flight,
+        test_cancel_message,
+        test_concurrent_queries_limited,
+        test_disconnect_cancels_in_flight,
+        test_hello_switches_to_msgpack
+    ]
+
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"\n❌ Error in {test.__name__}: {e!r}")
+
+    print("\n✅ All tests completed!")
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ from pydantic import Field
 
 class Settings(BaseSettings):
     # API Keys
-    OPENAI_API_KEY: str = Field(..., description="OpenAI API key for GPT-4o and embeddings")
+    OPENAI_API_KEY: str = Field("", description="OpenAI API key for GPT-4o and embeddings")
     SIMLI_API_KEY: Optional[str] = Field(None, description="Simli API key")
     SIMLI_FACE_ID: Optional[str] = Field("cace3ef7-a4c4-425d-a8cf-a5358eb0c427", description="Simli Face ID for avatar")
     SIMLI_AGENT_ID: Optional[str] = Field(None, description="Simli Agent ID for knowledge base")
@@ -28,12 +28,134 @@ class Settings(BaseSettings):
     MAX_TOKENS: int = Field(2000, description="Maximum tokens for LLM response")
     TEMPERATURE: float = Field(0.7, description="Temperature for LLM generation")
     
+    # Model Routing Configuration
+    MODEL_ROUTING_ENABLED: bool = Field(True, description="Send simple factual lookups to the fast model")
+    FAST_LLM_MODEL: str = Field("gpt-4o-mini", description="Model for simple factual lookups")
+    FAST_MAX_TOKENS: int = Field(300, description="Maximum tokens for fast-route responses")
+    ROUTING_MAX_SIMPLE_WORDS: int = Field(14, description="Queries longer than this always use LLM_MODEL")
+    ROUTING_MIN_SCORE_GAP: float = Field(0.1, description="Lead of the best retrieved chunk over the next required for the fast route")
+    
+    # Canned Answer Configuration
+    INTENTS_ENABLED: bool = Field(True, description="Answer greetings and other listed intents from the intent table without retrieval or LLM calls")
+    INTENTS_PATH: str = Field("./data/intents.json", description="Intent table with examples and authored (or prompt-generated) answers")
+    INTENT_MATCH_THRESHOLD: float = Field(0.8, description="Minimum similarity to an intent example for a fuzzy match")
+    INTENT_MAX_WORDS: int = Field(6, description="Longer queries are only matched exactly")
+    INTENTS_RELOAD_SECONDS: float = Field(2.0, description="How often the intent table file is checked for changes")
+    
+    # LLM Provider Configuration
+    LLM_PROVIDER: str = Field("openai", description="Chat/embedding provider: openai or fake (deterministic, offline)")
+    OPENAI_BASE_URL: Optional[str] = Field(None, description="OpenAI-compatible endpoint override, e.g. the local fake server")
+    FAKE_LLM_LATENCY_MS: float = Field(150, description="Fake provider time to first token")
+    FAKE_LLM_TOKENS_PER_SECOND: float = Field(60, description="Fake provider generation rate (0 is instant)")
+    FAKE_LLM_RESPONSE_TOKENS: int = Field(120, description="Fake provider answer length in tokens")
+    FAKE_LLM_CHUNK_TOKENS: int = Field(1, description="Fake provider tokens per streamed chunk")
+    FAKE_EMBEDDING_LATENCY_MS: float = Field(15, description="Fake provider latency per embedding request")
+    
     # RAG Configuration
     CHUNK_SIZE: int = Field(1000, description="Size of text chunks for processing")
     CHUNK_OVERLAP: int = Field(200, description="Overlap between chunks")
     NUM_RESULTS: int = Field(5, description="Default number of results to retrieve")
     RELEVANCE_THRESHOLD: float = Field(0.7, description="Minimum relevance score for results")
     
+    # LLM Response Cache Configuration
+    LLM_CACHE_ENABLED: bool = Field(True, description="Cache generated answers keyed on the full prompt")
+    LLM_CACHE_MAX_ENTRIES: int = Field(512, description="Maximum cached answers kept in memory")
+    LLM_CACHE_TTL_SECONDS: int = Field(21600, description="Age after which a cached answer is regenerated")
+    LLM_CACHE_DIR: Optional[str] = Field(None, description="Directory for the on-disk answer cache (unset keeps memory only)")
+    
+    # Upstream (OpenAI) Rate Limiting
+    UPSTREAM_MAX_CONCURRENCY: int = Field(16, description="Maximum concurrent OpenAI calls per process")
+    UPSTREAM_RPM_LIMIT: int = Field(500, description="OpenAI requests per minute budget (0 disables)")
+    UPSTREAM_TPM_LIMIT: int = Field(200000, description="OpenAI tokens per minute budget (0 disables)")
+    
+    # Admission Control Configuration
+    ADMISSION_ENABLED: bool = Field(True, description="Limit concurrent query pipelines with priority lanes and per-client rate limits")
+    ADMISSION_MAX_CONCURRENT: int = Field(32, description="Query and WebSocket pipelines running at once per process")
+    ADMISSION_VOICE_RESERVED: int = Field(8, description="Pipeline slots only voice WebSocket queries may use")
+    ADMISSION_BATCH_MAX_CONCURRENT: int = Field(4, description="Pipeline slots batch requests may use at most (0 for no extra cap)")
+    ADMISSION_MAX_QUEUE: int = Field(64, description="Waiting requests beyond which new ones get 503 at once")
+    ADMISSION_QUEUE_TIMEOUT_MS: int = Field(500, description="Longest an agent or batch request waits for a slot before 503")
+    ADMISSION_VOICE_QUEUE_TIMEOUT_MS: int = Field(3000, description="Longest a voice query waits for a slot")
+    ADMISSION_CLIENT_RPM: int = Field(120, description="Requests per minute per API key or IP (0 disables)")
+    ADMISSION_CLIENT_BURST: int = Field(30, description="Requests a client may send at once before its rate applies")
+    ADMISSION_BATCH_API_KEYS: str = Field("", description="Comma-separated API keys whose requests always use the batch lane")
+    ADMISSION_TRUST_FORWARDED_FOR: bool = Field(True, description="Rate-limit by the X-Forwarded-For address the proxy appended")
+    
+    # Deadlines, Retries and Hedging
+    REQUEST_DEADLINE_SECONDS: float = Field(15.0, description="Time budget for retrieval plus the first streamed token of a query (0 disables)")
+    COMPLETION_TIMEOUT_SECONDS: float = Field(10.0, description="Fixed part of a non-streamed completion's timeout, covering the upstream queue and first byte")
+    COMPLETION_MIN_TOKENS_PER_SECOND: float = Field(15.0, description="Slowest generation rate a non-streamed completion may run at; its timeout adds max_tokens at this rate (0 disables the timeout)")
+    RETRY_MAX_ATTEMPTS: int = Field(3, description="Maximum attempts per upstream call while the deadline allows")
+    RETRY_BASE_DELAY_MS: int = Field(100, description="First retry backoff ceiling (full jitter)")
+    RETRY_MAX_DELAY_MS: int = Field(1000, description="Maximum retry backoff")
+    HEDGE_EMBEDDINGS: bool = Field(True, description="Race a duplicate embedding request after the observed p95 latency")
+    HEDGE_LLM: bool = Field(False, description="Race a duplicate non-streaming completion after the observed p95 latency")
+    HEDGE_MIN_DELAY_MS: int = Field(50, description="Lower bound for the hedging delay")
+    
+    # Request Coalescing Configuration
+    SINGLE_FLIGHT_ENABLED: bool = Field(True, description="Share one pipeline run between concurrent identical queries")
+    
+    # Session Store Configuration
+    SESSION_BACKEND: str = Field("memory", description="Session store: memory (per process) or redis (shared by workers)")
+    REDIS_URL: str = Field("redis://localhost:6379/0", description="Redis URL for the redis session backend")
+    SESSION_MAX_SESSIONS: int = Field(10000, description="In-memory session cap (least recently used evicted)")
+    SESSION_IDLE_TTL_SECONDS: int = Field(1800, description="Sessions idle for longer than this are dropped")
+    SESSION_MAX_TURNS: int = Field(10, description="History entries kept per session")
+    SESSION_MAX_ANSWER_CHARS: int = Field(2000, description="Stored answers are truncated to this length")
+    
+    # Worker Coordination Configuration
+    LEADER_ELECTION: str = Field("file", description="Leader election across workers: none (single worker), file (lock next to the index) or redis")
+    LEADER_LOCK_PATH: Optional[str] = Field(None, description="Lock file for file election (defaults to leader.lock in CHROMA_PERSIST_DIR)")
+    LEADER_KEY: str = Field("rag-backend:leader", description="Redis key holding leadership for redis election")
+    LEADER_TTL_SECONDS: float = Field(30.0, description="Redis leadership expires this long after the leader stops renewing")
+    WORKER_POLL_SECONDS: float = Field(5.0, description="Seconds between KB generation checks and election attempts on followers")
+    
+    # Conversation Configuration
+    CONVERSATION_HISTORY_TOKEN_BUDGET: int = Field(600, description="Hard cap on tokens of session history added to a prompt")
+    CONVERSATION_ANSWER_TOKEN_LIMIT: int = Field(120, description="Earlier answers are cut to this many tokens in the prompt")
+    CONVERSATION_REUSE_CONTEXT: bool = Field(True, description="Reuse the previous turn's retrieved entries for same-topic follow-ups")
+    
+    # WebSocket Configuration
+    WS_MAX_IN_FLIGHT: int = Field(4, description="Concurrent queries allowed per WebSocket connection")
+    WS_BARGE_IN: bool = Field(True, description="A new WebSocket query cancels the ones in flight unless it sets concurrent")
+    WS_STREAM_WINDOW_MS: int = Field(30, description="Longest a streamed token waits before its frame is sent")
+    WS_STREAM_MAX_WINDOW_MS: int = Field(250, description="Upper bound for the frame window while a client drains slowly")
+    WS_STREAM_MAX_FRAME_BYTES: int = Field(1024, description="Send a stream frame as soon as this much text is buffered")
+    WS_STREAM_SENTENCE_FLUSH: bool = Field(True, description="Send a stream frame at each sentence boundary")
+    WS_MSGPACK_ENABLED: bool = Field(True, description="Allow clients to negotiate MessagePack binary frames")
+    
+    # Speech Streaming Configuration
+    SPEECH_FIRST_CLAUSE_MIN_CHARS: int = Field(24, description="Emit the first speech segment at a clause boundary once it reaches this length (0 disables)")
+    SPEECH_MAX_SEGMENT_CHARS: int = Field(240, description="Force a speech segment split past this many characters")
+    
+    # Voice Input Configuration
+    STT_PROVIDER: str = Field("stub", description="Streaming speech-to-text provider: stub")
+    STT_STUB_TRANSCRIPT: str = Field("", description="Transcript the stub provider returns when the client sends no hint")
+    STT_STUB_WORDS_PER_SECOND: float = Field(2.5, description="Speaking rate at which the stub provider reveals partial transcripts")
+    VOICE_SAMPLE_RATE: int = Field(16000, description="Default sample rate of 16-bit mono PCM voice input")
+    VAD_THRESHOLD_DB: float = Field(-45.0, description="Frame level in dBFS counted as speech")
+    VAD_MIN_SPEECH_MS: int = Field(60, description="Voiced audio needed before speech start is reported")
+    VAD_END_OF_TURN_MS: int = Field(600, description="Trailing silence that ends a voice turn")
+    VOICE_PREFETCH_MIN_WORDS: int = Field(3, description="Partial transcript words needed before speculative retrieval starts; 0 disables")
+    
+    # Response Encoding Configuration
+    COMPRESSION_ENABLED: bool = Field(True, description="Compress responses for clients that accept br or gzip")
+    COMPRESSION_MIN_BYTES: int = Field(1024, description="Smallest response body worth compressing")
+    GZIP_LEVEL: int = Field(5, description="gzip compression level (1-9)")
+    BROTLI_QUALITY: int = Field(4, description="Brotli quality (0-11); used when the brotli package is installed")
+    
+    # Tracing Configuration
+    TRACING_ENABLED: bool = Field(True, description="Record stage-level spans for each request")
+    TRACE_EXPORT_PATH: Optional[str] = Field(None, description="Append finished spans to this file as OTLP/JSON lines (unset keeps latency stats only)")
+    TRACE_SERVICE_NAME: str = Field("rag-backend", description="service.name resource attribute on exported spans")
+    TRACE_LATENCY_WINDOW: int = Field(1000, description="Recent durations kept per stage for /admin/latency percentiles")
+    
+    # Warm-up Configuration
+    WARMUP_ENABLED: bool = Field(True, description="Warm caches and connections before accepting traffic")
+    WARMUP_STEPS: str = Field("tokenizer,connections,vector_index,synthetic_query", description="Warm-up steps to run, in order (comma-separated)")
+    WARMUP_QUERY: str = Field("Which residencies offer funding for painters?", description="Synthetic query run end to end during warm-up")
+    WARMUP_STEP_TIMEOUT_SECONDS: float = Field(30.0, description="Seconds before a warm-up step is abandoned")
+    
     # Application Configuration
     APP_NAME: str = Field("Art Grants & Residency Expert", description="Application name")
     DEBUG: bool = Field(False, description="Debug mode")
@@ -45,6 +167,13 @@ class Settings(BaseSettings):
     
     # Knowledge Base Configuration
     KNOWLEDGE_BASE_PATH: str = Field("./data/art_grants_residencies_kb.json", description="Path to knowledge base JSON")
+    DEGRADED_KEYWORD_RETRIEVAL: bool = Field(True, description="Answer from a keyword search of the partial index while the first ingestion runs")
+    DEGRADED_KEYWORD_CANDIDATES: int = Field(200, description="Chunks containing a query keyword read from storage per degraded search")
+    
+    # Ingestion Configuration
+    INGEST_BATCH_SIZE: int = Field(64, description="Chunks embedded and upserted per batch")
+    INGEST_QUEUE_SIZE: int = Field(256, description="Entries buffered between an uploaded NDJSON body and the pipeline")
+    INGEST_JOB_HISTORY: int = Field(20, description="Finished ingest jobs kept for status lookups")
     
     # Update Schedule Configuration
     UPDATE_SCHEDULE: str = Field("cron:0 0 * * *", description="Update schedule (cron or interval format)")
@@ -92,7 +221,7 @@ def validate_settings():
     """Validate that critical settings are configured"""
     errors = []
     
-    if not settings.OPENAI_API_KEY:
+    if settings.LLM_PROVIDER == "openai" and not settings.OPENAI_API_KEY:
         errors.append("OPENAI_API_KEY is required")
     
     if settings.VECTOR_DB_TYPE in ["pinecone", "weaviate"] and not settings.VECTOR_DB_API_KEY:
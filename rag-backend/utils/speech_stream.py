@@ -0,0 +1,148 @@
+"""
+Incremental speech segmentation for streaming LLM output
+Turns token deltas into clean, speakable sentences as soon as each one ends
+"""
+
+import re
+from typing import List, Optional
+
+# Sentence end: terminal punctuation, optional closing quote/bracket, then whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s')
+
+# Clause end used for the very first segment so speech can start early
+CLAUSE_END = re.compile(r'[,;:—]\s')
+
+# Abbreviations that end in a period but do not end a sentence
+ABBREVIATIONS = {
+    'e.g.', 'i.e.', 'etc.', 'vs.', 'dr.', 'mr.', 'mrs.', 'ms.', 'st.',
+    'jan.', 'feb.', 'mar.', 'apr.', 'jun.', 'jul.', 'aug.', 'sep.',
+    'sept.', 'oct.', 'nov.', 'dec.', 'u.s.', 'u.k.', 'approx.', 'no.'
+}
+
+MARKDOWN_LINK = re.compile(r'\[([^\]]+)\]\([^)]*\)')
+BARE_URL = re.compile(r'https?://\S+|www\.\S+')
+LINE_PREFIX = re.compile(r'^\s*(?:#+\s*|[-*•]\s+|\d+[.)]\s+|>\s*)')
+
+
+class SpeechSegmenter:
+    """
+    Buffer LLM deltas and emit complete speakable segments
+
+    Markdown emphasis, headings, list markers and links are stripped as
+    segments are cut. Text that might still be part of an unfinished link,
+    URL or emphasis marker is held back until it is complete.
+    """
+
+    def __init__(
+        self,
+        first_clause_min_chars: Optional[int] = 24,
+        max_segment_chars: int = 240
+    ):
+        """
+        Args:
+            first_clause_min_chars: Emit the first segment at a clause boundary
+                once it is at least this long (None disables first-clause-first)
+            max_segment_chars: Force a split at whitespace past this length
+        """
+        self.first_clause_min_chars = first_clause_min_chars
+        self.max_segment_chars = max_segment_chars
+        self._buffer = ""
+        self.segments_emitted = 0
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a delta and return any segments that are now complete"""
+        self._buffer += delta
+        segments = []
+
+        while True:
+            cut = self._find_cut(self._buffer[:self._safe_length()])
+            if cut is None:
+                break
+
+            raw, self._buffer = self._buffer[:cut], self._buffer[cut:]
+            segment = clean_for_speech(raw)
+            if segment:
+                segments.append(segment)
+                self.segments_emitted += 1
+
+        return segments
+
+    def flush(self) -> List[str]:
+        """Return whatever is left in the buffer as a final segment"""
+        raw, self._buffer = self._buffer, ""
+        segment = clean_for_speech(raw)
+        if not segment:
+            return []
+        self.segments_emitted += 1
+        return [segment]
+
+    def _safe_length(self) -> int:
+        """Length of the buffer prefix that cannot change meaning with more input"""
+        text = self._buffer
+        safe = len(text)
+
+        # Unclosed markdown link: "[label" or "[label](url"
+        open_bracket = text.rfind('[')
+        if open_bracket != -1:
+            tail = text[open_bracket:]
+            if not MARKDOWN_LINK.match(tail) and ('](' in tail or ']' not in tail):
+                safe = min(safe, open_bracket)
+
+        # URL still being streamed (no whitespace after it yet)
+        url = None
+        for url in BARE_URL.finditer(text):
+            pass
+        if url and url.end() == len(text):
+            safe = min(safe, url.start())
+
+        # A trailing "*" or "_" may be the first half of an emphasis marker
+        stripped = text[:safe].rstrip('*_')
+        return min(safe, len(stripped))
+
+    def _find_cut(self, text: str) -> Optional[int]:
+        """Find the end offset of the next complete segment in text"""
+        newline = text.find('\n')
+
+        for match in SENTENCE_END.finditer(text):
+            if newline != -1 and newline < match.start():
+                break
+            if not self._is_abbreviation(text, match.start()):
+                return match.end()
+
+        if newline != -1:
+            return newline + 1
+
+        if self.segments_emitted == 0 and self.first_clause_min_chars is not None:
+            for match in CLAUSE_END.finditer(text):
+                if match.start() >= self.first_clause_min_chars:
+                    return match.end()
+
+        if len(text) > self.max_segment_chars:
+            split = text.rfind(' ', 0, self.max_segment_chars)
+            if split > 0:
+                return split + 1
+
+        return None
+
+    def _is_abbreviation(self, text: str, dot_index: int) -> bool:
+        """Check whether the punctuation at dot_index closes an abbreviation"""
+        if text[dot_index] != '.':
+            return False
+        word_start = text.rfind(' ', 0, dot_index) + 1
+        word = text[word_start:dot_index + 1].lower().lstrip('(')
+        return word in ABBREVIATIONS
+
+
+def clean_for_speech(text: str) -> str:
+    """Strip markdown and links from one segment and normalize whitespace"""
+    text = LINE_PREFIX.sub('', text)
+    text = MARKDOWN_LINK.sub(r'\1', text)
+    text = BARE_URL.sub('link in description', text)
+    text = text.replace('**', '').replace('__', '').replace('`', '')
+    text = re.sub(r'(?<!\w)[*_](\S[^*_]*?)[*_](?!\w)', r'\1', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    # Horizontal rules and stray markup carry nothing to say
+    if not re.search(r'\w', text):
+        return ""
+    return text